@@ -93,9 +93,23 @@ def main():
                 'content': user_input.strip()
             })
             
-            # Obter resposta do sistema com indicador de carregamento
-            with st.spinner("Carregando..."):
-                response = st.session_state.rag_system.ask(user_input.strip())
+            # Exibir a resposta à medida que os tokens chegam
+            st.markdown(f"**Você:** {user_input.strip()}")
+            st.markdown("**Assistente:**")
+            placeholder = st.empty()
+            placeholder.markdown("_Buscando nos documentos..._")
+            
+            partial = ""
+            response = ""
+            for event in st.session_state.rag_system.ask_stream(user_input.strip()):
+                if event["type"] == "sources":
+                    placeholder.markdown(f"_{event['chunks']} trechos encontrados, gerando resposta..._")
+                elif event["type"] == "token":
+                    partial += event["text"]
+                    placeholder.markdown(partial + "▌")
+                elif event["type"] == "final":
+                    response = event["final_answer"]
+                    placeholder.markdown(response)
             
             # Adicionar resposta ao histórico
             st.session_state.messages.append({
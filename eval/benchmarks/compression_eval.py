@@ -0,0 +1,74 @@
+import os
+import sys
+import statistics
+from typing import Dict, List
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(os.path.dirname(current_dir))
+
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.join(project_root, "src"))
+sys.path.insert(0, os.path.join(project_root, "eval"))
+
+from agent_educacional import AgentEducacional
+from metrics import RAGMetrics
+from tests.test_cases import TEST_CASES
+
+METRIC_NAMES = ["faithfulness", "answer_relevancy", "context_precision", "context_recall"]
+
+
+def run_cases(agent: AgentEducacional, metrics: RAGMetrics) -> Dict[str, float]:
+    """Executa os casos de teste pelo grafo e agrega métricas e tokens de prompt"""
+    results = {name: [] for name in METRIC_NAMES}
+    prompt_tokens = []
+
+    for case in TEST_CASES:
+        state = agent.supervisor.workflow.invoke(agent.supervisor._initial_state(case.question))
+        answer = state.get("final_answer", "")
+
+        scores = metrics.calculate_all_metrics(
+            answer, case.question, state.get("retrieved_chunks", []), case.expected_topics
+        )
+        for name in METRIC_NAMES:
+            results[name].append(scores[name])
+
+        if state.get("prompt_tokens"):
+            prompt_tokens.append(state["prompt_tokens"])
+
+    summary = {name: statistics.mean(values) for name, values in results.items()}
+    summary["prompt_tokens"] = statistics.mean(prompt_tokens) if prompt_tokens else 0.0
+
+    return summary
+
+
+def main(vectorstore_path: str = "vectorstore", tolerance: float = 0.05):
+    """Compara métricas e tamanho do prompt com e sem compressão extrativa do contexto"""
+    print("=" * 60)
+    print("AVALIAÇÃO DA COMPRESSÃO DE CONTEXTO")
+    print("=" * 60)
+
+    metrics = RAGMetrics()
+    baseline = run_cases(AgentEducacional(vectorstore_path, verbose=False), metrics)
+    compressed = run_cases(AgentEducacional(vectorstore_path, compress_context=True, verbose=False), metrics)
+
+    print(f"\n{'Métrica':<20}{'sem':>10}{'com':>10}{'Δ':>10}")
+    failures: List[str] = []
+    for name in METRIC_NAMES:
+        delta = compressed[name] - baseline[name]
+        if delta < -tolerance:
+            failures.append(name)
+        print(f"{name:<20}{baseline[name]:>10.3f}{compressed[name]:>10.3f}{delta:>+10.3f}")
+
+    reduction = 1 - compressed["prompt_tokens"] / max(baseline["prompt_tokens"], 1)
+    print(f"{'prompt_tokens':<20}{baseline['prompt_tokens']:>10.0f}{compressed['prompt_tokens']:>10.0f}"
+          f"{-reduction * 100:>+9.0f}%")
+
+    print(f"\nRedução de tokens de prompt: {reduction * 100:.0f}% (meta: > 50%)")
+    if failures:
+        print(f"Métricas fora da tolerância ({tolerance}): {', '.join(failures)}")
+    else:
+        print(f"Todas as métricas dentro da tolerância ({tolerance})")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1] if len(sys.argv) > 1 else "vectorstore")
@@ -0,0 +1,84 @@
+import os
+import sys
+import pickle
+import subprocess
+import numpy as np
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(os.path.dirname(current_dir))
+
+sys.path.insert(0, project_root)
+sys.path.insert(0, current_dir)
+
+from ingest.onnx_encoder import OnnxEncoder, DEFAULT_MODEL_NAME, DEFAULT_ONNX_DIR
+from retrieval_overhead import time_per_query, summarize
+from tests.test_cases import TEST_CASES
+
+
+def import_time(module: str) -> float:
+    """Tempo (s) de importar o módulo num processo novo"""
+    code = f"import time; s = time.perf_counter(); import {module}; print(time.perf_counter() - s)"
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    return float(output.stdout.strip().splitlines()[-1])
+
+
+def parity(reference: np.ndarray, candidate: np.ndarray) -> np.ndarray:
+    """Distância de cosseno por linha entre embeddings normalizados"""
+    return 1.0 - np.sum(reference * candidate, axis=1)
+
+
+def main(vectorstore_path: str = "vectorstore", model_dir: str = DEFAULT_ONNX_DIR,
+         tolerance: float = 0.02, k: int = 3, repeats: int = 5):
+    """Paridade e latência: PyTorch (sentence-transformers) vs. ONNX Runtime int8"""
+    print("=" * 60)
+    print("BENCHMARK DE ENCODERS - PYTORCH vs. ONNX RUNTIME (INT8)")
+    print("=" * 60)
+
+    from sentence_transformers import SentenceTransformer
+
+    torch_model = SentenceTransformer(DEFAULT_MODEL_NAME, device="cpu")
+    backends = {"onnx_int8": OnnxEncoder(model_dir)}
+    if os.path.exists(os.path.join(model_dir, "model.onnx")):
+        backends["onnx_fp32"] = OnnxEncoder(model_dir, quantized=False)
+
+    queries = [case.question for case in TEST_CASES]
+    with open(os.path.join(vectorstore_path, "chunks.pkl"), "rb") as f:
+        chunks = [chunk.page_content for chunk in pickle.load(f)]
+
+    # Paridade: queries curtas e chunks longos (truncamento em 256 tokens)
+    texts = queries + chunks[:100]
+    reference = torch_model.encode(texts, normalize_embeddings=True)
+
+    print(f"\nParidade ({len(texts)} textos, tolerância de distância de cosseno: {tolerance})")
+    for name, encoder in backends.items():
+        distances = parity(reference, encoder.encode(texts))
+        status = "OK" if distances.max() <= tolerance else "FALHOU"
+        print(f"  {name:<10} média: {distances.mean():.5f} | máx: {distances.max():.5f} → {status}")
+
+    # Impacto na recuperação: top-k do índice com cada backend
+    import faiss
+    index = faiss.read_index(os.path.join(vectorstore_path, "index.faiss"))
+    _, reference_ids = index.search(reference[:len(queries)], k)
+    for name, encoder in backends.items():
+        _, ids = index.search(encoder.encode(queries), k)
+        same = sum(set(a) == set(b) for a, b in zip(reference_ids, ids))
+        print(f"  {name:<10} top-{k} idêntico ao PyTorch: {same}/{len(queries)} queries")
+
+    # Latência por query (encode de uma pergunta, como no caminho de consulta)
+    print(f"\n{'Backend':<14}{'média (ms)':>12}{'p50 (ms)':>12}{'p95 (ms)':>12}")
+    candidates = {"pytorch": lambda q: torch_model.encode(q, normalize_embeddings=True)}
+    candidates.update({name: encoder.encode for name, encoder in backends.items()})
+
+    for name, encode in candidates.items():
+        encode(queries[0])  # aquecimento
+        stats = summarize(time_per_query(encode, queries, repeats))
+        print(f"{name:<14}{stats['mean'] / 1000:>12.2f}{stats['p50'] / 1000:>12.2f}{stats['p95'] / 1000:>12.2f}")
+
+    print("\nTempo de import (processo novo)")
+    for module in ("torch", "onnxruntime"):
+        print(f"  {module:<12} {import_time(module):.2f} s")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1] if len(sys.argv) > 1 else "vectorstore",
+         sys.argv[2] if len(sys.argv) > 2 else DEFAULT_ONNX_DIR)
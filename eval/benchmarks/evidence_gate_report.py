@@ -0,0 +1,70 @@
+import os
+import sys
+from typing import Dict, List
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(os.path.dirname(current_dir))
+
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.join(project_root, "src"))
+
+from agent_educacional import AgentEducacional
+from agents.evidence_gate import EvidenceGateAgent
+from tests.test_cases import TEST_CASES
+
+
+def run_case(agent: AgentEducacional, gate: EvidenceGateAgent, question: str) -> Dict:
+    """Executa o grafo sem o portão e avalia, sobre o mesmo estado, o que ele decidiria"""
+    state = agent.supervisor.workflow.invoke(agent.supervisor._initial_state(question))
+
+    fast_path = state.get("query_type") in ("saudacao", "ajuda", "artigo")
+    llm_called = bool(state.get("raw_answer") or state.get("llm_error"))
+    evidence = gate.evaluate(state) if state.get("retrieved_chunks") and not fast_path else None
+
+    return {
+        "question": question,
+        "fast_path": fast_path,
+        "llm_called": llm_called,
+        "self_check_passed": state.get("self_check_passed", False),
+        "gate_passed": evidence["passed"] if evidence else None,
+        "best_similarity": evidence["best_similarity"] if evidence else None
+    }
+
+
+def main(vectorstore_path: str = "vectorstore"):
+    """Chamadas ao LLM economizadas pelos atalhos e pelo portão de evidências nos casos de teste"""
+    print("=" * 60)
+    print("RELATÓRIO DO PORTÃO DE EVIDÊNCIAS")
+    print("=" * 60)
+
+    # Sem o portão no grafo: todas as perguntas que recuperam trechos chamariam o LLM
+    agent = AgentEducacional(vectorstore_path, evidence_gate=False, verbose=False)
+    gate = EvidenceGateAgent()
+
+    results: List[Dict] = [run_case(agent, gate, case.question) for case in TEST_CASES]
+
+    print(f"\n{'Pergunta':<52}{'LLM':>5}{'Self-Check':>12}{'Portão':>9}{'Sim.':>7}")
+    for result in results:
+        gate_label = "atalho" if result["fast_path"] else {True: "passa", False: "bloq.", None: "-"}[result["gate_passed"]]
+        similarity = f"{result['best_similarity']:.2f}" if result["best_similarity"] is not None else "-"
+        print(f"{result['question'][:50]:<52}{'sim' if result['llm_called'] else 'não':>5}"
+              f"{'aprovada' if result['self_check_passed'] else 'rejeitada':>12}{gate_label:>9}{similarity:>7}")
+
+    fast_paths = sum(r["fast_path"] for r in results)
+    blocked = [r for r in results if r["llm_called"] and r["gate_passed"] is False]
+    saved = [r for r in blocked if not r["self_check_passed"]]
+    lost = [r for r in blocked if r["self_check_passed"]]
+    rejected = [r for r in results if r["llm_called"] and not r["self_check_passed"]]
+
+    print(f"\nCasos de teste: {len(results)}")
+    print(f"Atalhos sem LLM (saudação/ajuda/artigo): {fast_paths}")
+    print(f"Chamadas ao LLM sem o portão: {sum(r['llm_called'] for r in results)}")
+    print(f"Bloqueadas pelo portão: {len(blocked)}")
+    print(f"  economizadas (Self-Check também rejeitaria): {len(saved)}")
+    print(f"  respostas perdidas (Self-Check aprovaria): {len(lost)}")
+    print(f"Rejeições do Self-Check não previstas pelo portão: {len(rejected) - len(saved)}")
+    print(f"Total de chamadas ao LLM economizadas: {fast_paths + len(blocked)}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1] if len(sys.argv) > 1 else "vectorstore")
@@ -0,0 +1,76 @@
+import os
+import sys
+import time
+import argparse
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(os.path.dirname(current_dir))
+
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.join(project_root, "src"))
+sys.path.insert(0, current_dir)
+
+from agent_educacional import AgentEducacional
+from retrieval_overhead import summarize
+from tests.test_cases import TEST_CASES
+
+DEFAULT_CASSETTE = os.path.join(project_root, "eval", "cassettes", "test_cases.jsonl")
+
+
+def run_pipeline(agent: AgentEducacional, queries, repeats: int):
+    """Executa o grafo completo do SupervisorAgent e retorna latências em microssegundos"""
+    timings = []
+
+    for _ in range(repeats):
+        for query in queries:
+            start = time.perf_counter()
+            agent.ask(query)
+            timings.append((time.perf_counter() - start) * 1e6)
+
+    return timings
+
+
+def main():
+    """Grava respostas dos casos de teste (--record) ou mede o pipeline offline a partir do cassete"""
+    parser = argparse.ArgumentParser(description="Benchmark offline do pipeline com LLM gravado")
+    parser.add_argument("--vectorstore", default="vectorstore")
+    parser.add_argument("--cassette", default=DEFAULT_CASSETTE)
+    parser.add_argument("--record", action="store_true", help="chama a Groq e grava o cassete")
+    parser.add_argument("--latency", default=None,
+                        help="latência simulada no replay: 'recorded' ou segundos (padrão: nenhuma)")
+    parser.add_argument("--jitter", type=float, default=None,
+                        help="variação relativa da latência simulada, ex.: 0.2 = ±20%% (semente fixa)")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    queries = [case.question for case in TEST_CASES]
+
+    if args.record:
+        agent = AgentEducacional(args.vectorstore, llm_mode="record", cassette_path=args.cassette, verbose=False)
+        run_pipeline(agent, queries, 1)
+        print(f"Cassete gravado: {args.cassette} ({len(queries)} perguntas)")
+        return
+
+    agent = AgentEducacional(args.vectorstore, llm_mode="replay", cassette_path=args.cassette, verbose=False)
+    if args.latency:
+        agent.llm.latency = args.latency if args.latency == "recorded" else float(args.latency)
+    if args.jitter is not None:
+        agent.llm.jitter = args.jitter
+
+    print("=" * 60)
+    print("BENCHMARK DO PIPELINE - LLM EM REPLAY")
+    print("=" * 60)
+
+    agent.ask(queries[0])  # aquecimento
+    agent.llm.hits = agent.llm.misses = 0
+
+    stats = summarize(run_pipeline(agent, queries, args.repeats))
+
+    print(f"\nQueries: {len(queries)} | repetições: {args.repeats} | latência simulada: {args.latency or 'nenhuma'} (jitter ±{agent.llm.jitter:.0%})")
+    print(f"Cassete: {agent.llm.hits} acertos, {agent.llm.misses} prompts não gravados")
+    print(f"\n{'média (ms)':>12}{'p50 (ms)':>12}{'p95 (ms)':>12}")
+    print(f"{stats['mean'] / 1000:>12.1f}{stats['p50'] / 1000:>12.1f}{stats['p95'] / 1000:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
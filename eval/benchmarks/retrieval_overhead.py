@@ -0,0 +1,90 @@
+import os
+import sys
+import time
+import statistics
+from typing import List, Dict, Callable
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(os.path.dirname(current_dir))
+
+sys.path.insert(0, project_root)
+
+from ingest.vector_store import VectorStore
+from tests.test_cases import TEST_CASES
+
+
+def time_per_query(fn: Callable, inputs: List, repeats: int) -> List[float]:
+    """Executa fn para cada entrada e retorna latências em microssegundos"""
+    timings = []
+
+    for _ in range(repeats):
+        for item in inputs:
+            start = time.perf_counter()
+            fn(item)
+            timings.append((time.perf_counter() - start) * 1e6)
+
+    return timings
+
+
+def summarize(timings: List[float]) -> Dict[str, float]:
+    ordered = sorted(timings)
+    return {
+        "mean": statistics.mean(ordered),
+        "p50": ordered[len(ordered) // 2],
+        "p95": ordered[int(len(ordered) * 0.95) - 1]
+    }
+
+
+def main(vectorstore_path: str = "vectorstore", k: int = 3, repeats: int = 20):
+    """Compara overhead por query: wrapper LangChain vs. busca direta no FAISS"""
+    print("=" * 60)
+    print("BENCHMARK DE RECUPERAÇÃO - WRAPPER LANGCHAIN vs. FAISS DIRETO")
+    print("=" * 60)
+
+    store = VectorStore(vectorstore_path)
+    store.load()
+
+    if not store.direct_search:
+        print("Busca direta indisponível: índice FAISS e chunks.pkl desalinhados")
+        return
+
+    queries = [case.question for case in TEST_CASES]
+    vectors = store.encode_queries(queries)
+    vector_lists = [v.tolist() for v in vectors]
+
+    # Aquecimento
+    store.vectorstore.similarity_search_with_score_by_vector(vector_lists[0], k=k)
+    store.search_ids(vectors[0], k)
+
+    # Overhead isolado (vetor da query já calculado)
+    wrapper = summarize(time_per_query(
+        lambda v: store.vectorstore.similarity_search_with_score_by_vector(v, k=k),
+        vector_lists, repeats
+    ))
+
+    def direct_search(vector):
+        ids, scores = store.search_ids(vector, k)
+        return [(store.chunks[idx], float(score)) for idx, score in zip(ids[0], scores[0]) if idx >= 0]
+
+    direct = summarize(time_per_query(direct_search, list(vectors), repeats))
+
+    # Ponta a ponta (inclui encode da query)
+    wrapper_e2e = summarize(time_per_query(
+        lambda q: store.vectorstore.similarity_search_with_score(q, k=k), queries, 1
+    ))
+    direct_e2e = summarize(time_per_query(
+        lambda q: store._semantic_search(q, k), queries, 1
+    ))
+
+    print(f"\nQueries: {len(queries)} | k={k} | chunks: {len(store.chunks)} | repetições: {repeats}")
+    print(f"\n{'Caminho':<28}{'média (µs)':>12}{'p50 (µs)':>12}{'p95 (µs)':>12}")
+    for name, stats in [("LangChain (por vetor)", wrapper), ("FAISS direto (por vetor)", direct),
+                        ("LangChain (com encode)", wrapper_e2e), ("FAISS direto (com encode)", direct_e2e)]:
+        print(f"{name:<28}{stats['mean']:>12.1f}{stats['p50']:>12.1f}{stats['p95']:>12.1f}")
+
+    saved = wrapper["mean"] - direct["mean"]
+    print(f"\nOverhead do wrapper por query: {saved:.1f} µs ({wrapper['mean'] / max(direct['mean'], 1e-9):.1f}x)")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1] if len(sys.argv) > 1 else "vectorstore")
@@ -16,11 +16,7 @@ from agent_educacional import AgentEducacional
 from ragas import evaluate
 from ragas.metrics import faithfulness, context_precision, context_recall, answer_relevancy
 
-try:
-    from langchain_huggingface import HuggingFaceEmbeddings
-except ImportError:
-    from langchain_community.embeddings import HuggingFaceEmbeddings
-
+from ingest.model_registry import SharedEmbeddings
 from langchain_google_genai import GoogleGenerativeAI
 from datasets import Dataset
 import psutil
@@ -38,10 +34,8 @@ class RAGASModelManager:
         self._setup_models()
     
     def _setup_models(self):
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/all-MiniLM-L6-v2",
-            model_kwargs={'device': 'cpu'}
-        )
+        # Reaproveita o MiniLM já carregado pelo agente
+        self.embeddings = SharedEmbeddings(normalize=False)
         
         api_key = os.getenv("GOOGLE_API_KEY")
         if not api_key:
@@ -1,7 +1,22 @@
 from .legal_splitter import LegalSplitter
-from .vector_store import VectorStore
+from .vector_store import VectorStore, RetrievalHit
+from .definitions import DefinitionExtractor, DefinitionIndex
+from .literal_index import LiteralIndex
+from .shard_router import ShardRouter
+from .onnx_encoder import OnnxEncoder
+from .model_registry import ModelRegistry, LazyEncoder, SharedEmbeddings, registry
 
 __all__ = [
     'LegalSplitter',
-    'VectorStore'
+    'VectorStore',
+    'RetrievalHit',
+    'DefinitionExtractor',
+    'DefinitionIndex',
+    'LiteralIndex',
+    'ShardRouter',
+    'OnnxEncoder',
+    'ModelRegistry',
+    'LazyEncoder',
+    'SharedEmbeddings',
+    'registry'
 ]
\ No newline at end of file
@@ -0,0 +1,240 @@
+from langchain_core.documents import Document
+import re
+import unicodedata
+from typing import List, Dict, Optional
+
+
+def normalize_term(term: str) -> str:
+    """Normaliza termo para chave do dicionário (minúsculas, sem acentos)"""
+
+    term = unicodedata.normalize('NFKD', term)
+    term = ''.join(c for c in term if not unicodedata.combining(c))
+    term = re.sub(r'[^\w\s]', ' ', term.lower())
+    term = re.sub(r'^(?:o|a|os|as)\s+', '', term.strip())
+
+    return re.sub(r'\s+', ' ', term).strip()
+
+
+# Palavras comuns escritas em maiúsculas que não devem virar chave de sigla
+ACRONYM_STOPWORDS = {
+    'a', 'ao', 'aos', 'as', 'com', 'da', 'das', 'de', 'do', 'dos', 'e', 'em', 'na', 'nao', 'nas',
+    'no', 'nos', 'o', 'os', 'ou', 'para', 'pela', 'pelo', 'por', 'que', 'se', 'sem', 'sim', 'um', 'uma'
+}
+
+
+def is_acronym(text: str) -> bool:
+    """Sigla em maiúsculas no texto, com ao menos 2 letras, fora das stop-words e dos incisos"""
+
+    text = text.strip()
+    if sum(c.isupper() for c in text) < 2 or text != text.upper():
+        return False
+
+    # Incisos (I, II, IV...) não são siglas
+    if re.fullmatch(r'[IVXLCDM]+', text):
+        return False
+
+    return normalize_term(text) not in ACRONYM_STOPWORDS
+
+
+def align_expansion(acronym: str, expansion: str) -> Optional[str]:
+    """Final da expansão cujas iniciais das palavras com maiúscula formam a sigla
+
+    O padrão captura as palavras antes do parêntese ("SEÇÃO VI das Zonas Especiais
+    de Interesse Comercial (ZEIC)"): as primeiras são descartadas até as iniciais
+    coincidirem com a sigla. Sem alinhamento ("Áreas Rurais (NUAR)"), retorna None.
+    """
+
+    letters = normalize_term(acronym).replace(' ', '')
+    words = expansion.split()
+
+    for start, word in enumerate(words):
+        if not word[0].isupper():
+            continue
+
+        initials = ''.join(normalize_term(w)[:1] for w in words[start:] if w[0].isupper())
+        if initials == letters:
+            return ' '.join(words[start:]).rstrip(',')
+
+    return None
+
+
+def singularize_term(term: str) -> str:
+    """Reduz plurais simples do português em termo já normalizado"""
+
+    words = []
+    for word in term.split():
+        if len(word) > 3:
+            if word.endswith(('ais', 'eis', 'ois')):
+                word = word[:-2] + 'l'
+            elif word.endswith('oes'):
+                word = word[:-3] + 'ao'
+            elif word.endswith(('res', 'zes')):
+                word = word[:-2]
+            elif word.endswith('s') and word[-2] in 'aeiou':
+                word = word[:-1]
+        words.append(word)
+
+    return ' '.join(words)
+
+
+class DefinitionExtractor:
+    """Extrai termos definidos e siglas dos chunks durante a ingestão"""
+
+    def __init__(self, max_definition_size: int = 300):
+        self.max_definition_size = max_definition_size
+
+        # "considera-se Zona X a porção..." / "entende-se por Zona X o..."
+        self.definition_pattern = re.compile(
+            r'\b(?:considera(?:m)?-se|entende(?:m)?-se\s+por)\s+'
+            r'(?P<term>[^,;:\n]{3,80}?)\s*,?\s+'
+            r'(?P<definition>(?:o|a|os|as|aquel[ea]s?|tod[oa]s?|um|uma)\s+[^;\n]{10,})',
+            re.IGNORECASE
+        )
+
+        # Incisos de listas "considera-se:" → "I – Termo: definição"
+        self.list_item_pattern = re.compile(
+            r'(?:^|\n)\s*[IVXL]+\s*[-–]\s*(?P<term>[^:\n]{3,80}):\s*(?P<definition>[^\n]{10,})'
+        )
+
+        # Palavras com maiúscula ligadas por preposições e vírgulas ("Ciência, Tecnologia e Inovação")
+        expansion = (
+            r'(?P<expansion>[A-ZÁÉÍÓÚÂÊÔÃÕÇ][\wÀ-ú]+'
+            r'(?:,?\s+(?:(?:de|da|do|das|dos|e|em|na|nas|no|nos)\b|[A-ZÁÉÍÓÚÂÊÔÃÕÇ][\wÀ-ú]+)){1,10})'
+        )
+
+        # "ZEIS – Zonas Especiais de Interesse Social"
+        self.acronym_dash_pattern = re.compile(
+            r'\b(?P<acronym>[A-ZÁÉÍÓÚÂÊÔÃÕÇ]{2,10})\s*[-–]\s*' + expansion
+        )
+
+        # "Zonas Especiais de Interesse Social (ZEIS)"
+        self.acronym_paren_pattern = re.compile(
+            expansion + r'\s*\((?P<acronym>[A-ZÁÉÍÓÚÂÊÔÃÕÇ]{2,10})\)'
+        )
+
+    def extract(self, chunks: List[Document]) -> Dict[str, List[Dict]]:
+        """Retorna dicionário termo normalizado → entradas de definição"""
+
+        definitions = {}
+
+        for chunk_id, chunk in enumerate(chunks):
+            text = chunk.page_content
+
+            for match in self.definition_pattern.finditer(text):
+                self._add_entry(definitions, match.group('term'), match.group('definition'),
+                                chunk_id, chunk, 'definicao')
+
+            if re.search(r'considera(?:m)?-se:|entende(?:m)?-se\s+por:', text, re.IGNORECASE):
+                for match in self.list_item_pattern.finditer(text):
+                    self._add_entry(definitions, match.group('term'), match.group('definition'),
+                                    chunk_id, chunk, 'definicao')
+
+            for pattern in (self.acronym_dash_pattern, self.acronym_paren_pattern):
+                for match in pattern.finditer(text):
+                    acronym = match.group('acronym')
+                    expansion = align_expansion(acronym, match.group('expansion'))
+
+                    if expansion is None or not is_acronym(acronym):
+                        continue
+
+                    self._add_entry(definitions, acronym, expansion, chunk_id, chunk, 'sigla')
+                    self._add_entry(definitions, expansion, acronym, chunk_id, chunk, 'sigla')
+
+        return definitions
+
+    def _add_entry(self, definitions: Dict, term: str, definition: str,
+                   chunk_id: int, chunk: Document, kind: str):
+        """Adiciona entrada evitando duplicatas do mesmo chunk"""
+
+        key = normalize_term(term)
+        if len(key) < 2:
+            return
+
+        entries = definitions.setdefault(key, [])
+        if any(e['chunk_id'] == chunk_id for e in entries):
+            return
+
+        entries.append({
+            'term': term.strip(),
+            'definition': definition.strip()[:self.max_definition_size],
+            'kind': kind,
+            'chunk_id': chunk_id,
+            'article_number': chunk.metadata.get('article_number'),
+            'source': chunk.metadata.get('source')
+        })
+
+
+class DefinitionIndex:
+    """Consulta ao dicionário de definições por n-gramas da pergunta"""
+
+    def __init__(self, definitions: Optional[Dict[str, List[Dict]]] = None, max_ngram: int = 8):
+        # Dicionários gravados antes dos filtros podem ter siglas como "sim" ou expansões desalinhadas
+        self.definitions = {}
+        for key, entries in (definitions or {}).items():
+            entries = [e for e in entries if e['kind'] != 'sigla' or self._aligned(e)]
+            if entries:
+                self.definitions[key] = entries
+        self.max_ngram = max_ngram
+
+        # Singular → chaves originais, para "zonas especiais" casar com "zona especial"
+        self._lookup = {}
+        for key in self.definitions:
+            self._lookup.setdefault(singularize_term(key), []).append(key)
+
+        self.question_pattern = re.compile(
+            r'^\s*(?:o\s+que\s+(?:é|e|são|sao|significa|significam|quer\s+dizer)|'
+            r'qual\s+(?:é\s+)?(?:o|a)\s+(?:definição|definicao|conceito|significado)|'
+            r'defina|defin[ae]|definição|definicao|conceito\s+de|significado\s+de|'
+            r'o\s+que\s+se\s+entende\s+por)\b',
+            re.IGNORECASE
+        )
+
+    def _aligned(self, entry: Dict) -> bool:
+        """Entrada de sigla (nos dois sentidos) com sigla válida e expansão alinhada"""
+
+        acronym, expansion = entry['term'], entry['definition']
+        if not is_acronym(acronym):
+            acronym, expansion = expansion, acronym
+        if not is_acronym(acronym):
+            return False
+
+        aligned = align_expansion(acronym, expansion)
+        return aligned is not None and normalize_term(aligned) == normalize_term(expansion)
+
+    def __len__(self) -> int:
+        return len(self.definitions)
+
+    def is_definition_query(self, query: str) -> bool:
+        return bool(self.question_pattern.search(query))
+
+    def lookup(self, query: str) -> List[Dict]:
+        """Entradas do termo mais longo da pergunta presente no dicionário"""
+
+        if not self.definitions:
+            return []
+
+        words = singularize_term(normalize_term(query)).split()
+
+        for size in range(min(self.max_ngram, len(words)), 0, -1):
+            for start in range(len(words) - size + 1):
+                key = ' '.join(words[start:start + size])
+                if key in self._lookup:
+                    entries = [e for k in self._lookup[key] for e in self.definitions[k]
+                               if self._matches_case(e, query)]
+                    if entries:
+                        return self._rank_entries(entries)
+
+        return []
+
+    def _matches_case(self, entry: Dict, query: str) -> bool:
+        """Sigla só casa se escrita em maiúsculas na pergunta ("OP", não "op"; plural "PEUs" aceito)"""
+
+        if entry['kind'] != 'sigla' or not is_acronym(entry['term']):
+            return True
+
+        return re.search(rf'(?<!\w){re.escape(entry["term"])}s?(?!\w)', query) is not None
+
+    def _rank_entries(self, entries: List[Dict]) -> List[Dict]:
+        """Definições explícitas antes de siglas; chunks de artigo primeiro"""
+
+        return sorted(entries, key=lambda e: (e['kind'] != 'definicao', e['article_number'] is None))
@@ -1,9 +1,13 @@
 from langchain_community.document_loaders import PyPDFLoader
 import os
 import re
+import json
 import shutil
 from legal_splitter import LegalSplitter
 from vector_store import VectorStore
+from definitions import DefinitionExtractor
+from literal_index import LiteralIndex
+from token_counter import count_tokens
 
 
 def ingest_pdfs(docs_dir: str = "ingest/docs", 
@@ -25,7 +29,7 @@ def ingest_pdfs(docs_dir: str = "ingest/docs",
     # Inicializar splitter
     splitter = LegalSplitter(max_chunk_size=1600, chunk_overlap=180)
     all_chunks = []
-    combined_literal_index = {}
+    header_texts = {}
     
     for pdf_file in pdf_files:
         pdf_path = os.path.join(docs_dir, pdf_file)
@@ -47,7 +51,10 @@ def ingest_pdfs(docs_dir: str = "ingest/docs",
             }
             
             # Dividir texto
-            chunks, literal_index = splitter.split_text(full_text, base_metadata)
+            chunks, _ = splitter.split_text(full_text, base_metadata)
+            
+            # Cabeçalho (título da lei) para os aliases do documento
+            header_texts[base_metadata['source']] = full_text[:2000]
             
             print(f"  Gerados: {len(chunks)} chunks")
             
@@ -62,13 +69,6 @@ def ingest_pdfs(docs_dir: str = "ingest/docs",
                 else:
                     print(f"  ⚠ Art. {art_num}: NÃO encontrado")
             
-            # Combinar índices literais
-            base_idx = len(all_chunks)
-            for art_num, indices in literal_index.items():
-                if art_num not in combined_literal_index:
-                    combined_literal_index[art_num] = []
-                combined_literal_index[art_num].extend([idx + base_idx for idx in indices])
-            
             all_chunks.extend(chunks)
             
         except Exception as e:
@@ -81,13 +81,28 @@ def ingest_pdfs(docs_dir: str = "ingest/docs",
     
     print(f"\nTotal de chunks: {len(all_chunks)}")
     
-    # Análise do índice literal
-    print(f"\nÍndice literal criado para {len(combined_literal_index)} artigos")
+    # Tokens de cada chunk, usados no orçamento do prompt do Answerer
+    for chunk in all_chunks:
+        chunk.metadata['token_count'] = count_tokens(chunk.page_content)
+    print(f"Tokens totais: {sum(c.metadata['token_count'] for c in all_chunks):,}")
+    
+    # Índice literal por (documento, artigo), sobre os ids finais dos chunks
+    literal_index = LiteralIndex.from_chunks(all_chunks, header_texts)
+    
+    print(f"\nÍndice literal criado para {len(literal_index)} artigos em {len(literal_index.documents())} documento(s)")
     for art in ['175', '178']:
-        if art in combined_literal_index:
-            print(f"  Art. {art}: {len(combined_literal_index[art])} referências")
+        if art in literal_index:
+            print(f"  Art. {art}: {len(literal_index.lookup(art))} referências")
         else:
             print(f"  Art. {art}: NÃO indexado")
+    print(f"  Aliases de documentos: {', '.join(sorted(literal_index.aliases))}")
+    
+    # Extrair definições e siglas
+    definitions = DefinitionExtractor().extract(all_chunks)
+    print(f"\nDicionário de definições: {len(definitions)} termos")
+    for term in ['zeis', 'zonas especiais de interesse social']:
+        if term in definitions:
+            print(f"  '{term}': {len(definitions[term])} definição(ões)")
     
     # Criar vectorstore
     print("\nCriando vectorstore...")
@@ -99,7 +114,7 @@ def ingest_pdfs(docs_dir: str = "ingest/docs",
         
         # Criar vectorstore
         store = VectorStore(vectorstore_path)
-        store.create_from_documents(all_chunks, combined_literal_index)
+        store.create_from_documents(all_chunks, literal_index, definitions)
         
         print(f"✓ Vectorstore salvo em: {vectorstore_path}")
         
@@ -142,6 +157,46 @@ def ingest_pdfs(docs_dir: str = "ingest/docs",
         return False
 
 
+def ingest_shards(docs_root: str, vectorstore_path: str = "vectorstore",
+                  memory_budget_mb: int = 1024) -> bool:
+    """Ingere um shard por subdiretório de docs_root (um município ou família de leis)"""
+    
+    if not os.path.isdir(docs_root):
+        print(f"Erro: Diretório {docs_root} não encontrado")
+        return False
+    
+    shard_dirs = sorted(d for d in os.listdir(docs_root) if os.path.isdir(os.path.join(docs_root, d)))
+    
+    if not shard_dirs:
+        print(f"Erro: Nenhum subdiretório de shard em {docs_root}")
+        return False
+    
+    os.makedirs(vectorstore_path, exist_ok=True)
+    shards = {}
+    
+    for shard_name in shard_dirs:
+        print(f"\n{'=' * 50}\nShard: {shard_name}\n{'=' * 50}")
+        
+        shard_path = os.path.join(vectorstore_path, shard_name)
+        if ingest_pdfs(os.path.join(docs_root, shard_name), shard_path):
+            shards[shard_name] = {
+                "path": shard_name,
+                "aliases": [shard_name.replace('_', ' ').replace('-', ' ').title()]
+            }
+        else:
+            print(f"  Shard {shard_name} ignorado")
+    
+    if not shards:
+        return False
+    
+    manifest = {"memory_budget_mb": memory_budget_mb, "shards": shards}
+    with open(os.path.join(vectorstore_path, "shards.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    
+    print(f"\n✓ Manifesto com {len(shards)} shard(s) salvo em: {vectorstore_path}/shards.json")
+    return True
+
+
 def test_search(vectorstore_path: str = "vectorstore"):
     """Testa o sistema de busca"""
     
@@ -155,6 +210,7 @@ def test_search(vectorstore_path: str = "vectorstore"):
         
         print(f"✓ Vectorstore carregado: {len(store.chunks)} chunks")
         print(f"✓ Índice literal: {len(store.literal_index)} artigos")
+        print(f"✓ Definições: {len(store.definitions)} termos")
         
         # Testes
         test_queries = [
@@ -200,6 +256,15 @@ if __name__ == "__main__":
             vectorstore_path = sys.argv[2] if len(sys.argv) > 2 else "vectorstore"
             test_search(vectorstore_path)
             
+        elif command == "--shards":
+            docs_root = sys.argv[2] if len(sys.argv) > 2 else "ingest/docs"
+            vectorstore_path = sys.argv[3] if len(sys.argv) > 3 else "vectorstore"
+            
+            if ingest_shards(docs_root, vectorstore_path):
+                print("\nIngestão por shards concluída com sucesso")
+            else:
+                print("\nFalha na ingestão por shards")
+            
         else:
             docs_dir = command
             vectorstore_path = sys.argv[2] if len(sys.argv) > 2 else "vectorstore"
@@ -0,0 +1,170 @@
+from langchain_core.documents import Document
+import re
+from typing import List, Dict, Tuple, Optional
+
+try:
+    from .definitions import normalize_term
+except ImportError:
+    from definitions import normalize_term
+
+
+def normalize_alias(text: str) -> str:
+    """Normaliza nome/alias de documento (sem acentos, zeros à esquerda ou pontuação)"""
+
+    text = normalize_term(text.replace('/', ' '))
+    text = re.sub(r'\b(?:n|no|nº|numero)\b\s*(?=\d)', '', text)
+    text = re.sub(r'\b0+(\d)', r'\1', text)
+
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+class LiteralIndex:
+    """Índice literal por (documento, artigo) com aliases de documentos"""
+
+    FORMAT_VERSION = 2
+
+    def __init__(self, entries: Optional[Dict[Tuple[str, str], List[int]]] = None,
+                 aliases: Optional[Dict[str, List[str]]] = None):
+        self.entries = entries or {}
+        self.aliases = aliases or {}
+
+        # artigo → documentos que o contêm
+        self._documents_by_article = {}
+        for document, article_num in self.entries:
+            self._documents_by_article.setdefault(article_num, []).append(document)
+
+        # Aliases mais longos primeiro ("lei complementar 3 2006" antes de "lei")
+        self._sorted_aliases = sorted(self.aliases, key=len, reverse=True)
+
+    @classmethod
+    def from_chunks(cls, chunks: List[Document], header_texts: Optional[Dict[str, str]] = None) -> 'LiteralIndex':
+        """Constrói o índice a partir dos chunks finais (ids = posição em chunks)"""
+
+        entries = {}
+
+        for idx, chunk in enumerate(chunks):
+            document = chunk.metadata.get('source', '')
+            articles = []
+
+            article_num = chunk.metadata.get('article_number')
+            if article_num:
+                articles.append(article_num)
+
+            articles.extend(re.findall(r'\bArt\.?\s*(\d+)', chunk.page_content, re.IGNORECASE))
+
+            for art in articles:
+                ids = entries.setdefault((document, art), [])
+                if idx not in ids:
+                    ids.append(idx)
+
+        return cls(entries, build_document_aliases(chunks, header_texts))
+
+    @classmethod
+    def from_pickle(cls, data, chunks: List[Document]) -> 'LiteralIndex':
+        """Carrega formato salvo; formato antigo (chave = artigo) é reconstruído dos chunks"""
+
+        if isinstance(data, dict) and data.get('version') == cls.FORMAT_VERSION:
+            return cls(data['entries'], data['aliases'])
+
+        return cls.from_chunks(chunks)
+
+    def to_pickle(self) -> Dict:
+        return {
+            'version': self.FORMAT_VERSION,
+            'entries': self.entries,
+            'aliases': self.aliases
+        }
+
+    def __len__(self) -> int:
+        return len(self._documents_by_article)
+
+    def __contains__(self, article_num: str) -> bool:
+        return article_num in self._documents_by_article
+
+    def articles(self) -> List[str]:
+        return sorted(self._documents_by_article, key=int)
+
+    def documents(self) -> List[str]:
+        return sorted({document for document, _ in self.entries})
+
+    def documents_for(self, article_num: str) -> List[str]:
+        return self._documents_by_article.get(article_num, [])
+
+    def lookup(self, article_num: str, documents: Optional[List[str]] = None) -> List[int]:
+        """Ids dos chunks do artigo nos documentos indicados (todos, se None)"""
+
+        if documents is None:
+            documents = self.documents_for(article_num)
+
+        ids = []
+        for document in documents:
+            ids.extend(self.entries.get((document, article_num), []))
+
+        return ids
+
+    def detect_documents(self, query: str) -> List[str]:
+        """Documentos cujo alias aparece na query (alias mais longo vence)"""
+
+        normalized = f" {normalize_alias(query)} "
+
+        for alias in self._sorted_aliases:
+            if f" {alias} " in normalized:
+                return self.aliases[alias]
+
+        return []
+
+
+def build_document_aliases(chunks: List[Document], header_texts: Optional[Dict[str, str]] = None) -> Dict[str, List[str]]:
+    """Pré-calcula aliases por documento a partir do nome do arquivo e do cabeçalho"""
+
+    header_texts = dict(header_texts or {})
+
+    # Sem cabeçalho do PDF (vectorstore antigo): usar o início do primeiro chunk
+    for chunk in chunks:
+        source = chunk.metadata.get('source', '')
+        header_texts.setdefault(source, chunk.page_content[:500])
+
+    aliases = {}
+
+    complementar_pattern = re.compile(
+        r'\bLei\s+Complementar\s*(?:n[º°o.]*\s*)?(\d+)\s*[/\s]\s*(\d{4})', re.IGNORECASE
+    )
+    lei_pattern = re.compile(
+        r'\bLei\s*(?:Municipal\s*)?(?:n[º°o.]*\s*)(\d+)\s*[/\s]\s*(\d{4})', re.IGNORECASE
+    )
+
+    for source, header in header_texts.items():
+        filename = source.replace('-', ' ').replace('_', ' ')
+        names = {filename}
+        laws = []
+
+        # Nome do arquivo: todas as referências; cabeçalho: só a primeira (o título),
+        # pois o preâmbulo costuma citar leis alteradas ou revogadas
+        for text, limit in ((filename, None), (header, 1)):
+            for pattern, kind in ((complementar_pattern, 'LC'), (lei_pattern, 'Lei')):
+                matches = list(pattern.finditer(text))[:limit]
+                laws.extend((kind, m.group(1), m.group(2)) for m in matches)
+
+        for kind, number, year in laws:
+            if kind == 'LC':
+                names.update({
+                    f"Lei Complementar {number}/{year}",
+                    f"LC {number}/{year}",
+                    f"LC {number}"
+                })
+            else:
+                names.add(f"Lei {number}/{year}")
+
+        text = f"{filename}\n{header}"
+        if re.search(r'plano\s+diretor', text, re.IGNORECASE):
+            names.add("Plano Diretor")
+
+        for name in names:
+            alias = normalize_alias(name)
+            if len(alias) < 2:
+                continue
+            documents = aliases.setdefault(alias, [])
+            if source not in documents:
+                documents.append(source)
+
+    return aliases
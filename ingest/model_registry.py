@@ -0,0 +1,131 @@
+import os
+import time
+import threading
+from typing import Any, Callable, Dict, List, Optional
+import numpy as np
+import psutil
+from langchain_core.embeddings import Embeddings
+
+try:
+    from .onnx_encoder import OnnxEncoder, DEFAULT_MODEL_NAME, resolve_backend
+except ImportError:
+    from onnx_encoder import OnnxEncoder, DEFAULT_MODEL_NAME, resolve_backend
+
+
+class ModelRegistry:
+    """Registro de modelos do processo: cada modelo é carregado uma única vez
+
+    O carregamento é preguiçoso e protegido por um lock por chave, de modo que
+    VectorStore, SelfCheck e o avaliador RAGAS compartilham a mesma instância
+    mesmo quando inicializados em threads diferentes.
+    """
+
+    def __init__(self):
+        self._models = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+        self._load_locks = {}
+
+    def get(self, key: str, loader: Callable[[], Any]) -> Any:
+        """Retorna o modelo da chave, chamando loader() apenas na primeira vez"""
+
+        with self._lock:
+            if key in self._models:
+                return self._models[key]
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        with load_lock:
+            with self._lock:
+                if key in self._models:
+                    return self._models[key]
+
+            process = psutil.Process()
+            rss_before = process.memory_info().rss
+            start = time.perf_counter()
+
+            model = loader()
+
+            stats = {
+                "load_seconds": round(time.perf_counter() - start, 3),
+                "memory_mb": round((process.memory_info().rss - rss_before) / 1024 / 1024, 1)
+            }
+
+            with self._lock:
+                self._models[key] = model
+                self._stats[key] = stats
+
+        return model
+
+    def loaded(self) -> List[str]:
+        with self._lock:
+            return list(self._models)
+
+    def describe(self) -> Dict[str, Dict[str, float]]:
+        """Tempo de carga e memória (delta de RSS) de cada modelo carregado"""
+
+        with self._lock:
+            return {key: dict(stats) for key, stats in self._stats.items()}
+
+
+registry = ModelRegistry()
+
+
+def _full_model_name(model_name: str) -> str:
+    # "all-MiniLM-L6-v2" e "sentence-transformers/all-MiniLM-L6-v2" são o mesmo modelo
+    return model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+
+
+def get_encoder(model_name: str = DEFAULT_MODEL_NAME, backend: Optional[str] = None):
+    """Encoder compartilhado com interface encode() do SentenceTransformer"""
+
+    model_name = _full_model_name(model_name)
+    backend = resolve_backend(backend)
+
+    if backend == "onnx":
+        model_dir = os.getenv("ONNX_MODEL_DIR") or ""
+        return registry.get(f"onnx:{model_name}:{model_dir}", lambda: OnnxEncoder(model_dir or None))
+
+    def load_torch():
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(model_name, device="cpu")
+
+    return registry.get(f"torch:{model_name}", load_torch)
+
+
+class LazyEncoder:
+    """Encoder do registro resolvido só no primeiro encode()
+
+    Construir agentes, shards frios ou o CLI não carrega o modelo; quem nunca
+    codifica nada não paga a carga do MiniLM.
+    """
+
+    def __init__(self, model_name: str = DEFAULT_MODEL_NAME, backend: Optional[str] = None):
+        self.model_name = model_name
+        self.backend = backend
+
+    @property
+    def model(self):
+        return get_encoder(self.model_name, self.backend)
+
+    def encode(self, *args, **kwargs):
+        return self.model.encode(*args, **kwargs)
+
+
+class SharedEmbeddings(Embeddings):
+    """Adaptador LangChain (FAISS, RAGAS) sobre o encoder do registro, carregado no primeiro uso"""
+
+    def __init__(self, model_name: str = DEFAULT_MODEL_NAME, backend: Optional[str] = None,
+                 normalize: bool = True):
+        self.model_name = _full_model_name(model_name)
+        self.backend = resolve_backend(backend)
+        self.normalize = normalize
+        self.encoder = LazyEncoder(self.model_name, self.backend)
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        return np.asarray(self.encoder.encode(texts, normalize_embeddings=self.normalize), dtype=np.float32)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.encode(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.encode([text])[0].tolist()
@@ -0,0 +1,162 @@
+import os
+import sys
+from typing import List, Optional, Union
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+DEFAULT_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+DEFAULT_ONNX_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                "models", "all-MiniLM-L6-v2-onnx")
+
+BACKEND_ENV = "EMBEDDING_BACKEND"  # "torch" (padrão) ou "onnx"
+ONNX_DIR_ENV = "ONNX_MODEL_DIR"
+
+FP32_FILE = "model.onnx"
+INT8_FILE = "model_int8.onnx"
+
+
+def resolve_backend(backend: Optional[str] = None) -> str:
+    """Backend de embeddings: parâmetro explícito, variável de ambiente ou torch"""
+
+    backend = (backend or os.getenv(BACKEND_ENV) or "torch").lower()
+    if backend not in ("torch", "onnx"):
+        raise ValueError(f"Backend de embeddings desconhecido: {backend}")
+
+    return backend
+
+
+class OnnxEncoder(Embeddings):
+    """Encoder MiniLM em ONNX Runtime (int8) sem dependência de torch
+
+    Reproduz o pipeline do sentence-transformers: tokenização, mean pooling
+    pela attention mask e normalização L2. Implementa a interface Embeddings
+    do LangChain (para o FAISS) e encode() no estilo SentenceTransformer
+    (para o SelfCheck).
+    """
+
+    def __init__(self, model_dir: Optional[str] = None, quantized: bool = True,
+                 max_length: int = 256, num_threads: Optional[int] = None):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        self.model_dir = model_dir or os.getenv(ONNX_DIR_ENV) or DEFAULT_ONNX_DIR
+        self.model_path = os.path.join(self.model_dir, INT8_FILE if quantized else FP32_FILE)
+
+        if not os.path.exists(self.model_path):
+            raise FileNotFoundError(
+                f"Modelo ONNX não encontrado em: {self.model_path}. "
+                f"Execute: python ingest/onnx_encoder.py export {self.model_dir}"
+            )
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(self.model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.enable_padding()
+
+        options = ort.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(self.model_path, options, providers=["CPUExecutionProvider"])
+        self._input_names = {i.name for i in self.session.get_inputs()}
+
+    def encode(self, sentences: Union[str, List[str]], batch_size: int = 32,
+               normalize_embeddings: bool = True, **kwargs) -> np.ndarray:
+        """Embeddings (n, d) em float32; string única retorna vetor (d,)"""
+
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+
+        batches = [self._encode_batch(texts[i:i + batch_size]) for i in range(0, len(texts), batch_size)]
+        embeddings = np.vstack(batches) if batches else np.empty((0, 0), dtype=np.float32)
+
+        if normalize_embeddings and len(embeddings):
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            embeddings = embeddings / np.clip(norms, 1e-12, None)
+
+        return embeddings[0] if single else embeddings
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+
+        inputs = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self._input_names:
+            inputs["token_type_ids"] = np.zeros_like(input_ids)
+
+        token_embeddings = self.session.run(None, inputs)[0]
+
+        # Mean pooling considerando apenas tokens reais
+        mask = attention_mask[..., None].astype(np.float32)
+        summed = (token_embeddings * mask).sum(axis=1)
+
+        return (summed / np.clip(mask.sum(axis=1), 1e-9, None)).astype(np.float32)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.encode(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.encode(text).tolist()
+
+
+def export_onnx(output_dir: str = DEFAULT_ONNX_DIR, model_name: str = DEFAULT_MODEL_NAME,
+                opset: int = 14) -> str:
+    """Exporta o encoder para ONNX (fp32) e gera a versão quantizada int8"""
+
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    os.makedirs(output_dir, exist_ok=True)
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    encoder = AutoModel.from_pretrained(model_name)
+    encoder.eval()
+
+    # Assinatura posicional fixa, independente da versão do transformers
+    class _Wrapper(torch.nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_ids, attention_mask, token_type_ids):
+            return self.model(input_ids=input_ids, attention_mask=attention_mask,
+                              token_type_ids=token_type_ids).last_hidden_state
+
+    model = _Wrapper(encoder)
+
+    sample = tokenizer(["Plano Diretor"], return_tensors="pt")
+    input_names = ["input_ids", "attention_mask", "token_type_ids"]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+    fp32_path = os.path.join(output_dir, FP32_FILE)
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(sample[name] for name in input_names),
+            fp32_path,
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset,
+            dynamo=False
+        )
+
+    int8_path = os.path.join(output_dir, INT8_FILE)
+    quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+
+    # tokenizer.json é o único artefato necessário em tempo de execução além do modelo
+    tokenizer.save_pretrained(output_dir)
+
+    print(f"Modelo fp32: {fp32_path} ({os.path.getsize(fp32_path) / 1024 / 1024:.1f} MB)")
+    print(f"Modelo int8: {int8_path} ({os.path.getsize(int8_path) / 1024 / 1024:.1f} MB)")
+
+    return int8_path
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 2 and sys.argv[1] == "export":
+        export_onnx(sys.argv[2] if len(sys.argv) > 2 else DEFAULT_ONNX_DIR)
+    else:
+        print("Uso: python ingest/onnx_encoder.py export [diretório_saída]")
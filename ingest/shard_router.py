@@ -0,0 +1,234 @@
+import os
+import json
+import heapq
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import List, Dict, Tuple, Optional, Any
+import numpy as np
+
+try:
+    from .vector_store import VectorStore, RetrievalHit, read_index_version
+    from .literal_index import normalize_alias
+except ImportError:
+    from vector_store import VectorStore, RetrievalHit, read_index_version
+    from literal_index import normalize_alias
+
+
+# Literais e definições têm pseudo-scores; distâncias L2 (semântica) só se comparam entre si
+EXACT_MATCH_TYPES = {"literal", "definition"}
+
+
+def merge_key(hit: RetrievalHit) -> Tuple[int, float]:
+    """Ordem entre shards: correspondências exatas antes das semânticas, depois o score"""
+
+    return (0 if hit.match_type in EXACT_MATCH_TYPES else 1, hit.score)
+
+
+class ShardRouter:
+    """Roteia buscas entre vectorstores por município ou família de leis
+
+    Cada shard é um vectorstore completo (index.faiss, chunks.pkl...) carregado
+    sob demanda. Queries com escopo vão só ao shard do escopo; as demais são
+    buscadas em paralelo em todos os shards e os top-k são combinados por heap.
+    Shards frios são descarregados quando o orçamento de memória é excedido.
+    """
+
+    MANIFEST = "shards.json"
+
+    def __init__(self, root_path: str, shards: Dict[str, Dict[str, Any]],
+                 memory_budget_mb: int = 1024, max_workers: int = 4,
+                 embedding_backend: Optional[str] = None):
+        self.root_path = root_path
+        self.shards = shards
+        self.embedding_backend = embedding_backend
+        self.memory_budget = memory_budget_mb * 1024 * 1024
+
+        self._loaded = OrderedDict()  # nome → VectorStore, em ordem de uso (LRU)
+        self._footprints = {}
+        self._lock = threading.Lock()
+        self._load_locks = {name: threading.Lock() for name in shards}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="shard")
+
+        self._aliases = {}
+        for name, config in shards.items():
+            for alias in [name.replace('_', ' ')] + config.get('aliases', []):
+                self._aliases[normalize_alias(alias)] = name
+        self._sorted_aliases = sorted(self._aliases, key=len, reverse=True)
+
+    @classmethod
+    def is_sharded(cls, root_path: str) -> bool:
+        return os.path.exists(os.path.join(root_path, cls.MANIFEST))
+
+    @classmethod
+    def from_manifest(cls, root_path: str, embedding_backend: Optional[str] = None) -> 'ShardRouter':
+        with open(os.path.join(root_path, cls.MANIFEST), encoding="utf-8") as f:
+            manifest = json.load(f)
+
+        return cls(
+            root_path,
+            manifest["shards"],
+            memory_budget_mb=manifest.get("memory_budget_mb", 1024),
+            max_workers=manifest.get("max_workers", 4),
+            embedding_backend=embedding_backend
+        )
+
+    def get_shard(self, name: str) -> VectorStore:
+        """Retorna o shard carregado, carregando-o se necessário"""
+
+        with self._lock:
+            store = self._loaded.get(name)
+            if store is not None:
+                self._loaded.move_to_end(name)
+                return store
+
+        if name not in self.shards:
+            raise KeyError(f"Shard desconhecido: {name}")
+
+        # Lock por shard: carregamentos de shards diferentes não se bloqueiam
+        with self._load_locks[name]:
+            with self._lock:
+                if name in self._loaded:
+                    return self._loaded[name]
+
+            path = os.path.join(self.root_path, self.shards[name].get("path", name))
+            store = VectorStore(path, name=name, embedding_backend=self.embedding_backend)
+            store.load()
+
+            with self._lock:
+                self._loaded[name] = store
+                self._footprints[name] = store.memory_footprint()
+                self._evict(keep=name)
+
+        return store
+
+    def _evict(self, keep: str):
+        """Descarrega shards menos usados até caber no orçamento (chamado com _lock)"""
+
+        while sum(self._footprints.values()) > self.memory_budget and len(self._loaded) > 1:
+            oldest = next(name for name in self._loaded if name != keep)
+            # Buscas em andamento mantêm a própria referência ao VectorStore
+            del self._loaded[oldest]
+            del self._footprints[oldest]
+
+    @property
+    def index_version(self) -> str:
+        """Versão combinada dos shards, lida dos arquivos sem carregar os índices"""
+
+        versions = "|".join(
+            f"{name}:{read_index_version(os.path.join(self.root_path, config.get('path', name)))}"
+            for name, config in sorted(self.shards.items())
+        )
+        return hashlib.sha256(versions.encode("utf-8")).hexdigest()[:16]
+
+    def loaded_shards(self) -> List[str]:
+        with self._lock:
+            return list(self._loaded)
+
+    def route(self, query: str, filters: Optional[Dict[str, Any]] = None) -> List[str]:
+        """Shards a consultar: escopo explícito, município citado na query ou todos"""
+
+        scope = (filters or {}).get("shard")
+        if scope:
+            return [scope] if isinstance(scope, str) else list(scope)
+
+        normalized = f" {normalize_alias(query)} "
+        for alias in self._sorted_aliases:
+            if f" {alias} " in normalized:
+                return [self._aliases[alias]]
+
+        return list(self.shards)
+
+    def _shard_filters(self, filters: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        if not filters:
+            return None
+        return {key: value for key, value in filters.items() if key != "shard"} or None
+
+    def search_hits(self, query: str, k: int = 5,
+                    filters: Optional[Dict[str, Any]] = None,
+                    query_vector=None) -> List[RetrievalHit]:
+        """Busca nos shards roteados e combina os top-k por tipo de correspondência e score"""
+
+        shard_names = self.route(query, filters)
+        shard_filters = self._shard_filters(filters)
+
+        if len(shard_names) == 1:
+            return self.get_shard(shard_names[0]).search_hits(query, k, shard_filters, query_vector)
+
+        # Embedding da query calculado uma vez e compartilhado entre os shards
+        if query_vector is None:
+            query_vector = self.get_shard(shard_names[0]).encode_queries([query])
+
+        def search_shard(name: str) -> List[RetrievalHit]:
+            return self.get_shard(name).search_hits(query, k, shard_filters, query_vector)
+
+        per_shard = [sorted(hits, key=merge_key) for hits in self._executor.map(search_shard, shard_names)]
+
+        # Scores só são comparáveis dentro do mesmo tipo de correspondência: merge por (prioridade, score)
+        return list(islice(heapq.merge(*per_shard, key=merge_key), k))
+
+    def search(self, query: str, k: int = 5,
+               filters: Optional[Dict[str, Any]] = None) -> List[Tuple[Any, float]]:
+        return [(hit.document, hit.score) for hit in self.search_hits(query, k, filters)]
+
+    def encode_queries(self, queries: List[str]) -> np.ndarray:
+        """Embeddings em lote; os shards compartilham o modelo, basta o encoder de um deles"""
+
+        return self.get_shard(next(iter(self.shards))).encode_queries(queries)
+
+    def vectors_for_hits(self, hits: List[RetrievalHit]):
+        """Vetores armazenados, reconstruídos em cada shard de origem"""
+
+        by_shard = {}
+        for position, hit in enumerate(hits):
+            by_shard.setdefault(hit.shard, []).append(position)
+
+        vectors = [None] * len(hits)
+        for name, positions in by_shard.items():
+            shard_vectors = self.get_shard(name).vectors_for_hits([hits[p] for p in positions])
+            for position, vector in zip(positions, shard_vectors):
+                vectors[position] = vector
+
+        return np.stack(vectors)
+
+    def article_hits(self, query: str, article_num: str,
+                     filters: Optional[Dict[str, Any]] = None) -> List[RetrievalHit]:
+        """Hits literais do artigo nos shards roteados, sem encode"""
+
+        shard_filters = self._shard_filters(filters)
+
+        hits = []
+        for name in self.route(query, filters):
+            hits.extend(self.get_shard(name).article_hits(query, article_num, shard_filters))
+
+        return hits
+
+    def find_definitions(self, query: str, filters: Optional[Dict[str, Any]] = None) -> List[Tuple[RetrievalHit, Dict]]:
+        shard_filters = self._shard_filters(filters)
+
+        results = []
+        for name in self.route(query, filters):
+            results.extend(self.get_shard(name).find_definitions(query, shard_filters))
+
+        return results
+
+    def describe(self) -> Dict[str, Any]:
+        """Resumo dos shards configurados e carregados"""
+
+        with self._lock:
+            loaded = {
+                name: {
+                    "chunks": len(store.chunks),
+                    "articles": len(store.literal_index),
+                    "memory_mb": round(self._footprints[name] / 1024 / 1024, 1)
+                }
+                for name, store in self._loaded.items()
+            }
+
+        return {
+            "shards": list(self.shards),
+            "loaded": loaded,
+            "memory_budget_mb": self.memory_budget // (1024 * 1024)
+        }
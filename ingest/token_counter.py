@@ -0,0 +1,42 @@
+import threading
+from typing import Optional
+
+# Tokenizer da família GPT-OSS; sem tiktoken, estimativa por caracteres
+ENCODING_NAME = "o200k_base"
+
+_encoding = None
+_encoding_loaded = False
+_lock = threading.Lock()
+
+
+def _get_encoding():
+    global _encoding, _encoding_loaded
+
+    with _lock:
+        if not _encoding_loaded:
+            try:
+                import tiktoken
+                _encoding = tiktoken.get_encoding(ENCODING_NAME)
+            except Exception:
+                _encoding = None
+            _encoding_loaded = True
+
+    return _encoding
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 caracteres por token em português
+    return len(text) // 4 + 1
+
+
+def count_tokens(text: Optional[str]) -> int:
+    """Tokens do texto no tokenizer do LLM (tiktoken) ou estimativa, se indisponível"""
+
+    if not text:
+        return 0
+
+    encoding = _get_encoding()
+    if encoding is None:
+        return estimate_tokens(text)
+
+    return len(encoding.encode(text, disallowed_special=()))
@@ -1,34 +1,93 @@
 from langchain_community.vectorstores import FAISS
-from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_core.documents import Document
 import os
 import re
+import json
+import uuid
 import pickle
-from typing import List, Dict, Tuple
+from datetime import datetime
+import numpy as np
+import faiss
+from dataclasses import dataclass, field
+from typing import List, Dict, Tuple, Optional, Any
+
+try:
+    from .definitions import DefinitionExtractor, DefinitionIndex, normalize_term
+    from .literal_index import LiteralIndex
+    from .model_registry import SharedEmbeddings
+except ImportError:
+    from definitions import DefinitionExtractor, DefinitionIndex, normalize_term
+    from literal_index import LiteralIndex
+    from model_registry import SharedEmbeddings
+
+
+INDEX_VERSION_FILE = "index_version.json"
+
+
+def read_index_version(vectorstore_path: str) -> str:
+    """Versão do build do índice (gravada na ingestão); vectorstores antigos usam o mtime do FAISS"""
+    
+    version_path = os.path.join(vectorstore_path, INDEX_VERSION_FILE)
+    if os.path.exists(version_path):
+        with open(version_path, encoding="utf-8") as f:
+            return json.load(f)["version"]
+    
+    index_path = os.path.join(vectorstore_path, "index.faiss")
+    if os.path.exists(index_path):
+        return f"mtime-{int(os.path.getmtime(index_path))}"
+    
+    return "desconhecida"
+
+
+@dataclass(frozen=True)
+class RetrievalHit:
+    """Resultado de busca imutável que aponta para o chunk compartilhado (somente leitura)"""
+    
+    chunk_id: int
+    score: float
+    match_type: str
+    document: Document = field(repr=False, compare=False)
+    shard: str = ""
 
 
 class VectorStore:
     """Vector store que combina FAISS com busca literal"""
     
-    def __init__(self, vectorstore_path: str):
+    FILTER_FIELDS = ('source', 'chunk_type')
+    
+    def __init__(self, vectorstore_path: str, name: str = "", embedding_backend: Optional[str] = None):
         self.vectorstore_path = vectorstore_path
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/all-MiniLM-L6-v2",
-            model_kwargs={'device': 'cpu'},
-            encode_kwargs={'normalize_embeddings': True}
-        )
+        self.name = name
+        
+        # Encoder compartilhado pelo processo (carregado uma vez no registro de modelos)
+        self.embeddings = SharedEmbeddings(backend=embedding_backend)
+        self.embedding_backend = self.embeddings.backend
+        
         self.vectorstore = None
-        self.literal_index = {}
+        self.index = None
+        self.direct_search = False
+        self._chunk_ids_by_content = {}
+        self._metadata_bitmaps = {}
+        self._article_numbers = np.empty(0, dtype=np.int32)
+        self.literal_index = LiteralIndex()
         self.chunks = []
+        self.definitions = DefinitionIndex()
+        self.index_version = ""
     
-    def create_from_documents(self, documents: List[Document], literal_index: Dict):
+    def create_from_documents(self, documents: List[Document], literal_index: Optional[LiteralIndex] = None,
+                              definitions: Dict = None):
         """Cria vectorstore a partir dos documentos"""
         
         self.chunks = documents
-        self.literal_index = literal_index
+        self.literal_index = literal_index or LiteralIndex.from_chunks(documents)
+        
+        if definitions is None:
+            definitions = DefinitionExtractor().extract(documents)
+        self.definitions = DefinitionIndex(definitions)
         
         # Criar vectorstore FAISS
         self.vectorstore = FAISS.from_documents(documents, self.embeddings)
+        self._enable_direct_search()
         
         # Salvar tudo
         self.save()
@@ -42,12 +101,22 @@ class VectorStore:
         # Salvar índice literal
         literal_path = f"{self.vectorstore_path}/literal_index.pkl"
         with open(literal_path, 'wb') as f:
-            pickle.dump(self.literal_index, f)
+            pickle.dump(self.literal_index.to_pickle(), f)
         
         # Salvar chunks originais
         chunks_path = f"{self.vectorstore_path}/chunks.pkl"
         with open(chunks_path, 'wb') as f:
             pickle.dump(self.chunks, f)
+        
+        # Salvar dicionário de definições
+        definitions_path = f"{self.vectorstore_path}/definitions.pkl"
+        with open(definitions_path, 'wb') as f:
+            pickle.dump(self.definitions.definitions, f)
+        
+        # Nova versão a cada build: invalida caches de respostas do índice anterior
+        self.index_version = f"{datetime.now().strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        with open(os.path.join(self.vectorstore_path, INDEX_VERSION_FILE), 'w', encoding="utf-8") as f:
+            json.dump({"version": self.index_version, "chunks": len(self.chunks)}, f)
     
     def load(self):
         """Carrega vectorstore e índice literal"""
@@ -59,20 +128,310 @@ class VectorStore:
             allow_dangerous_deserialization=True
         )
         
-        # Carregar índice literal
-        literal_path = f"{self.vectorstore_path}/literal_index.pkl"
-        if os.path.exists(literal_path):
-            with open(literal_path, 'rb') as f:
-                self.literal_index = pickle.load(f)
-        
         # Carregar chunks originais
         chunks_path = f"{self.vectorstore_path}/chunks.pkl"
         if os.path.exists(chunks_path):
             with open(chunks_path, 'rb') as f:
                 self.chunks = pickle.load(f)
+        
+        # Carregar índice literal (formato antigo por artigo é reconstruído dos chunks)
+        literal_path = f"{self.vectorstore_path}/literal_index.pkl"
+        if os.path.exists(literal_path):
+            with open(literal_path, 'rb') as f:
+                self.literal_index = LiteralIndex.from_pickle(pickle.load(f), self.chunks)
+        else:
+            self.literal_index = LiteralIndex.from_chunks(self.chunks)
+        
+        # Carregar dicionário de definições (vectorstores antigos: extrair dos chunks)
+        definitions_path = f"{self.vectorstore_path}/definitions.pkl"
+        if os.path.exists(definitions_path):
+            with open(definitions_path, 'rb') as f:
+                self.definitions = DefinitionIndex(pickle.load(f))
+        else:
+            self.definitions = DefinitionIndex(DefinitionExtractor().extract(self.chunks))
+        
+        self.index_version = read_index_version(self.vectorstore_path)
+        self._enable_direct_search()
+    
+    def _enable_direct_search(self):
+        """Ativa busca direta no índice FAISS se posições e chunks.pkl estão alinhados"""
+        
+        self.index = self.vectorstore.index
+        self.direct_search = self._positions_match_chunks()
+        self._build_metadata_bitmaps()
+        
+        # Fallback pelo wrapper: recuperar o id do chunk pelo conteúdo
+        self._chunk_ids_by_content = {} if self.direct_search else {
+            chunk.page_content: idx for idx, chunk in enumerate(self.chunks)
+        }
+    
+    def _positions_match_chunks(self) -> bool:
+        if self.index.ntotal != len(self.chunks) or not self.chunks:
+            return False
+        
+        # from_documents indexa na ordem dos chunks: conferir as extremidades
+        id_map = self.vectorstore.index_to_docstore_id
+        for position in (0, len(self.chunks) - 1):
+            doc = self.vectorstore.docstore.search(id_map[position])
+            if not isinstance(doc, Document) or doc.page_content != self.chunks[position].page_content:
+                return False
+        
+        return True
+    
+    def _build_metadata_bitmaps(self):
+        """Pré-calcula bitmaps por valor de metadado para filtros dentro do FAISS"""
+        
+        self._metadata_bitmaps = {field_name: {} for field_name in self.FILTER_FIELDS}
+        self._article_numbers = np.full(len(self.chunks), -1, dtype=np.int32)
+        
+        for idx, chunk in enumerate(self.chunks):
+            for field_name in self.FILTER_FIELDS:
+                value = chunk.metadata.get(field_name)
+                if value is None:
+                    continue
+                bitmap = self._metadata_bitmaps[field_name].get(value)
+                if bitmap is None:
+                    bitmap = np.zeros(len(self.chunks), dtype=bool)
+                    self._metadata_bitmaps[field_name][value] = bitmap
+                bitmap[idx] = True
+            
+            article_num = chunk.metadata.get('article_number')
+            if article_num and str(article_num).isdigit():
+                self._article_numbers[idx] = int(article_num)
     
-    def search(self, query: str, k: int = 5) -> List[Tuple[Document, float]]:
-        """Busca que combina literal e semântica"""
+    def _filter_mask(self, filters: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+        """Combina os bitmaps dos filtros em uma máscara booleana por chunk"""
+        
+        if not filters:
+            return None
+        
+        mask = np.ones(len(self.chunks), dtype=bool)
+        
+        for key, value in filters.items():
+            if key in self.FILTER_FIELDS:
+                values = [value] if isinstance(value, str) else list(value)
+                field_mask = np.zeros(len(self.chunks), dtype=bool)
+                for v in values:
+                    bitmap = self._metadata_bitmaps[key].get(v)
+                    if bitmap is not None:
+                        field_mask |= bitmap
+                mask &= field_mask
+            elif key == 'article_range':
+                start, end = value
+                mask &= (self._article_numbers >= int(start)) & (self._article_numbers <= int(end))
+            else:
+                raise ValueError(f"Filtro não suportado: {key}")
+        
+        return mask
+    
+    def _rank_literal(self, query: str, article_num: str, chunk_ids: List[int]) -> List[RetrievalHit]:
+        """Ordena candidatos literais sem embeddings
+        
+        O próprio artigo (e suas partes, em ordem) vem antes de chunks que apenas
+        o mencionam; dentro de cada faixa, desempata pela sobreposição lexical
+        entre a query e o chunk.
+        """
+        
+        query_text = re.sub(r'(?:Art\.?|Artigo)\s*\d+', ' ', query, flags=re.IGNORECASE)
+        query_terms = {w for w in normalize_term(query_text).split() if len(w) > 3}
+        
+        hits = []
+        for idx in dict.fromkeys(chunk_ids):
+            chunk = self.chunks[idx]
+            overlap = 0.0
+            if query_terms:
+                chunk_terms = set(normalize_term(chunk.page_content).split())
+                overlap = len(query_terms & chunk_terms) / len(query_terms)
+            
+            base = 0.0 if chunk.metadata.get('article_number') == article_num else 0.15
+            part = min(chunk.metadata.get('part_index', 0), 4)
+            hits.append(self._hit(idx, base + 0.1 * (1 - overlap) + 0.01 * part, 'literal'))
+        
+        return sorted(hits, key=lambda hit: hit.score)
+    
+    def _literal_hits(self, query: str, article_num: str, documents: List[str],
+                      mask: Optional[np.ndarray]) -> List[RetrievalHit]:
+        chunk_indices = [
+            idx for idx in self.literal_index.lookup(article_num, documents or None)
+            if idx < len(self.chunks) and (mask is None or mask[idx])
+        ]
+        return self._rank_literal(query, article_num, chunk_indices) if chunk_indices else []
+    
+    def article_hits(self, query: str, article_num: str,
+                     filters: Optional[Dict[str, Any]] = None) -> List[RetrievalHit]:
+        """Só o índice literal (documento, artigo): sem encode nem busca semântica; [] se ausente"""
+        
+        mask = self._filter_mask(filters)
+        documents = self.literal_index.detect_documents(query)
+        if documents:
+            document_mask = self._filter_mask({'source': documents})
+            mask = document_mask if mask is None else mask & document_mask
+        
+        return self._literal_hits(query, article_num, documents, mask)
+    
+    def vectors_for_hits(self, hits: List[RetrievalHit]) -> np.ndarray:
+        """Vetores armazenados no índice para os hits (sem novo encode)"""
+        
+        ids = np.array([hit.chunk_id for hit in hits], dtype=np.int64)
+        return self.index.reconstruct_batch(ids)
+    
+    def memory_footprint(self) -> int:
+        """Estimativa em bytes do índice FAISS + textos dos chunks em memória"""
+        
+        index_bytes = self.index.ntotal * self.index.d * 4 if self.index is not None else 0
+        text_bytes = sum(len(chunk.page_content) for chunk in self.chunks) * 2
+        
+        return index_bytes + text_bytes
+    
+    def _hit(self, chunk_id: int, score: float, match_type: str) -> RetrievalHit:
+        return RetrievalHit(int(chunk_id), float(score), match_type, self.chunks[chunk_id], self.name)
+    
+    def _wrapper_hit(self, doc: Document, score: float, match_type: str) -> RetrievalHit:
+        chunk_id = self._chunk_ids_by_content.get(doc.page_content, -1)
+        document = self.chunks[chunk_id] if chunk_id >= 0 else doc
+        return RetrievalHit(chunk_id, float(score), match_type, document, self.name)
+    
+    def encode_queries(self, queries: List[str]) -> np.ndarray:
+        """Codifica queries em lote como matriz float32 (n, d)"""
+        
+        vectors = self.embeddings.embed_documents(queries)
+        return np.asarray(vectors, dtype=np.float32).reshape(len(queries), -1)
+    
+    def search_ids(self, query_vectors: np.ndarray, k: int,
+                   mask: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Busca direta no índice FAISS: retorna (ids de chunk, scores) com shape (n, k)"""
+        
+        query_vectors = np.ascontiguousarray(query_vectors, dtype=np.float32)
+        if query_vectors.ndim == 1:
+            query_vectors = query_vectors.reshape(1, -1)
+        
+        if mask is None:
+            scores, ids = self.index.search(query_vectors, k)
+            return ids, scores
+        
+        # Filtro aplicado dentro da busca: sempre k hits se houver k chunks elegíveis
+        bitmap = np.packbits(mask, bitorder='little')
+        selector = faiss.IDSelectorBitmap(len(mask), faiss.swig_ptr(bitmap))
+        params = faiss.SearchParameters(sel=selector)
+        
+        scores, ids = self.index.search(query_vectors, k, params=params)
+        return ids, scores
+    
+    def _wrapper_search(self, query: str, k: int, mask: Optional[np.ndarray]) -> List[Tuple[Document, float]]:
+        """Busca pelo wrapper LangChain (fallback quando a busca direta está desativada)"""
+        
+        if mask is None:
+            return self.vectorstore.similarity_search_with_score(query, k=k)
+        
+        allowed = {self.chunks[idx].page_content for idx in np.flatnonzero(mask)}
+        results = self.vectorstore.similarity_search_with_score(query, k=len(self.chunks))
+        
+        return [(doc, score) for doc, score in results if doc.page_content in allowed][:k]
+    
+    def _semantic_search(self, query: str, k: int, mask: Optional[np.ndarray] = None,
+                         query_vector: Optional[np.ndarray] = None) -> List[RetrievalHit]:
+        """Busca semântica materializando apenas os top-k"""
+        
+        if not self.direct_search:
+            return [self._wrapper_hit(doc, score, 'semantic')
+                    for doc, score in self._wrapper_search(query, k, mask)]
+        
+        if query_vector is None:
+            query_vector = self.encode_queries([query])
+        
+        ids, scores = self.search_ids(query_vector, k, mask)
+        
+        return [self._hit(idx, score, 'semantic')
+                for idx, score in zip(ids[0], scores[0]) if idx >= 0]
+    
+    def _expanded_article_search(self, article_num: str, k: int,
+                                 mask: Optional[np.ndarray] = None) -> List[RetrievalHit]:
+        """Busca semântica com variações da referência ao artigo"""
+        
+        expanded_queries = [
+            f"Art. {article_num}",
+            f"Artigo {article_num}",
+            f"Art {article_num}",
+            f"diretrizes Art {article_num}",
+            f"política Art {article_num}"
+        ]
+        
+        article_regex = re.compile(rf'\bArt\.?\s*{article_num}\b', re.IGNORECASE)
+        best_scores = {}
+        
+        if self.direct_search:
+            # Todas as variações em um único encode e uma única busca
+            ids, scores = self.search_ids(self.encode_queries(expanded_queries), 3, mask)
+            
+            for idx, score in zip(ids.ravel(), scores.ravel()):
+                if idx < 0 or not article_regex.search(self.chunks[idx].page_content):
+                    continue
+                if idx not in best_scores or score < best_scores[idx]:
+                    best_scores[idx] = float(score)
+            
+            ranked = sorted(best_scores.items(), key=lambda x: x[1])[:k]
+            return [self._hit(idx, score, 'expanded_semantic') for idx, score in ranked]
+        
+        all_semantic_results = []
+        
+        for exp_query in expanded_queries:
+            try:
+                results = self._wrapper_search(exp_query, 3, mask)
+                for doc, score in results:
+                    if article_regex.search(doc.page_content):
+                        all_semantic_results.append((doc, score))
+            except:
+                continue
+        
+        # Ordenar por score e remover duplicatas
+        unique_results = {}
+        for doc, score in all_semantic_results:
+            content_key = doc.page_content[:100]
+            if content_key not in unique_results or score < unique_results[content_key][1]:
+                unique_results[content_key] = (doc, score)
+        
+        ranked = sorted(unique_results.values(), key=lambda x: x[1])[:k]
+        return [self._wrapper_hit(doc, score, 'expanded_semantic') for doc, score in ranked]
+    
+    def find_definitions(self, query: str, filters: Optional[Dict[str, Any]] = None) -> List[Tuple[RetrievalHit, Dict]]:
+        """Chunks que definem o termo perguntado, se a query pede uma definição"""
+        
+        if not self.definitions.is_definition_query(query):
+            return []
+        
+        mask = self._filter_mask(filters)
+        
+        results = []
+        for entry in self.definitions.lookup(query):
+            chunk_id = entry['chunk_id']
+            if chunk_id < len(self.chunks) and (mask is None or mask[chunk_id]):
+                results.append((self._hit(chunk_id, 0.1, 'definition'), entry))
+        
+        return results
+    
+    def search(self, query: str, k: int = 5,
+               filters: Optional[Dict[str, Any]] = None) -> List[Tuple[Document, float]]:
+        """Busca que combina literal e semântica
+        
+        filters restringe a busca por metadados: {'source': ..., 'chunk_type': ...,
+        'article_range': (inicio, fim)}. Valores de source/chunk_type aceitam listas.
+        """
+        
+        return [(hit.document, hit.score) for hit in self.search_hits(query, k, filters)]
+    
+    def search_hits(self, query: str, k: int = 5,
+                    filters: Optional[Dict[str, Any]] = None,
+                    query_vector: Optional[np.ndarray] = None) -> List[RetrievalHit]:
+        """Busca que combina literal e semântica, retornando hits imutáveis
+        
+        query_vector permite reaproveitar o embedding da query já calculado.
+        """
+        
+        mask = self._filter_mask(filters)
+        if mask is not None:
+            if not mask.any():
+                return []
+            k = min(k, int(mask.sum()))
         
         # Detectar busca por artigo específico
         article_pattern = r'(?:Art\.?|Artigo)\s*(\d+)'
@@ -81,50 +440,21 @@ class VectorStore:
         if article_match:
             article_num = article_match.group(1)
             
+            # Documento citado na query ("Plano Diretor", "LC 3/2006"...) restringe a busca
+            documents = self.literal_index.detect_documents(query)
+            if documents:
+                document_mask = self._filter_mask({'source': documents})
+                mask = document_mask if mask is None else mask & document_mask
+            
             # Busca literal primeiro
-            if article_num in self.literal_index:
-                literal_results = []
-                chunk_indices = self.literal_index[article_num]
-                
-                for idx in chunk_indices:
-                    if idx < len(self.chunks):
-                        chunk = self.chunks[idx]
-                        # Score baixo para resultados literais (alta prioridade)
-                        literal_results.append((chunk, 0.1))
-                
-                if literal_results:
-                    return literal_results[:k]
+            literal_hits = self._literal_hits(query, article_num, documents, mask)
+            if literal_hits:
+                return literal_hits[:k]
             
             # Se busca literal não funcionou, tentar semântica com queries expandidas
-            expanded_queries = [
-                f"Art. {article_num}",
-                f"Artigo {article_num}",
-                f"Art {article_num}",
-                f"diretrizes Art {article_num}",
-                f"política Art {article_num}"
-            ]
-            
-            all_semantic_results = []
-            
-            for exp_query in expanded_queries:
-                try:
-                    results = self.vectorstore.similarity_search_with_score(exp_query, k=3)
-                    for doc, score in results:
-                        if re.search(rf'\bArt\.?\s*{article_num}\b', doc.page_content, re.IGNORECASE):
-                            all_semantic_results.append((doc, score))
-                except:
-                    continue
-            
-            if all_semantic_results:
-                # Ordenar por score e remover duplicatas
-                unique_results = {}
-                for doc, score in all_semantic_results:
-                    content_key = doc.page_content[:100]
-                    if content_key not in unique_results or score < unique_results[content_key][1]:
-                        unique_results[content_key] = (doc, score)
-                
-                sorted_results = sorted(unique_results.values(), key=lambda x: x[1])
-                return sorted_results[:k]
+            expanded_results = self._expanded_article_search(article_num, k, mask)
+            if expanded_results:
+                return expanded_results
         
         # Busca semântica padrão
-        return self.vectorstore.similarity_search_with_score(query, k=k)
\ No newline at end of file
+        return self._semantic_search(query, k, mask, query_vector)
\ No newline at end of file
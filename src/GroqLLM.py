@@ -1,26 +1,252 @@
-from groq import Groq
+import time
+import asyncio
+import functools
+import threading
+import weakref
+from groq import Groq, AsyncGroq, APIConnectionError, APIStatusError, APITimeoutError, RateLimitError
+from typing import Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+from llm_backends import LLMBackend
+from llm_resilience import (
+    LLMError, LLMRateLimitError, LLMTimeoutError, LLMUnavailableError, LLMRequestError,
+    RateLimiter, RetryPolicy, shared_rate_limiter, parse_retry_after
+)
+from ingest.token_counter import count_tokens
+from metrics_registry import metrics
 
-class GroqLLM:
-    """Wrapper para a API da Groq"""
-    
-    def __init__(self, api_key: str, model: str):
-        self.client = Groq(api_key=api_key)
+class GroqLLM(LLMBackend):
+    """Wrapper para a API da Groq com retry, limitador de taxa, semáforo e prazo por chamada"""
+
+    def __init__(self, api_key: str, model: str, timeout: float = 60.0, max_concurrency: int = 4,
+                 rate_limiter: Optional[RateLimiter] = None, retry_policy: Optional[RetryPolicy] = None):
+        # Retries ficam a cargo da RetryPolicy (com jitter e limitador compartilhado)
+        self.client = Groq(api_key=api_key, max_retries=0)
+        self.api_key = api_key
+        self._async_clients = weakref.WeakKeyDictionary()
         self.model = model
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter or shared_rate_limiter()
+        self.retry_policy = retry_policy or RetryPolicy()
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
         
-    def generate(self, prompt: str, temperature: float = 0.1, max_tokens: int = 1000) -> str:
+        self._latency = metrics.histogram("llm_request_latency_seconds", "Latência das chamadas ao LLM (até o primeiro byte no streaming)")
+        self._tokens = metrics.counter("llm_tokens_total", "Tokens informados pela API em completion.usage")
+        self._errors = metrics.counter("llm_errors_total", "Falhas do LLM levantadas ao chamador, por tipo")
+        self._retries = metrics.counter("llm_retries_total", "Novas tentativas após falha transitória, por tipo")
+
+    def _record_usage(self, usage):
+        if usage is not None:
+            self._tokens.inc(usage.prompt_tokens, model=self.model, kind="prompt")
+            self._tokens.inc(usage.completion_tokens, model=self.model, kind="completion")
+
+    def _messages(self, prompt: str) -> List[Dict[str, str]]:
+        return [
+            {
+                "role": "system",
+                "content": "Você é um assistente educacional especializado. Responda sempre baseado no contexto fornecido e inclua citações precisas."
+            },
+            {"role": "user", "content": prompt}
+        ]
+
+    def _classify_error(self, error: Exception) -> LLMError:
+        """Converte exceções do SDK da Groq em exceções tipadas"""
+        if isinstance(error, RateLimitError):
+            return LLMRateLimitError(str(error), parse_retry_after(error.response.headers.get("retry-after")))
+        if isinstance(error, APITimeoutError):
+            return LLMTimeoutError(str(error))
+        if isinstance(error, APIConnectionError):
+            return LLMUnavailableError(str(error))
+        if isinstance(error, APIStatusError) and error.status_code >= 500:
+            return LLMUnavailableError(str(error))
+        return LLMRequestError(str(error))
+
+    def _async_client(self) -> AsyncGroq:
+        """Cliente async do event loop atual (conexões httpx não passam de um loop a outro)"""
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = self._async_clients[loop] = AsyncGroq(api_key=self.api_key, max_retries=0)
+        return client
+
+    def _fail(self, error: LLMError) -> LLMError:
+        """Conta a falha em llm_errors_total antes de levantá-la (inclui esperas locais)"""
+        self._errors.inc(type=type(error).__name__)
+        return error
+
+    def _retry_delay(self, error: LLMError, attempt: int, deadline: float) -> float:
+        """Espera antes da próxima tentativa; levanta o erro se não houver nova tentativa"""
+        if not error.retryable or attempt == self.retry_policy.max_retries:
+            raise self._fail(error)
+
+        delay = self.retry_policy.delay(attempt, getattr(error, "retry_after", None))
+        if time.monotonic() + delay >= deadline:
+            raise self._fail(LLMTimeoutError(f"Prazo de {self.timeout:.0f}s esgotado após {attempt + 1} tentativas: {error}"))
+        self._retries.inc(type=type(error).__name__)
+        return delay
+
+    def _call(self, request: Callable[[float], object], prompt: str, max_tokens: int, keep_slot: bool = False):
+        """Executa a requisição respeitando prazo, limitador, semáforo e retries
+
+        Com keep_slot, a vaga do semáforo continua ocupada após o sucesso (streaming)
+        e deve ser liberada por quem consome a resposta.
+        """
+        deadline = time.monotonic() + self.timeout
+        reserved = count_tokens(prompt) + max_tokens
+
+        for attempt in range(self.retry_policy.max_retries + 1):
+            try:
+                self.rate_limiter.acquire(reserved, deadline)
+            except LLMError as e:
+                raise self._fail(e)
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not self._semaphore.acquire(timeout=remaining):
+                self.rate_limiter.tokens.refund(reserved)
+                raise self._fail(LLMTimeoutError(f"Prazo de {self.timeout:.0f}s esgotado aguardando vaga para chamar o LLM"))
+
+            started = time.perf_counter()
+            try:
+                response = request(max(deadline - time.monotonic(), 0.1))
+            except Exception as e:
+                # Tentativa falhou: a reserva de tokens volta ao balde antes do retry
+                self._semaphore.release()
+                self.rate_limiter.tokens.refund(reserved)
+                error = self._classify_error(e)
+            else:
+                if not keep_slot:
+                    self._semaphore.release()
+                self._latency.observe(time.perf_counter() - started, model=self.model)
+                return response, reserved
+
+            time.sleep(self._retry_delay(error, attempt, deadline))
+
+    async def _aacquire_slot(self, deadline: float) -> bool:
+        """Espera bloqueante pela vaga numa thread, até o prazo, sem ocupar o event loop
+
+        O semáforo é o mesmo das chamadas síncronas: o limite de concorrência vale para ambas.
+        """
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+
+        waiting = asyncio.get_running_loop().run_in_executor(
+            None, functools.partial(self._semaphore.acquire, timeout=remaining)
+        )
         try:
-            completion = self.client.chat.completions.create(
+            return await asyncio.shield(waiting)
+        except asyncio.CancelledError:
+            # Tarefa cancelada: a vaga que a thread ainda obtiver é devolvida
+            waiting.add_done_callback(lambda done: done.result() and self._semaphore.release())
+            raise
+
+    async def _acall(self, request: Callable[[float], Awaitable[object]], prompt: str, max_tokens: int):
+        """Como _call, com o cliente async: esperas não bloqueiam o event loop"""
+        deadline = time.monotonic() + self.timeout
+        reserved = count_tokens(prompt) + max_tokens
+
+        for attempt in range(self.retry_policy.max_retries + 1):
+            try:
+                await self.rate_limiter.aacquire(reserved, deadline)
+            except LLMError as e:
+                raise self._fail(e)
+
+            if not await self._aacquire_slot(deadline):
+                self.rate_limiter.tokens.refund(reserved)
+                raise self._fail(LLMTimeoutError(f"Prazo de {self.timeout:.0f}s esgotado aguardando vaga para chamar o LLM"))
+
+            started = time.perf_counter()
+            try:
+                response = await request(max(deadline - time.monotonic(), 0.1))
+            except Exception as e:
+                self.rate_limiter.tokens.refund(reserved)
+                error = self._classify_error(e)
+            else:
+                self._latency.observe(time.perf_counter() - started, model=self.model)
+                return response, reserved
+            finally:
+                self._semaphore.release()
+
+            await asyncio.sleep(self._retry_delay(error, attempt, deadline))
+
+    def _completion_result(self, completion, reserved: int) -> Tuple[str, Optional[int]]:
+        # Devolve ao limitador os tokens reservados e não consumidos
+        usage = getattr(completion, "usage", None)
+        if usage is not None:
+            self.rate_limiter.tokens.refund(reserved - usage.total_tokens)
+        self._record_usage(usage)
+
+        return completion.choices[0].message.content, usage.completion_tokens if usage is not None else None
+
+    def generate(self, prompt: str, temperature: float = 0.1, max_tokens: int = 1000) -> str:
+        """Gera a resposta completa; falhas são levantadas como LLMError"""
+        return self.generate_with_usage(prompt, temperature, max_tokens)[0]
+
+    async def agenerate(self, prompt: str, temperature: float = 0.1, max_tokens: int = 1000) -> str:
+        """Como generate, pelo cliente AsyncGroq"""
+        return (await self.agenerate_with_usage(prompt, temperature, max_tokens))[0]
+
+    def generate_with_usage(self, prompt: str, temperature: float = 0.1,
+                            max_tokens: int = 1000) -> Tuple[str, Optional[int]]:
+        """Resposta e completion.usage.completion_tokens"""
+        completion, reserved = self._call(
+            lambda timeout: self.client.chat.completions.create(
                 model=self.model,
-                messages=[
-                    {
-                        "role": "system", 
-                        "content": "Você é um assistente educacional especializado. Responda sempre baseado no contexto fornecido e inclua citações precisas."
-                    },
-                    {"role": "user", "content": prompt}
-                ],
+                messages=self._messages(prompt),
                 temperature=temperature,
-                max_tokens=max_tokens
-            )
-            return completion.choices[0].message.content
+                max_tokens=max_tokens,
+                timeout=timeout
+            ),
+            prompt, max_tokens
+        )
+        return self._completion_result(completion, reserved)
+
+    async def agenerate_with_usage(self, prompt: str, temperature: float = 0.1,
+                                   max_tokens: int = 1000) -> Tuple[str, Optional[int]]:
+        client = self._async_client()
+        completion, reserved = await self._acall(
+            lambda timeout: client.chat.completions.create(
+                model=self.model,
+                messages=self._messages(prompt),
+                temperature=temperature,
+                max_tokens=max_tokens,
+                timeout=timeout
+            ),
+            prompt, max_tokens
+        )
+        return self._completion_result(completion, reserved)
+
+    def generate_stream(self, prompt: str, temperature: float = 0.1, max_tokens: int = 1000) -> Iterator[str]:
+        """Gera a resposta em partes, à medida que os tokens chegam da API"""
+        stream, reserved = self._call(
+            lambda timeout: self.client.chat.completions.create(
+                model=self.model,
+                messages=self._messages(prompt),
+                temperature=temperature,
+                max_tokens=max_tokens,
+                timeout=timeout,
+                stream=True
+            ),
+            prompt, max_tokens, keep_slot=True
+        )
+
+        parts = []
+        usage = None
+
+        # Após o primeiro byte não há retry: tokens já podem ter sido exibidos
+        try:
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    parts.append(chunk.choices[0].delta.content)
+                    yield chunk.choices[0].delta.content
+                # Último chunk do streaming da Groq traz o uso em x_groq.usage
+                x_groq = getattr(chunk, "x_groq", None)
+                if x_groq is not None and getattr(x_groq, "usage", None) is not None:
+                    usage = x_groq.usage
+                    self._record_usage(usage)
         except Exception as e:
-            return f"Erro na geração de resposta: {str(e)}"
+            raise self._fail(self._classify_error(e))
+        finally:
+            self._semaphore.release()
+
+            # Stream encerrado antes do fim (erro ou consumidor parou): sem usage, estima o consumido
+            used = usage.total_tokens if usage is not None else count_tokens(prompt) + count_tokens("".join(parts))
+            self.rate_limiter.tokens.refund(reserved - used)
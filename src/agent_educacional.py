@@ -1,6 +1,11 @@
 import os
 import sys
 import re
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
 from dotenv import load_dotenv
 
 # Carregar variáveis do arquivo .env
@@ -10,12 +15,25 @@ load_dotenv()
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
 from ingest.vector_store import VectorStore
+from ingest.shard_router import ShardRouter
+from ingest.model_registry import registry, LazyEncoder
+from ingest.onnx_encoder import DEFAULT_MODEL_NAME, resolve_backend
 from agents.retriever import RetrieverAgent
 from agents.answerer import AnswererAgent
+from agents.compressor import CompressorAgent
+from agents.evidence_gate import EvidenceGateAgent
 from agents.self_check import SelfCheckAgent
 from agents.safety import SafetyAgent
 from agents.supervisor import SupervisorAgent
-from GroqLLM import GroqLLM
+from llm_backends import create_llm
+from answer_cache import AnswerCache, SemanticAnswerCache
+from tracing import Tracer
+from metrics_registry import MetricsSink
+from slow_request_profiler import SlowRequestProfiler
+
+
+# Threads do pool de CPU do fluxo async (amostradas pelo SlowRequestProfiler junto com o event loop)
+CPU_THREAD_PREFIX = "rag-cpu"
 
 
 class AgentEducacional:
@@ -25,68 +43,306 @@ class AgentEducacional:
         model: str = "openai/gpt-oss-120b",
         retrieval_k: int = 3,
         similarity_threshold: float = 0.35,
+        use_mmr: bool = False,
+        compress_context: bool = False,
+        evidence_gate: bool = False,
+        embedding_backend: Optional[str] = None,
+        llm_mode: Optional[str] = None,
+        cassette_path: Optional[str] = None,
+        answer_cache_path: Optional[str] = None,
+        semantic_cache_threshold: Optional[float] = None,
+        tracer: Optional[Tracer] = None,
+        collect_metrics: bool = False,
+        slow_request_profiler: Optional[SlowRequestProfiler] = None,
+        cpu_workers: int = 2,
         verbose: bool = True
     ):
         self.api_key = os.getenv("GROQ_API_KEY")
         self.model = model
         self.retrieval_k = retrieval_k
         self.similarity_threshold = similarity_threshold
+        self.use_mmr = use_mmr
+        self.compress_context = compress_context
+        self.use_evidence_gate = evidence_gate
+        self.embedding_backend = embedding_backend
+        self.answer_cache_path = answer_cache_path or os.getenv("ANSWER_CACHE_PATH")
+        if semantic_cache_threshold is None and os.getenv("SEMANTIC_CACHE_THRESHOLD"):
+            semantic_cache_threshold = float(os.getenv("SEMANTIC_CACHE_THRESHOLD"))
+        self.semantic_cache_threshold = semantic_cache_threshold
+        # Amostragem de pilha só com SLOW_REQUEST_SECONDS (ou profiler explícito)
+        self.profiler = slow_request_profiler or SlowRequestProfiler.from_env()
+        
+        # Spans por nó: TRACE_FILE (JSONL) ou TRACE_BUFFER (memória); métricas agregadas via MetricsSink.
+        # Sem nenhum sink o tracer fica desativado e os nós não são envolvidos (custo zero)
+        sinks = [MetricsSink()] if collect_metrics else []
+        if self.profiler is not None:
+            sinks.append(self.profiler)
+        self.tracer = tracer or Tracer.from_env(sinks)
+        # Pool limitado para encode/FAISS no fluxo async (o modelo já usa várias threads internamente)
+        self.executor = ThreadPoolExecutor(max_workers=cpu_workers, thread_name_prefix=CPU_THREAD_PREFIX)
         self.verbose = verbose
              
-        if not self.api_key:
-            raise ValueError("API key não encontrada no .env")
+        # live exige GROQ_API_KEY; replay responde do cassete, offline
+        self.llm = create_llm(self.api_key, self.model, llm_mode, cassette_path)
         
         self._initialize_components(vectorstore_path)
 
     def _initialize_components(self, vectorstore_path: str) -> None:   
         self.vectorstore = self._load_vectorstore(vectorstore_path)
-        self.llm = GroqLLM(self.api_key, self.model)
         
-        self.retriever = RetrieverAgent(self.vectorstore, k=self.retrieval_k)
+        self.retriever = RetrieverAgent(self.vectorstore, k=self.retrieval_k, use_mmr=self.use_mmr)
+        # Opcional: limiares a calibrar com eval/benchmarks/evidence_gate_report.py e o MiniLM real
+        self.evidence_gate = EvidenceGateAgent() if self.use_evidence_gate else None
+        self.compressor = CompressorAgent(embedding_backend=self.embedding_backend) if self.compress_context else None
         self.answerer = AnswererAgent(self.llm)
-        self.self_check = SelfCheckAgent(similarity_threshold=self.similarity_threshold)
+        self.self_check = SelfCheckAgent(
+            similarity_threshold=self.similarity_threshold,
+            embedding_backend=self.embedding_backend,
+            vectorstore=self.vectorstore
+        )
         self.safety = SafetyAgent()
         
+        # Cache de respostas (opcional): chave inclui versão do índice, modelo e template do prompt
+        self.answer_cache = None
+        self.semantic_cache = None
+        if self.answer_cache_path:
+            self.answer_cache = AnswerCache(
+                self.answer_cache_path,
+                index_version=self.vectorstore.index_version,
+                model=self.model,
+                template_hash=self.answerer.template_hash()
+            )
+            
+            # Semântico: mesmo arquivo SQLite, log de qualidade dos acertos ao lado
+            if self.semantic_cache_threshold is not None:
+                self.semantic_cache = SemanticAnswerCache(
+                    self.answer_cache_path,
+                    index_version=self.vectorstore.index_version,
+                    model=self.model,
+                    template_hash=self.answerer.template_hash(),
+                    encoder=LazyEncoder(backend=self.embedding_backend),
+                    threshold=self.semantic_cache_threshold,
+                    log_path=os.getenv("SEMANTIC_CACHE_LOG", self.answer_cache_path + ".semantic.jsonl")
+                )
+        
         self.supervisor = SupervisorAgent(
             self.retriever, 
             self.answerer,
             self.self_check, 
-            self.safety
+            self.safety,
+            compressor=self.compressor,
+            evidence_gate=self.evidence_gate,
+            tracer=self.tracer,
+            answer_cache=self.answer_cache,
+            semantic_cache=self.semantic_cache,
+            executor=self.executor
         )
 
     def _load_vectorstore(self, vectorstore_path: str):
         if not os.path.exists(vectorstore_path):
             raise FileNotFoundError(f"Vectorstore não encontrado em: {vectorstore_path}")
         
+        # Vários municípios: um vectorstore por shard, carregado sob demanda
+        if ShardRouter.is_sharded(vectorstore_path):
+            return ShardRouter.from_manifest(vectorstore_path, embedding_backend=self.embedding_backend)
+        
         required_files = ["index.faiss", "index.pkl", "literal_index.pkl", "chunks.pkl"]
         missing_files = [f for f in required_files if not os.path.exists(os.path.join(vectorstore_path, f))]
         
         if missing_files:
             raise FileNotFoundError(f"Arquivos faltando: {missing_files}. Execute: python ingest/ingest.py ingest/docs")
         
-        store = VectorStore(vectorstore_path)
+        store = VectorStore(vectorstore_path, embedding_backend=self.embedding_backend)
         store.load()
         
         return store
 
-    def ask(self, query: str) -> str:
+    def ask(self, query: str, document_scope: Optional[Dict[str, Any]] = None) -> str:
+        if not query or not query.strip():
+            return "Por favor, faça uma pergunta válida."
+        
+        query = query.strip()
+        
+        if self.profiler is None:
+            return self.supervisor.handle_query(query, document_scope)
+        
+        with self.profiler.profile(query):
+            return self.supervisor.handle_query(query, document_scope)
+
+    async def aask(self, query: str, document_scope: Optional[Dict[str, Any]] = None,
+                   query_vector=None) -> str:
+        """Versão assíncrona de ask: grafo via ainvoke e LLM pelo cliente async"""
         if not query or not query.strip():
             return "Por favor, faça uma pergunta válida."
         
         query = query.strip()
         
-        return self.supervisor.handle_query(query)
+        if self.profiler is None:
+            return await self.supervisor.ahandle_query(query, document_scope, query_vector)
+        
+        with self.profiler.profile(query, thread_prefixes=(CPU_THREAD_PREFIX,)):
+            return await self.supervisor.ahandle_query(query, document_scope, query_vector)
+
+    async def aask_many(self, queries: List[str], concurrency: int = 4,
+                        document_scope: Optional[Dict[str, Any]] = None) -> List[str]:
+        """Até concurrency perguntas em andamento; respostas na ordem da entrada"""
+        query_vectors = await self._batch_query_vectors(queries)
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def answer(query: str) -> str:
+            async with semaphore:
+                return await self.aask(query, document_scope, query_vectors.get((query or "").strip()))
+        
+        return await asyncio.gather(*(answer(query) for query in queries))
+
+    def ask_many(self, queries: List[str], concurrency: int = 4,
+                 document_scope: Optional[Dict[str, Any]] = None) -> List[str]:
+        """Responde um lote de perguntas concorrentemente (avaliação, jobs em lote)
+        
+        Usa asyncio.run; dentro de um event loop já ativo, chame aask_many.
+        """
+        return asyncio.run(self.aask_many(queries, concurrency, document_scope))
+
+    async def _batch_query_vectors(self, queries: List[str]) -> Dict[str, Any]:
+        """Embeddings das perguntas que passarão por um encode, num único encode em lote
+        
+        O mesmo vetor serve ao cache semântico e à busca semântica do Retriever.
+        """
+        pending = [
+            query for query in dict.fromkeys((query or "").strip() for query in queries)
+            if query and self.supervisor.needs_embedding(query)
+        ]
+        if not pending:
+            return {}
+        
+        vectors = await asyncio.get_running_loop().run_in_executor(
+            self.executor, self.vectorstore.encode_queries, pending
+        )
+        return {query: vectors[i:i + 1] for i, query in enumerate(pending)}
+
+    def ask_stream(self, query: str, document_scope: Optional[Dict[str, Any]] = None) -> Iterator[Dict[str, Any]]:
+        """Como ask, mas emite eventos: 'sources', 'token' (parte da resposta) e 'final'"""
+        if not query or not query.strip():
+            yield {"type": "final", "final_answer": "Por favor, faça uma pergunta válida.", "raw_answer": "",
+                   "self_check_passed": False, "safety_applied": False,
+                   "sentence_grounding": [], "agent_logs": []}
+            return
+        
+        yield from self.supervisor.stream_query(query.strip(), document_scope)
 
     def get_system_info(self) -> dict:
-        return {
-            "retriever_type": "combined_search",
+        info = {
+            "retriever_type": "sharded_search" if isinstance(self.vectorstore, ShardRouter) else "combined_search",
             "model": self.model,
+            "embedding_model": f"{DEFAULT_MODEL_NAME} ({resolve_backend(self.embedding_backend)})",
             "retrieval_k": self.retrieval_k,
             "similarity_threshold": self.similarity_threshold,
+            # Busca híbrida: índice literal por artigo + FAISS semântico
+            "hybrid_enabled": True,
+            "hybrid_available": True,
+            "models": registry.describe(),
+            "answer_cache": self.answer_cache.stats() if self.answer_cache else None,
+            "semantic_cache": self.semantic_cache.stats() if self.semantic_cache else None
+        }
+        
+        if isinstance(self.vectorstore, ShardRouter):
+            return {**info, **self.vectorstore.describe()}
+        
+        return {
+            **info,
+            "hybrid_available": len(self.vectorstore.literal_index) > 0,
             "total_chunks": len(self.vectorstore.chunks),
             "indexed_articles": len(self.vectorstore.literal_index),
-            "available_articles": sorted(self.vectorstore.literal_index.keys(), key=int)[:20]
+            "indexed_documents": self.vectorstore.literal_index.documents(),
+            "available_articles": self.vectorstore.literal_index.articles()[:20]
+        }
+
+    def debug_query(self, query: str, document_scope: Optional[Dict[str, Any]] = None) -> dict:
+        """Executa o grafo uma única vez e devolve cada etapa com tempo, logs e detalhes"""
+        result = {
+            "system_type": self.get_system_info()["retriever_type"],
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "query": query,
+            "steps": []
         }
+        
+        try:
+            state = self.supervisor._initial_state(query.strip(), document_scope)
+            logs_seen = 0
+            start = last = time.perf_counter()
+            
+            # stream_mode="updates": uma atualização por nó executado, na ordem do grafo
+            for update in self.supervisor.workflow.stream(state, stream_mode="updates"):
+                for agent, changes in update.items():
+                    now = time.perf_counter()
+                    changes = changes or {}
+                    state.update(changes)
+                    
+                    logs = state.get("agent_logs", [])
+                    step = {
+                        "agent": agent,
+                        "wall_ms": round((now - last) * 1000, 2),
+                        "next_agent": changes.get("next_agent", ""),
+                        "logs": logs[logs_seen:],
+                        **self._debug_step_details(agent, changes)
+                    }
+                    result["steps"].append(step)
+                    logs_seen = len(logs)
+                    last = now
+            
+            result["total_ms"] = round((time.perf_counter() - start) * 1000, 2)
+            result["final_answer"] = state.get("final_answer", "")
+            
+        except Exception as e:
+            result["error"] = str(e)
+        
+        return result
+
+    def _debug_step_details(self, agent: str, changes: Dict[str, Any]) -> Dict[str, Any]:
+        if agent == "supervisor":
+            return {"query_type": changes.get("query_type", "")}
+        
+        if agent == "retriever":
+            return {
+                "chunks_found": len(changes.get("retrieved_chunks", [])),
+                "retrieval_path": changes.get("retrieval_path", ""),
+                "retrieval_quality": changes.get("retrieval_quality", ""),
+                "candidates": [
+                    {
+                        "chunk_id": hit.chunk_id,
+                        "score": round(hit.score, 4),
+                        "match_type": hit.match_type,
+                        "article": hit.document.metadata.get("article_number"),
+                        "shard": hit.shard
+                    }
+                    for hit in changes.get("retrieval_hits", [])
+                ]
+            }
+        
+        if agent == "evidence_gate":
+            return {"evidence": changes.get("evidence", {})}
+        
+        if agent == "compressor":
+            return {"context_tokens": sum(doc.metadata.get("token_count", 0) for doc in changes.get("context_chunks", []))}
+        
+        if agent == "answerer":
+            return {
+                "answer_generated": bool(changes.get("raw_answer")),
+                "prompt_tokens": changes.get("prompt_tokens", 0),
+                "completion_tokens": changes.get("completion_tokens", 0),
+                "completion_tokens_estimated": changes.get("completion_tokens_estimated", False),
+                "llm_error": changes.get("llm_error", {})
+            }
+        
+        if agent == "self_check":
+            grounding = changes.get("sentence_grounding", [])
+            return {
+                "passed": changes.get("self_check_passed", False),
+                "breakdown": changes.get("self_check_details", {}),
+                "grounded_sentences": f"{sum(g['grounded'] for g in grounding)}/{len(grounding)}"
+            }
+        
+        return {}
 
     def test_article_search(self, article_number: str) -> dict:
         query = f"Art. {article_number}"
@@ -1,36 +1,225 @@
-from typing import Dict, Any, List, Tuple
+from typing import Dict, Any, List, Optional, Tuple
+import re
+import hashlib
 from langchain_core.documents import Document
+from llm_resilience import LLMError
+from ingest.token_counter import count_tokens
 
 class AnswererAgent:
-    def __init__(self, llm):
+    def __init__(self, llm, max_prompt_tokens: int = 3500, min_overlap_chars: int = 30):
         self.llm = llm
+        
+        # Orçamento de tokens de entrada (template + pergunta + contexto)
+        self.max_prompt_tokens = max_prompt_tokens
+        self.min_overlap_chars = min_overlap_chars
 
     def __call__(self, state: Dict[str, Any]) -> Dict[str, Any]:
-        query = state["query"]
         chunks = state["retrieved_chunks"]
         
         if not chunks:
             return self._handle_no_chunks(state)
         
-        context, citations = self._build_context_with_citations(chunks)
-        raw_answer = self._generate_answer(query, context)
+        prompt, citations, prompt_stats = self.prepare_prompt(state)
+        
+        try:
+            raw_answer, completion_tokens = self.llm.generate_with_usage(prompt)
+        except LLMError as e:
+            return self.handle_llm_error(state, e)
+        
+        return self.finish(state, raw_answer, citations, prompt_stats, completion_tokens)
+    
+    async def acall(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """Nó assíncrono (grafo via ainvoke): mesma lógica, com llm.agenerate_with_usage"""
+        chunks = state["retrieved_chunks"]
+        
+        if not chunks:
+            return self._handle_no_chunks(state)
+        
+        prompt, citations, prompt_stats = self.prepare_prompt(state)
+        
+        try:
+            raw_answer, completion_tokens = await self.llm.agenerate_with_usage(prompt)
+        except LLMError as e:
+            return self.handle_llm_error(state, e)
+        
+        return self.finish(state, raw_answer, citations, prompt_stats, completion_tokens)
+    
+    def prepare_prompt(self, state: Dict[str, Any]) -> Tuple[str, List[str], Dict[str, int]]:
+        """Prompt, citações e estatísticas de tokens, separados da geração para permitir streaming"""
+        query = state["query"]
+        
+        # Template + pergunta longa podem passar do limite sozinhos: orçamento nunca negativo
+        context_budget = max(self.max_prompt_tokens - count_tokens(self._build_prompt(query, "")), 0)
+        # Contexto comprimido (CompressorAgent), quando o estágio está ativo
+        chunks = state.get("context_chunks") or state["retrieved_chunks"]
         
+        while True:
+            selected, prompt_stats = self._fit_context(chunks, context_budget)
+            
+            context, citations = self._build_context_with_citations(
+                [doc for doc, _ in selected], [text for _, text in selected]
+            )
+            prompt = self._build_prompt(query, context)
+            prompt_tokens = count_tokens(prompt)
+            
+            # Marcadores [FONTE_n] e separadores também contam: refaz com o orçamento reduzido
+            excess = prompt_tokens - self.max_prompt_tokens
+            if excess <= 0 or context_budget == 0:
+                break
+            context_budget = max(context_budget - excess, 0)
+        
+        prompt_stats["prompt_tokens"] = prompt_tokens
+        prompt_stats["context_budget"] = context_budget
+        prompt_stats["within_budget"] = prompt_tokens <= self.max_prompt_tokens
+        
+        return prompt, citations, prompt_stats
+    
+    def finish(self, state: Dict[str, Any], raw_answer: str, citations: List[str],
+               prompt_stats: Optional[Dict[str, int]] = None,
+               completion_tokens: Optional[int] = None) -> Dict[str, Any]:
+        """Sem o uso informado pelo backend (streaming, cassetes antigos), os tokens da resposta são estimados"""
+        prompt_stats = prompt_stats or {}
+        estimated = completion_tokens is None
         log = f"[Answerer] Resposta gerada com {len(citations)} fontes disponíveis"
         
+        if prompt_stats:
+            over = "" if prompt_stats.get("within_budget", True) else ", ACIMA do limite"
+            log += (
+                f" | Prompt: {prompt_stats['prompt_tokens']} tokens "
+                f"(limite {self.max_prompt_tokens}{over}; {prompt_stats['chunks_used']} chunks, "
+                f"{prompt_stats['chunks_dropped']} descartados, "
+                f"{prompt_stats['duplicate_spans']} trechos repetidos removidos)"
+            )
+        
         return {
             "raw_answer": raw_answer,
             "citations": citations,
+            "prompt_tokens": prompt_stats.get("prompt_tokens", 0),
+            "completion_tokens": count_tokens(raw_answer) if estimated else completion_tokens,
+            "completion_tokens_estimated": estimated,
             "agent_logs": state.get("agent_logs", []) + [log],
             "next_agent": "self_check"
         }
     
-    def _build_context_with_citations(self, chunks: List[Document]) -> Tuple[str, List[str]]:
+    def _split_spans(self, text: str) -> List[List[str]]:
+        """Linhas do chunk, cada uma dividida em frases"""
+        return [re.split(r'(?<=[.;])\s+', line.strip()) for line in text.split("\n") if line.strip()]
+    
+    def _normalize_span(self, span: str) -> str:
+        return re.sub(r'\s+', ' ', span).strip().lower()
+    
+    def _fit_context(self, chunks: List[Document], budget: int) -> Tuple[List[Tuple[Document, str]], Dict[str, int]]:
+        """Remove trechos já presentes em chunks melhor ranqueados e corta pelo fim até caber no orçamento
+        
+        Os chunks chegam em ordem de relevância; a sobreposição entre partes
+        consecutivas de um artigo (chunk_overlap) aparece como frases repetidas.
+        """
+        budget = max(budget, 0)
+        seen_text = ""
+        duplicate_spans = 0
+        candidates = []
+        
+        for doc in chunks:
+            lines = []
+            removed = 0
+            
+            for sentences in self._split_spans(doc.page_content):
+                kept = []
+                for sentence in sentences:
+                    normalized = self._normalize_span(sentence)
+                    if len(normalized) >= self.min_overlap_chars and normalized in seen_text:
+                        removed += 1
+                    else:
+                        kept.append(sentence)
+                if kept:
+                    lines.append(" ".join(kept))
+            
+            duplicate_spans += removed
+            if not lines:
+                continue
+            
+            # Contagem feita na ingestão vale enquanto o chunk não for alterado
+            if removed:
+                text = "\n".join(lines)
+                tokens = count_tokens(text)
+            else:
+                text = doc.page_content
+                tokens = doc.metadata.get("token_count") or count_tokens(text)
+            
+            candidates.append((doc, text, tokens))
+            seen_text += " " + self._normalize_span(doc.page_content)
+        
+        total_candidates = len(candidates)
+        
+        # Menos relevantes saem primeiro
+        while len(candidates) > 1 and sum(tokens for _, _, tokens in candidates) > budget:
+            candidates.pop()
+        
+        # Um único chunk acima do orçamento é truncado por frases (e recontado)
+        if candidates and candidates[0][2] > budget:
+            doc, text, _ = candidates[0]
+            text = self._truncate_to_budget(text, budget)
+            candidates = [(doc, text, count_tokens(text))] if text else []
+        
+        selected = [(doc, text) for doc, text, _ in candidates]
+        
+        return selected, {
+            "context_tokens": sum(tokens for _, _, tokens in candidates),
+            "context_budget": budget,
+            "chunks_used": len(selected),
+            "chunks_dropped": total_candidates - len(selected),
+            "duplicate_spans": duplicate_spans
+        }
+    
+    def _truncate_to_budget(self, text: str, budget: int) -> str:
+        lines = []
+        used = 0
+        full = True
+        
+        for sentences in self._split_spans(text):
+            kept = []
+            for sentence in sentences:
+                tokens = count_tokens(sentence) + 1
+                if used + tokens > budget:
+                    full = False
+                    break
+                kept.append(sentence)
+                used += tokens
+            if kept:
+                lines.append(" ".join(kept))
+            if not full:
+                break
+        
+        # Nem a primeira frase cabe: corta a própria frase
+        truncated = "\n".join(lines) if lines else text
+        
+        # A soma por frase é aproximada: a contagem do texto final decide
+        if count_tokens(truncated) > budget:
+            truncated = self._truncate_tokens(truncated, budget)
+        return truncated
+    
+    def _truncate_tokens(self, text: str, budget: int) -> str:
+        """Maior prefixo do texto com até budget tokens (busca binária no tamanho)"""
+        low, high = 0, len(text)
+        
+        while low < high:
+            middle = (low + high + 1) // 2
+            if count_tokens(text[:middle]) <= budget:
+                low = middle
+            else:
+                high = middle - 1
+        
+        return text[:low].rstrip()
+    
+    def _build_context_with_citations(self, chunks: List[Document],
+                                      texts: Optional[List[str]] = None) -> Tuple[str, List[str]]:
+        texts = texts or [doc.page_content for doc in chunks]
         context_parts = []
         citations = []
         source_to_citation = {}  # Mapeia fonte para número da citação
         citation_counter = 1
         
-        for i, doc in enumerate(chunks, 1):
+        for i, (doc, text) in enumerate(zip(chunks, texts), 1):
             source = self._extract_source(doc.metadata, i)
             
             # Se ainda não viu essa fonte, cria nova citação
@@ -47,10 +236,13 @@ class AnswererAgent:
             
             # Usa o número da citação já existente para essa fonte
             citation_num = source_to_citation[source]
-            context_parts.append(f"[FONTE_{citation_num}] {doc.page_content}")
+            context_parts.append(f"[FONTE_{citation_num}] {text}")
         
         return "\n\n".join(context_parts), citations
     
+    def citations_for(self, chunks: List[Document]) -> List[str]:
+        return self._build_context_with_citations(chunks)[1]
+    
     def _extract_source(self, metadata: dict, index: int) -> str:
         source = metadata.get("source", f"Documento_{index}")
         
@@ -59,8 +251,13 @@ class AnswererAgent:
         
         return source
     
-    def _generate_answer(self, query: str, context: str) -> str:
-        prompt = f"""
+    def template_hash(self) -> str:
+        """Hash do template do prompt (muda quando as instruções mudam)"""
+        template = self._build_prompt("{query}", "{context}") + f"|{self.max_prompt_tokens}"
+        return hashlib.sha256(template.encode("utf-8")).hexdigest()[:16]
+    
+    def _build_prompt(self, query: str, context: str) -> str:
+        return f"""
         Contexto com fontes numeradas:
         {context}
 
@@ -86,8 +283,16 @@ class AnswererAgent:
 
         Resposta com citações:
         """
-
-        return self.llm.generate(prompt)
+    
+    def handle_llm_error(self, state: Dict[str, Any], error: LLMError) -> Dict[str, Any]:
+        log = f"[Answerer] Falha no LLM ({type(error).__name__}): {error}"
+        
+        return {
+            "raw_answer": "",
+            "llm_error": {"type": type(error).__name__, "message": str(error)},
+            "agent_logs": state.get("agent_logs", []) + [log],
+            "next_agent": "error"
+        }
     
     def _handle_no_chunks(self, state: Dict[str, Any]) -> Dict[str, Any]:
         log = "[Answerer] Nenhum chunk recuperado - impossível gerar resposta"
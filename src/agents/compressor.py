@@ -0,0 +1,107 @@
+from typing import Dict, Any, List, Optional
+import re
+import time
+import numpy as np
+from langchain_core.documents import Document
+from ingest.model_registry import LazyEncoder
+from ingest.token_counter import count_tokens
+
+
+class CompressorAgent:
+    """Compressão extrativa do contexto: mantém as frases mais próximas da pergunta"""
+
+    def __init__(self, max_sentences_per_chunk: int = 3, min_similarity: float = 0.2,
+                 embedding_backend: Optional[str] = None):
+        self.model = LazyEncoder(backend=embedding_backend)
+        self.max_sentences_per_chunk = max_sentences_per_chunk
+        self.min_similarity = min_similarity
+        self.heading_pattern = re.compile(r'^\s*Art\.?\s*\d+', re.IGNORECASE)
+
+    def __call__(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        chunks = state.get("retrieved_chunks", [])
+
+        if not chunks:
+            return {"context_chunks": [], "next_agent": "answerer"}
+
+        start = time.perf_counter()
+
+        spans = [self._split_sentences(doc.page_content) for doc in chunks]
+        sentences = [sentence for chunk_spans in spans for sentence in chunk_spans]
+
+        # Pergunta e todas as frases num único encode; vetores normalizados → cosseno
+        vectors = np.asarray(self.model.encode([state["query"]] + sentences, normalize_embeddings=True))
+        scores = vectors[1:] @ vectors[0]
+
+        compressed = []
+        offset = 0
+        for doc, chunk_spans in zip(chunks, spans):
+            chunk_scores = scores[offset:offset + len(chunk_spans)]
+            offset += len(chunk_spans)
+            compressed.append(self._compress_chunk(doc, chunk_spans, chunk_scores))
+
+        tokens_before = sum(doc.metadata.get("token_count") or count_tokens(doc.page_content) for doc in chunks)
+        tokens_after = sum(doc.metadata["token_count"] for doc in compressed)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        log = (
+            f"[Compressor] {len(sentences)} frases → {sum(len(d.metadata['kept_sentences']) for d in compressed)} mantidas, "
+            f"tokens de contexto {tokens_before} → {tokens_after} "
+            f"({(1 - tokens_after / max(tokens_before, 1)) * 100:.0f}% menos) em {elapsed_ms:.1f} ms"
+        )
+
+        return {
+            "context_chunks": compressed,
+            "agent_logs": state.get("agent_logs", []) + [log],
+            "next_agent": "answerer"
+        }
+
+    def _split_sentences(self, text: str) -> List[str]:
+        sentences = []
+
+        # Quebras de linha do PDF viram espaço; só incisos, parágrafos e alíneas abrem nova linha
+        text = re.sub(r'\s*\n(?!\s*(?:[IVXL]+\s*[-–]|§|[a-z]\)|Art\.?\s*\d))\s*', ' ', text)
+
+        for line in text.split("\n"):
+            for piece in re.split(r'(?<=[.;:])\s+', line.strip()):
+                # "Art. 175" e "inc. II" não encerram a frase; "Art. 175." fica com o caput
+                if sentences and (re.search(r'\b(?:arts?|inc|n|nº)\.$', sentences[-1], re.IGNORECASE) or
+                                  re.fullmatch(r'Art\.?\s*\d+[º°]?\.?', sentences[-1], re.IGNORECASE)):
+                    sentences[-1] += " " + piece
+                elif piece:
+                    sentences.append(piece)
+
+        return sentences
+
+    def _compress_chunk(self, doc: Document, sentences: List[str], scores: np.ndarray) -> Document:
+        """Top frases do chunk (na ordem original) mais o cabeçalho do artigo"""
+
+        if not sentences:
+            return Document(page_content=doc.page_content,
+                            metadata={**doc.metadata, "token_count": 0, "kept_sentences": []})
+
+        ranked = np.argsort(-scores)
+        keep = {int(i) for i in ranked[:self.max_sentences_per_chunk] if scores[i] >= self.min_similarity}
+        keep.add(int(ranked[0]))
+
+        # Cabeçalho: a primeira frase do chunk identifica o artigo
+        if self.heading_pattern.match(sentences[0]):
+            keep.add(0)
+
+        parts = []
+        previous = -1
+        for i in sorted(keep):
+            if previous >= 0 and i != previous + 1:
+                parts.append("[...]")
+            parts.append(sentences[i])
+            previous = i
+
+        text = " ".join(parts)
+        article_number = doc.metadata.get("article_number")
+        if article_number and 0 not in keep and not self.heading_pattern.match(text):
+            text = f"Art. {article_number} [...] {text}"
+
+        metadata = dict(doc.metadata)
+        metadata["token_count"] = count_tokens(text)
+        metadata["kept_sentences"] = sorted(keep)
+
+        return Document(page_content=text, metadata=metadata)
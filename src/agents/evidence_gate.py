@@ -0,0 +1,69 @@
+from typing import Dict, Any, List
+
+
+class EvidenceGateAgent:
+    """Portão antes da geração: prevê a rejeição do Self-Check com sinais da recuperação
+
+    Evita chamar o LLM quando os trechos recuperados não sustentariam a resposta.
+    Correspondências literais (artigo ou definição) sempre passam; nas demais,
+    vale a similaridade do melhor trecho e o rótulo de qualidade do Retriever.
+
+    Desativado por padrão (AgentEducacional(evidence_gate=True) ativa): os
+    limiares só valem depois de conferidos com evidence_gate_report.py sobre
+    o modelo de embeddings real.
+    """
+
+    def __init__(self, min_similarity: float = 0.3, low_quality_similarity: float = 0.4):
+        self.min_similarity = min_similarity
+        self.low_quality_similarity = low_quality_similarity
+        self.strong_match_types = {"literal", "direct", "definition"}
+
+    def __call__(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        evidence = self.evaluate(state)
+
+        status = "liberado" if evidence["passed"] else "bloqueado"
+        log = (
+            f"[EvidenceGate] {status}: melhor similaridade {evidence['best_similarity']:.2f}, "
+            f"qualidade {evidence['quality']}, literal {'sim' if evidence['literal'] else 'não'}"
+        )
+
+        if evidence["passed"]:
+            return {
+                "evidence": evidence,
+                "agent_logs": state.get("agent_logs", []) + [log],
+                "next_agent": "answerer"
+            }
+
+        return {
+            "evidence": evidence,
+            "final_answer": (
+                "Não encontrei nos documentos trechos suficientemente relacionados à sua pergunta. "
+                "Tente reformulá-la de forma mais específica ou cite o artigo desejado."
+            ),
+            "agent_logs": state.get("agent_logs", []) + [log + " (LLM não chamado)"],
+            "next_agent": "end"
+        }
+
+    def evaluate(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        hits = state.get("retrieval_hits", [])
+        quality = state.get("retrieval_quality", "nenhum")
+
+        literal = any(hit.match_type in self.strong_match_types for hit in hits)
+        best_similarity = self._best_similarity(hits)
+
+        passed = literal or (
+            best_similarity >= self.min_similarity and
+            not (quality == "baixa" and best_similarity < self.low_quality_similarity)
+        )
+
+        return {
+            "passed": passed,
+            "literal": literal,
+            "quality": quality,
+            "best_similarity": round(best_similarity, 4)
+        }
+
+    def _best_similarity(self, hits: List) -> float:
+        # Distância L2² entre vetores normalizados → cosseno = 1 - d/2
+        similarities = [1 - hit.score / 2 for hit in hits]
+        return max(similarities) if similarities else 0.0
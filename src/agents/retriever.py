@@ -1,14 +1,25 @@
 from typing import Dict, Any, List, Tuple, Optional
+from dataclasses import replace
 import re
-from langchain_core.documents.base import Document
+import time
+import numpy as np
+from ingest.vector_store import RetrievalHit
 
 
 class RetrieverAgent:
-    def __init__(self, vectorstore, k: int = 5, verbose: bool = False):
+    def __init__(self, vectorstore, k: int = 5, verbose: bool = False,
+                 use_mmr: bool = False, mmr_lambda: float = 0.7, mmr_pool_factor: int = 4):
         self.vectorstore = vectorstore
         self.k = k
         self.verbose = verbose
         
+        # Diversificação MMR sobre os vetores já armazenados no índice
+        self.use_mmr = use_mmr
+        self.mmr_lambda = mmr_lambda
+        self.mmr_pool_factor = mmr_pool_factor
+        # Pseudo-scores (não são distâncias L2): fora da reordenação do MMR
+        self.pinned_match_types = {"literal", "definition", "direct"}
+        
         self.article_patterns = [
             r'\b(?:art\.?|artigo)\s*(\d+)(?:º|°)?\b',
             r'\bartigo\s+(\d+)\b',
@@ -29,15 +40,41 @@ class RetrieverAgent:
             
             if article_number:
                 return self._handle_article_search(state, query, article_number)
-            else:
-                return self._handle_semantic_search(state, query)
+            
+            definitions = self.vectorstore.find_definitions(query, filters=state.get("document_scope"))
+            if definitions:
+                return self._handle_definition_search(state, query, definitions)
+            
+            return self._handle_semantic_search(state, query)
                 
         except Exception as e:
-            return {
-                "retrieved_chunks": [],
-                "agent_logs": state.get("agent_logs", []) + [f"[Retriever] Erro: {str(e)}"],
-                "next_agent": "end"
-            }
+            return self._build_result(state, [], f"[Retriever] Erro: {str(e)}")
+
+    def needs_embedding(self, query: str) -> bool:
+        """A busca desta pergunta usa o embedding da query? (perguntas por artigo vão ao índice literal)"""
+        return getattr(self.vectorstore, "direct_search", True) and self._detect_article_search(query) is None
+
+    def _build_result(self, state: Dict[str, Any], hits: List[RetrievalHit], log: str,
+                      retrieval_path: str = "") -> Dict[str, Any]:
+        # Hits imutáveis + referências aos chunks compartilhados (nunca alterados)
+        return {
+            "retrieval_hits": hits,
+            "retrieval_path": retrieval_path if hits else "",
+            "retrieved_chunks": [hit.document for hit in hits],
+            "retrieval_quality": self._evaluate_result_quality([hit.score for hit in hits]),
+            "agent_logs": state.get("agent_logs", []) + [log],
+            "next_agent": "answerer" if hits else "end"
+        }
+
+    def _retrieval_path(self, hits: List[RetrievalHit]) -> str:
+        """Caminho da busca no VectorStore: literal, semântica expandida ou semântica"""
+        match_types = {hit.match_type for hit in hits}
+        
+        if "literal" in match_types:
+            return "literal"
+        if "expanded_semantic" in match_types:
+            return "expanded-semantic"
+        return "semantic"
 
     def _detect_article_search(self, query: str) -> Optional[str]:
         query_lower = query.lower()
@@ -51,53 +88,70 @@ class RetrieverAgent:
 
     def _handle_article_search(self, state: Dict[str, Any], query: str, article_number: str) -> Dict[str, Any]:
         try:
-            results = self.vectorstore.search(query, k=self.k * 3)
-            classified_chunks = self._classify_article_chunks(results, article_number)
-            final_chunks = self._select_best_chunks(classified_chunks)
-            log = self._generate_article_search_log(classified_chunks, article_number)
+            pool_size = self.k * max(3, self.mmr_pool_factor if self.use_mmr else 3)
+            hits = self.vectorstore.search_hits(query, k=pool_size, filters=state.get("document_scope"),
+                                                query_vector=state.get("query_vector"))
+            retrieval_path = self._retrieval_path(hits)
+            classified_hits = self._classify_article_chunks(hits, article_number)
+            log = self._generate_article_search_log(classified_hits, article_number)
+            
+            if self.use_mmr:
+                candidates = self._select_best_chunks(classified_hits, limit=pool_size)
+                final_hits, mmr_log = self._apply_mmr(candidates)
+                log += mmr_log
+            else:
+                final_hits = self._select_best_chunks(classified_hits)
             
-            return {
-                "retrieved_chunks": final_chunks,
-                "agent_logs": state.get("agent_logs", []) + [log],
-                "next_agent": "answerer" if final_chunks else "end"
-            }
+            return self._build_result(state, final_hits, log, retrieval_path)
             
         except Exception as e:
-            return {
-                "retrieved_chunks": [],
-                "agent_logs": state.get("agent_logs", []) + [f"[Retriever] Erro artigo {article_number}: {str(e)}"],
-                "next_agent": "end"
-            }
+            return self._build_result(state, [], f"[Retriever] Erro artigo {article_number}: {str(e)}")
 
     def _handle_semantic_search(self, state: Dict[str, Any], query: str) -> Dict[str, Any]:
         try:
-            results = self.vectorstore.search(query, k=self.k)
+            pool_size = self.k * self.mmr_pool_factor if self.use_mmr else self.k
+            hits = self.vectorstore.search_hits(query, k=pool_size, filters=state.get("document_scope"),
+                                                query_vector=state.get("query_vector"))
+            
+            mmr_log = ""
+            if self.use_mmr:
+                hits, mmr_log = self._apply_mmr(hits)
+            
+            quality = self._evaluate_result_quality([hit.score for hit in hits])
+            log = f"[Retriever] Busca semântica: {len(hits)} chunks (qualidade: {quality}){mmr_log}"
+            
+            return self._build_result(state, hits, log, self._retrieval_path(hits))
+            
+        except Exception as e:
+            return self._build_result(state, [], f"[Retriever] Erro semântica: {str(e)}")
+
+    def _handle_definition_search(self, state: Dict[str, Any], query: str,
+                                  definitions: List[Tuple[RetrievalHit, Dict]]) -> Dict[str, Any]:
+        try:
+            semantic_hits = self.vectorstore.search_hits(query, k=self.k, filters=state.get("document_scope"),
+                                                         query_vector=state.get("query_vector"))
             
-            chunks = []
-            scores = []
+            hits = []
+            seen = set()
             
-            for doc, score in results:
-                doc.metadata['similarity_score'] = score
-                chunks.append(doc)
-                scores.append(score)
+            # Chunk que define o termo vem primeiro
+            candidates = [hit for hit, entry in definitions] + semantic_hits
+            for hit in candidates:
+                if hit.chunk_id in seen or len(hits) >= self.k:
+                    continue
+                hits.append(hit)
+                seen.add(hit.chunk_id)
             
-            quality = self._evaluate_result_quality(scores)
-            log = f"[Retriever] Busca semântica: {len(chunks)} chunks (qualidade: {quality})"
+            entry = definitions[0][1]
+            article_info = f"Art. {entry['article_number']}" if entry['article_number'] else "sem artigo"
+            log = f"[Retriever] Definição de '{entry['term']}' encontrada ({article_info}): {len(hits)} chunks"
             
-            return {
-                "retrieved_chunks": chunks,
-                "agent_logs": state.get("agent_logs", []) + [log],
-                "next_agent": "answerer" if chunks else "end"
-            }
+            return self._build_result(state, hits, log, "definition")
             
         except Exception as e:
-            return {
-                "retrieved_chunks": [],
-                "agent_logs": state.get("agent_logs", []) + [f"[Retriever] Erro semântica: {str(e)}"],
-                "next_agent": "end"
-            }
+            return self._build_result(state, [], f"[Retriever] Erro definição: {str(e)}")
 
-    def _classify_article_chunks(self, results: List[Tuple[Document, float]], article_number: str) -> Dict[str, List[Tuple[Document, float]]]:
+    def _classify_article_chunks(self, hits: List[RetrievalHit], article_number: str) -> Dict[str, List[RetrievalHit]]:
         classified = {
             'direct_matches': [],
             'related_articles': [],
@@ -107,17 +161,17 @@ class RetrieverAgent:
         
         article_int = int(article_number) if article_number.isdigit() else 0
         
-        for doc, score in results:
-            content_lower = doc.page_content.lower()
+        for hit in hits:
+            content_lower = hit.document.page_content.lower()
             
             if self._contains_specific_article(content_lower, article_number):
-                classified['direct_matches'].append((doc, score))
+                classified['direct_matches'].append(hit)
             elif self._is_related_article(content_lower, article_int):
-                classified['related_articles'].append((doc, score))
+                classified['related_articles'].append(hit)
             elif self._is_thematic_match(content_lower, article_number):
-                classified['thematic_matches'].append((doc, score))
+                classified['thematic_matches'].append(hit)
             else:
-                classified['other_results'].append((doc, score))
+                classified['other_results'].append(hit)
         
         return classified
 
@@ -144,9 +198,10 @@ class RetrieverAgent:
     def _is_thematic_match(self, content: str, article_number: str) -> bool:
         return False
 
-    def _select_best_chunks(self, classified_chunks: Dict[str, List[Tuple[Document, float]]]) -> List[Document]:
+    def _select_best_chunks(self, classified_chunks: Dict[str, List[RetrievalHit]],
+                            limit: Optional[int] = None) -> List[RetrievalHit]:
         final_chunks = []
-        remaining_slots = self.k
+        remaining_slots = limit or self.k
         
         priorities = ['direct_matches', 'related_articles', 'thematic_matches', 'other_results']
         match_types = ['direct', 'related', 'thematic', 'other']
@@ -155,20 +210,62 @@ class RetrieverAgent:
             if remaining_slots <= 0:
                 break
                 
-            candidates = classified_chunks[priority]
+            candidates = sorted(classified_chunks[priority], key=lambda hit: hit.score)
             if candidates:
-                candidates.sort(key=lambda x: x[1])
                 slots_to_use = min(len(candidates), remaining_slots)
                 
-                for doc, score in candidates[:slots_to_use]:
-                    doc.metadata['match_type'] = match_type
-                    doc.metadata['similarity_score'] = score
-                    final_chunks.append(doc)
+                for hit in candidates[:slots_to_use]:
+                    final_chunks.append(replace(hit, match_type=match_type))
                 
                 remaining_slots -= slots_to_use
         
         return final_chunks
 
+    def _apply_mmr(self, candidates: List[RetrievalHit]) -> Tuple[List[RetrievalHit], str]:
+        """Seleciona k hits por maximal marginal relevance com operações matriciais
+        
+        Correspondências exatas (literal, definição, artigo citado) têm
+        pseudo-scores e ficam fixas na frente, na ordem recebida; o MMR escolhe
+        as vagas restantes entre os hits semânticos. Relevância vem do score
+        (distância L2² entre vetores normalizados: cos = 1 - d/2) e a
+        redundância, inclusive com os fixos, dos vetores reconstruídos do
+        índice, sem novo encode.
+        """
+        
+        pinned = [hit for hit in candidates if hit.match_type in self.pinned_match_types][:self.k]
+        semantic = [hit for hit in candidates if hit.match_type not in self.pinned_match_types]
+        slots = self.k - len(pinned)
+        
+        if slots <= 0 or len(semantic) <= slots or any(hit.chunk_id < 0 for hit in candidates):
+            return pinned + semantic[:max(slots, 0)], ""
+        
+        start = time.perf_counter()
+        
+        vectors = self.vectorstore.vectors_for_hits(semantic + pinned)
+        relevance = 1.0 - np.array([hit.score for hit in semantic], dtype=np.float32) / 2.0
+        similarity = vectors[:len(semantic)] @ vectors.T
+        
+        selected = []
+        if pinned:
+            max_similarity = similarity[:, len(semantic):].max(axis=1)
+        else:
+            selected.append(int(np.argmax(relevance)))
+            max_similarity = similarity[selected[0], :len(semantic)].copy()
+        
+        while len(selected) < slots:
+            mmr_scores = self.mmr_lambda * relevance - (1 - self.mmr_lambda) * max_similarity
+            mmr_scores[selected] = -np.inf
+            
+            next_idx = int(np.argmax(mmr_scores))
+            selected.append(next_idx)
+            max_similarity = np.maximum(max_similarity, similarity[next_idx, :len(semantic)])
+        
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        log = (f" | MMR: {len(semantic)}→{len(selected)} candidatos semânticos "
+               f"({len(pinned)} exatos fixos) em {elapsed_ms:.2f} ms")
+        
+        return pinned + [semantic[i] for i in selected], log
+
     def _generate_article_search_log(self, classified_chunks: Dict[str, List], article_number: str) -> str:
         direct_count = len(classified_chunks['direct_matches'])
         related_count = len(classified_chunks['related_articles'])
@@ -1,11 +1,18 @@
-from sentence_transformers import SentenceTransformer, util
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 import re
+import numpy as np
+from ingest.model_registry import LazyEncoder
 
 class SelfCheckAgent:   
-    def __init__(self, similarity_threshold: float = 0.35, model_name: str = "all-MiniLM-L6-v2"):
-        self.model = SentenceTransformer(model_name)
+    def __init__(self, similarity_threshold: float = 0.35, model_name: str = "all-MiniLM-L6-v2",
+                 embedding_backend: Optional[str] = None, vectorstore=None):
+        # Mesmo encoder do VectorStore (registro de modelos do processo)
+        self.model = LazyEncoder(model_name, embedding_backend)
         self.similarity_threshold = similarity_threshold
+        
+        # Vetores dos chunks vêm do índice FAISS; sem vectorstore, os chunks são codificados
+        self.vectorstore = vectorstore
+        self.min_sentence_words = 3
 
     def __call__(self, state: Dict[str, Any]) -> Dict[str, Any]:
         answer = state["raw_answer"]
@@ -15,7 +22,8 @@ class SelfCheckAgent:
             return self._reject_response(state, "Resposta ou chunks vazios")
         
         # Executar todas as validações
-        similarity_score = self._calculate_similarity(answer, chunks)
+        sentence_grounding = self._ground_sentences(answer, chunks, state.get("retrieval_hits", []))
+        similarity_score = self._calculate_similarity(sentence_grounding)
         has_citations = self._check_citations_flexible(answer)
         is_too_generic = self._check_generic_response(answer)
         has_sufficient_content = self._check_content_length(answer)
@@ -29,24 +37,82 @@ class SelfCheckAgent:
         )
         
         log = self._create_validation_log(similarity_score, has_citations, is_too_generic, has_sufficient_content, passed)
+        log += self._grounding_summary(sentence_grounding)
         
         return {
             "final_answer": answer if passed else self._generate_rejection_message(similarity_score, has_citations),
             "self_check_passed": passed,
+            "self_check_details": {
+                "similarity": round(float(similarity_score), 4),
+                "threshold": self.similarity_threshold,
+                "has_citations": has_citations,
+                "is_too_generic": is_too_generic,
+                "has_sufficient_content": has_sufficient_content
+            },
+            "sentence_grounding": sentence_grounding,
             "agent_logs": state.get("agent_logs", []) + [log],
             "next_agent": "safety" if passed else "end"
         }
     
-    def _calculate_similarity(self, answer: str, chunks: List) -> float:
-        if not chunks:
+    def _split_sentences(self, answer: str) -> List[str]:
+        sentences = []
+        
+        for line in answer.split("\n"):
+            for piece in re.split(r'(?<=[.!?])\s+', line.strip()):
+                # "Art. 175", "inc. II", "nº. 3": abreviação não encerra a frase
+                if sentences and re.search(r'\b(?:arts?|inc|n|nº|p|pág|par|cap|al)\.$', sentences[-1], re.IGNORECASE):
+                    sentences[-1] += " " + piece
+                else:
+                    sentences.append(piece)
+        
+        return [s for s in sentences if len(s.split()) >= self.min_sentence_words]
+    
+    def _chunk_vectors(self, chunks: List, hits: List) -> np.ndarray:
+        """Vetores dos chunks: reconstruídos do índice ou, sem ids válidos, codificados em batch"""
+        
+        if (self.vectorstore is not None and hits and len(hits) == len(chunks)
+                and all(hit.chunk_id >= 0 for hit in hits)):
+            return self.vectorstore.vectors_for_hits(hits)
+        
+        return self.model.encode([doc.page_content for doc in chunks], normalize_embeddings=True)
+    
+    def _ground_sentences(self, answer: str, chunks: List, hits: List) -> List[Dict[str, Any]]:
+        """Similaridade de cada frase da resposta com o chunk mais próximo"""
+        
+        sentences = self._split_sentences(answer) or [answer.strip()]
+        if not chunks or not sentences[0]:
+            return []
+        
+        # Frases num único batch; matriz frase × chunk (vetores normalizados → cosseno)
+        sentence_vectors = self.model.encode(sentences, normalize_embeddings=True)
+        similarity = np.asarray(sentence_vectors) @ np.asarray(self._chunk_vectors(chunks, hits)).T
+        
+        best_chunks = similarity.argmax(axis=1)
+        
+        return [
+            {
+                "sentence": sentence,
+                "score": float(similarity[i, best]),
+                "chunk_index": int(best),
+                "grounded": bool(similarity[i, best] > self.similarity_threshold)
+            }
+            for i, (sentence, best) in enumerate(zip(sentences, best_chunks))
+        ]
+    
+    def _calculate_similarity(self, sentence_grounding: List[Dict[str, Any]]) -> float:
+        if not sentence_grounding:
             return 0.0
         
-        context_text = " ".join([doc.page_content for doc in chunks])
+        return float(np.mean([s["score"] for s in sentence_grounding]))
+    
+    def _grounding_summary(self, sentence_grounding: List[Dict[str, Any]]) -> str:
+        if not sentence_grounding:
+            return ""
         
-        answer_emb = self.model.encode(answer, convert_to_tensor=True)
-        context_emb = self.model.encode(context_text, convert_to_tensor=True)
+        grounded = sum(1 for s in sentence_grounding if s["grounded"])
+        weakest = min(s["score"] for s in sentence_grounding)
         
-        return util.cos_sim(answer_emb, context_emb).item()
+        return f" | Frases fundamentadas: {grounded}/{len(sentence_grounding)} (mín: {weakest:.3f})"
     
     def _check_citations_flexible(self, answer: str) -> bool:
         # Formato padrão: [1], [2], etc.
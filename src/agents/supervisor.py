@@ -1,61 +1,411 @@
-from typing import Dict, Any
+from typing import Dict, Any, Awaitable, Callable, Iterator, List, Optional, Tuple
+import re
+import time
+import uuid
+import asyncio
+import functools
+import contextvars
+from concurrent.futures import Executor, ThreadPoolExecutor
 from langgraph.graph import StateGraph, END
 from state import RAGState
+from llm_resilience import LLMError
+from tracing import Tracer, node_attributes
 
 class SupervisorAgent:
-    def __init__(self, retriever, answerer, self_check, safety):
+    def __init__(self, retriever, answerer, self_check, safety, compressor=None, answer_cache=None,
+                 semantic_cache=None, evidence_gate=None, tracer: Optional[Tracer] = None,
+                 executor: Optional[Executor] = None):
         self.retriever = retriever
+        self.tracer = tracer or Tracer()
+        # Nós síncronos (encode, FAISS, regex) do fluxo async rodam neste pool limitado
+        self.executor = executor or ThreadPoolExecutor(max_workers=2, thread_name_prefix="rag-cpu")
+        self.evidence_gate = evidence_gate
+        # Exato primeiro (barato), depois semântico (um encode da pergunta)
+        self.answer_caches = [cache for cache in (answer_cache, semantic_cache) if cache is not None]
+        self.semantic_cache = semantic_cache
+        self.compressor = compressor
         self.answerer = answerer
         self.self_check = self_check
         self.safety = safety
-        self.workflow = self._create_workflow()
+        
+        self.error_messages = {
+            "LLMRateLimitError": "O serviço está com muitas solicitações no momento. Aguarde alguns instantes e tente novamente.",
+            "LLMTimeoutError": "A geração da resposta demorou mais que o esperado. Tente novamente em instantes.",
+            "LLMUnavailableError": "O serviço de geração de respostas está indisponível no momento. Tente novamente mais tarde.",
+            "CassetteMissError": "Esta pergunta não possui resposta gravada (modo replay). Grave o cassete com LLM_MODE=record."
+        }
+        
+        # Atalhos sem LLM: saudações, pedidos de ajuda e consulta pura ao texto de um artigo
+        self.greeting_pattern = re.compile(
+            r'^\s*(?:ol[áa]|oi|bom\s+dia|boa\s+tarde|boa\s+noite|e\s+a[íi])\b[\s,!.]*', re.IGNORECASE
+        )
+        self.help_pattern = re.compile(
+            r'(?:como\s+(?:voc[êe]|vc)\s+(?:pode|poderia)\s+(?:me\s+)?ajudar|'
+            r'o\s+que\s+(?:voc[êe]|vc)\s+(?:faz|sabe\s+fazer|pode\s+fazer)|'
+            r'quem\s+[ée]\s+(?:voc[êe]|vc)|(?:me\s+)?ajud[ae]|preciso\s+de\s+ajuda|help)[\s?!.]*',
+            re.IGNORECASE
+        )
+        self.article_lookup_pattern = re.compile(
+            r'^\s*(?:(?:qual\s+(?:[ée]\s+)?o\s+|(?:me\s+)?mostre\s+o\s+)?texto\s+d[oa]\s+|transcreva\s+o\s+|leia\s+o\s+)?'
+            r'(?:art\.?|artigo)\s*(\d+)\s*[º°o]?\.?(?P<tail>\s+d[oa]\s+[^?!]*)?\s*[?.!]?\s*$',
+            re.IGNORECASE
+        )
+        self.question_words = re.compile(r'\b(?:que|como|qual|quais|sobre|quando|onde|por|explique)\b', re.IGNORECASE)
+        
+        self.templates = {
+            "saudacao": (
+                "Olá! Sou o assistente educacional do Plano Diretor de Campina Grande. "
+                "Posso explicar conceitos, zonas e instrumentos urbanísticos ou mostrar o texto de um artigo "
+                "(por exemplo: \"Art. 180\")."
+            ),
+            "ajuda": (
+                "Olá! Sou o assistente educacional do Plano Diretor de Campina Grande. Posso ajudar com:\n"
+                "- Texto de artigos: \"Art. 180\" ou \"texto do artigo 90\"\n"
+                "- Perguntas sobre artigos: \"O que estabelece o Art. 90 sobre loteamentos?\"\n"
+                "- Conceitos e definições: \"O que são ZEIS?\"\n"
+                "- Temas gerais: \"Quais são os instrumentos da política urbana?\"\n\n"
+                "As respostas citam os trechos dos documentos oficiais utilizados."
+            )
+        }
+        
+        # Nós instrumentados (com o tracer desativado, são os próprios agentes)
+        nodes = {
+            "supervisor": self, "retriever": self.retriever, "evidence_gate": self.evidence_gate,
+            "compressor": self.compressor, "answerer": self.answerer, "self_check": self.self_check,
+            "safety": self.safety, "error": self.handle_error
+        }
+        self.nodes = {name: self.tracer.wrap(name, node) for name, node in nodes.items() if node is not None}
+        self.workflow = self._create_workflow(self.nodes)
+        
+        # Grafo para ainvoke: Answerer com o cliente async do LLM, demais nós no executor
+        self.async_nodes = {name: self._offload(node) for name, node in self.nodes.items()}
+        self.async_nodes["answerer"] = self.tracer.wrap_async("answerer", self.answerer.acall)
+        self.async_workflow = self._create_workflow(self.async_nodes)
+
+    def _in_executor(self, function: Callable, *args) -> Awaitable:
+        """Executa no pool limitado, levando o contexto (contextvars) da pergunta à thread"""
+        context = contextvars.copy_context()
+        return asyncio.get_running_loop().run_in_executor(
+            self.executor, functools.partial(context.run, function, *args)
+        )
 
-    def handle_query(self, query: str) -> str:
-        initial_state = {
+    def _offload(self, node: Callable[[Dict[str, Any]], Dict[str, Any]]) -> Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]:
+        async def offloaded(state: Dict[str, Any]) -> Dict[str, Any]:
+            return await self._in_executor(node, state)
+        
+        return offloaded
+
+    def needs_embedding(self, query: str) -> bool:
+        """A pergunta passará por um encode? (cache semântico ou busca semântica do Retriever)"""
+        if self.semantic_cache is not None:
+            return True
+        return self._classify_query(query)[0] == "rag" and self.retriever.needs_embedding(query)
+
+    def _initial_state(self, query: str, document_scope: Optional[Dict[str, Any]] = None,
+                       trace_id: Optional[str] = None, query_vector=None) -> Dict[str, Any]:
+        return {
             "query": query,
+            "trace_id": trace_id or uuid.uuid4().hex[:16],
+            "query_type": "",
             "enhanced_query": query,
+            "document_scope": document_scope or {},
+            "query_vector": query_vector,
+            "retrieval_hits": [],
             "retrieved_chunks": [],
+            "retrieval_quality": "",
+            "retrieval_path": "",
+            "evidence": {},
+            "context_chunks": [],
             "raw_answer": "",
+            "llm_error": {},
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "completion_tokens_estimated": False,
             "final_answer": "",
             "citations": [],
             "self_check_passed": False,
+            "self_check_details": {},
+            "sentence_grounding": [],
             "safety_applied": False,
             "agent_logs": [],
             "next_agent": ""
         }
+
+    def handle_query(self, query: str, document_scope: Optional[Dict[str, Any]] = None) -> str:
+        trace_id = uuid.uuid4().hex[:16]
+        
+        with self.tracer.span("request", trace_id) as span:
+            cached, query_vector = self._cached_answer(query, document_scope, trace_id)
+            span["cached"] = cached is not None
+            if cached is not None:
+                return cached
+            
+            result = self.workflow.invoke(self._initial_state(query, document_scope, trace_id, query_vector))
+            self._store_answer(query, document_scope, result)
+            span["self_check_passed"] = result.get("self_check_passed", False)
+        
+        return result.get("final_answer", "Desculpe, não consegui processar sua solicitação.")
+
+    async def ahandle_query(self, query: str, document_scope: Optional[Dict[str, Any]] = None,
+                            query_vector=None) -> str:
+        """Como handle_query, pelo grafo async (ainvoke); query_vector reaproveita um encode em lote"""
+        trace_id = uuid.uuid4().hex[:16]
         
-        result = self.workflow.invoke(initial_state)
+        with self.tracer.span("request", trace_id) as span:
+            # Cache semântico codifica a pergunta (sem query_vector): fora do event loop
+            cached, query_vector = await self._in_executor(self._cached_answer, query, document_scope, trace_id, query_vector)
+            span["cached"] = cached is not None
+            if cached is not None:
+                return cached
+            
+            result = await self.async_workflow.ainvoke(
+                self._initial_state(query, document_scope, trace_id, query_vector)
+            )
+            await self._in_executor(self._store_answer, query, document_scope, result)
+            span["self_check_passed"] = result.get("self_check_passed", False)
         
         return result.get("final_answer", "Desculpe, não consegui processar sua solicitação.")
 
+    def _cached_answer(self, query: str, document_scope: Optional[Dict[str, Any]],
+                       trace_id: Optional[str] = None, query_vector=None) -> Tuple[Optional[str], Any]:
+        """Resposta em cache e o embedding da pergunta, se calculado
+        
+        Na falta do cache exato, a pergunta é codificada uma única vez: o vetor serve
+        ao cache semântico, ao Retriever (state["query_vector"]) e ao put.
+        """
+        for cache in self.answer_caches:
+            with self.tracer.span(f"cache.{type(cache).__name__}", trace_id) as span:
+                if cache is self.semantic_cache and query_vector is None:
+                    query_vector = self.retriever.vectorstore.encode_queries([query])
+                cached = cache.get(query, document_scope, query_vector)
+                span["cache"] = "hit" if cached is not None else "miss"
+            if cached is not None:
+                return cached, query_vector
+        return None, query_vector
+
+    def _store_answer(self, query: str, document_scope: Optional[Dict[str, Any]], result: Dict[str, Any]):
+        """Só respostas aprovadas e formatadas entram no cache"""
+        if result.get("safety_applied") and result.get("final_answer"):
+            for cache in self.answer_caches:
+                cache.put(query, result["final_answer"], document_scope, result.get("query_vector"))
+
+    def stream_query(self, query: str, document_scope: Optional[Dict[str, Any]] = None) -> Iterator[Dict[str, Any]]:
+        """Executa o fluxo emitindo eventos: fontes, tokens da resposta e resultado final
+        
+        Segue as mesmas arestas do grafo; apenas o Answerer é substituído pela
+        geração em streaming do LLM.
+        """
+        trace_id = uuid.uuid4().hex[:16]
+        
+        with self.tracer.span("request", trace_id) as span:
+            for event in self._stream_events(query, document_scope, trace_id):
+                if event["type"] == "final":
+                    span["cached"] = event["cached"]
+                    span["self_check_passed"] = event["self_check_passed"]
+                yield event
+
+    def _stream_events(self, query: str, document_scope: Optional[Dict[str, Any]],
+                       trace_id: str) -> Iterator[Dict[str, Any]]:
+        cached, query_vector = self._cached_answer(query, document_scope, trace_id)
+        if cached is not None:
+            yield {"type": "final", "final_answer": cached, "raw_answer": "", "self_check_passed": True,
+                   "safety_applied": True, "sentence_grounding": [], "cached": True,
+                   "agent_logs": ["[Supervisor] Resposta servida do cache"]}
+            return
+        
+        state = self._initial_state(query, document_scope, trace_id, query_vector)
+        state.update(self.nodes["supervisor"](state))
+        
+        if state["next_agent"] == "safety":
+            state.update(self.nodes["safety"](state))
+        
+        elif state["next_agent"] == "retriever":
+            state.update(self.nodes["retriever"](state))
+            
+            if state.get("retrieved_chunks") and self.evidence_gate is not None:
+                state.update(self.nodes["evidence_gate"](state))
+            
+            generate = bool(state.get("retrieved_chunks")) and state.get("next_agent") != "end"
+            
+            if generate and self.compressor is not None:
+                state.update(self.nodes["compressor"](state))
+            
+            if generate:
+                with self.tracer.span("answerer", trace_id) as span:
+                    prompt, citations, prompt_stats = self.answerer.prepare_prompt(state)
+                    yield {"type": "sources", "citations": citations, "chunks": len(state["retrieved_chunks"])}
+                    
+                    parts = []
+                    started = time.perf_counter()
+                    try:
+                        for token in self.answerer.llm.generate_stream(prompt):
+                            if not parts:
+                                span["first_token_ms"] = round((time.perf_counter() - started) * 1000, 3)
+                            parts.append(token)
+                            yield {"type": "token", "text": token}
+                    except LLMError as e:
+                        update = self.answerer.handle_llm_error(state, e)
+                    else:
+                        update = self.answerer.finish(state, "".join(parts), citations, prompt_stats)
+                    
+                    state.update(update)
+                    span.update(node_attributes(update))
+                
+                if state.get("llm_error"):
+                    state.update(self.nodes["error"](state))
+                
+                if state.get("raw_answer"):
+                    state.update(self.nodes["self_check"](state))
+                    
+                    if state.get("self_check_passed"):
+                        state.update(self.nodes["safety"](state))
+        
+        self._store_answer(query, document_scope, state)
+        
+        yield {
+            "type": "final",
+            "final_answer": state.get("final_answer") or "Desculpe, não consegui processar sua solicitação.",
+            "raw_answer": state.get("raw_answer", ""),
+            "self_check_passed": state.get("self_check_passed", False),
+            "safety_applied": state.get("safety_applied", False),
+            "sentence_grounding": state.get("sentence_grounding", []),
+            "cached": False,
+            "agent_logs": state.get("agent_logs", [])
+        }
+
     def __call__(self, state: Dict[str, Any]) -> Dict[str, Any]:
         query = state["query"]
         log = f"[Supervisor] Processando query: '{query[:50]}...'"
         
+        start = time.perf_counter()
+        query_type, article_number = self._classify_query(query)
+        
+        if query_type in self.templates:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            return {
+                "query_type": query_type,
+                "final_answer": self.templates[query_type],
+                "agent_logs": state.get("agent_logs", []) + [
+                    log, f"[Supervisor] Atalho ({query_type}): resposta por template em {elapsed_ms:.2f} ms"
+                ],
+                "next_agent": "end"
+            }
+        
+        if query_type == "artigo":
+            result = self._article_lookup(state, article_number)
+            if result:
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                result["agent_logs"] = state.get("agent_logs", []) + [
+                    log, f"[Supervisor] Atalho (artigo): texto integral do Art. {article_number} "
+                         f"({len(result['retrieved_chunks'])} trechos) em {elapsed_ms:.2f} ms"
+                ]
+                return result
+            
+            # Artigo ausente ou presente em mais de um documento: segue o fluxo completo
+            query_type = "rag"
+        
         return {
+            "query_type": query_type,
             "agent_logs": state.get("agent_logs", []) + [log],
             "next_agent": "retriever"
         }
     
-    def _create_workflow(self) -> StateGraph:
+    def _classify_query(self, query: str):
+        """Classificação barata por regex: (tipo, número do artigo)"""
+        
+        greeting = self.greeting_pattern.match(query)
+        rest = query[greeting.end():] if greeting else query
+        
+        if not rest.strip() and greeting:
+            return "saudacao", None
+        
+        if self.help_pattern.fullmatch(rest.strip()):
+            return "ajuda", None
+        
+        match = self.article_lookup_pattern.match(query)
+        if match and not (match.group("tail") and self.question_words.search(match.group("tail"))):
+            return "artigo", match.group(1)
+        
+        return "rag", None
+    
+    def _article_lookup(self, state: Dict[str, Any], article_number: str) -> Optional[Dict[str, Any]]:
+        """Texto literal do artigo pelo índice literal, sem embeddings nem LLM"""
+        
+        # Artigo fora do índice literal: None, e o Retriever faz a busca completa
+        hits = self.retriever.vectorstore.article_hits(
+            state["query"], article_number, filters=state.get("document_scope") or None
+        )
+        hits = [hit for hit in hits if hit.document.metadata.get("article_number") == article_number]
+        
+        if len({(hit.shard, hit.document.metadata.get("source")) for hit in hits}) != 1:
+            return None
+        
+        hits = sorted(hits, key=lambda hit: hit.document.metadata.get("part_index", 0))
+        chunks = [hit.document for hit in hits]
+        
+        citations = self.answerer.citations_for(chunks)
+        answer = f"Texto integral do Art. {article_number} [1]:\n\n{self._join_article_parts(chunks)}"
+        
+        return {
+            "query_type": "artigo",
+            "retrieval_hits": hits,
+            "retrieved_chunks": chunks,
+            "final_answer": answer,
+            "citations": citations,
+            "self_check_passed": True,
+            "next_agent": "safety"
+        }
+    
+    def _join_article_parts(self, chunks: List[Any]) -> str:
+        parts = []
+        for doc in chunks:
+            # Partes seguintes repetem o cabeçalho "Art. N. (continuação k)"
+            text = re.sub(r'^Art\.\s*\d+\.\s*\(continuação\s*\d+\)\s*\n', '', doc.page_content.strip())
+            parts.append(text.strip())
+        
+        return "\n".join(parts)
+    
+    def handle_error(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """Nó de erro: converte a falha tipada do LLM em mensagem ao usuário"""
+        error = state.get("llm_error", {})
+        message = self.error_messages.get(
+            error.get("type"),
+            "Não foi possível gerar a resposta devido a um erro no serviço de linguagem."
+        )
+        log = f"[Supervisor] Erro do LLM tratado: {error.get('type', 'desconhecido')}"
+        
+        return {
+            "final_answer": message,
+            "agent_logs": state.get("agent_logs", []) + [log],
+            "next_agent": "end"
+        }
+    
+    def _create_workflow(self, nodes: Dict[str, Callable]) -> StateGraph:
         workflow = StateGraph(RAGState)
         
-        workflow.add_node("supervisor", self)
-        workflow.add_node("retriever", self.retriever)
-        workflow.add_node("answerer", self.answerer)
-        workflow.add_node("self_check", self.self_check)
-        workflow.add_node("safety", self.safety)
+        for name, node in nodes.items():
+            workflow.add_node(name, node)
         
         workflow.set_entry_point("supervisor")
         
         def supervisor_router(state):
-            return "retriever"
+            return state.get("next_agent") or "retriever"
+        
+        def generation_route():
+            return "compressor" if self.compressor is not None else "answerer"
         
         def retriever_router(state):
             chunks = state.get("retrieved_chunks", [])
-            return "answerer" if chunks else "end"
+            if not chunks:
+                return "end"
+            return "evidence_gate" if self.evidence_gate is not None else generation_route()
+        
+        def evidence_gate_router(state):
+            return generation_route() if state.get("evidence", {}).get("passed") else "end"
         
         def answerer_router(state):
+            if state.get("llm_error"):
+                return "error"
             raw_answer = state.get("raw_answer", "")
             return "self_check" if raw_answer else "end"
         
@@ -66,19 +416,33 @@ class SupervisorAgent:
         workflow.add_conditional_edges(
             "supervisor",
             supervisor_router,
-            {"retriever": "retriever"}
+            {"retriever": "retriever", "safety": "safety", "end": END}
         )
         
+        generation_routes = {"answerer": "answerer", "end": END}
+        if self.compressor is not None:
+            generation_routes["compressor"] = "compressor"
+            workflow.add_edge("compressor", "answerer")
+        
+        retriever_routes = dict(generation_routes)
+        if self.evidence_gate is not None:
+            retriever_routes["evidence_gate"] = "evidence_gate"
+            workflow.add_conditional_edges(
+                "evidence_gate",
+                evidence_gate_router,
+                generation_routes
+            )
+        
         workflow.add_conditional_edges(
             "retriever",
             retriever_router,
-            {"answerer": "answerer", "end": END}
+            retriever_routes
         )
         
         workflow.add_conditional_edges(
             "answerer",
             answerer_router,
-            {"self_check": "self_check", "end": END}
+            {"self_check": "self_check", "error": "error", "end": END}
         )
         
         workflow.add_conditional_edges(
@@ -88,5 +452,6 @@ class SupervisorAgent:
         )
         
         workflow.add_edge("safety", END)
+        workflow.add_edge("error", END)
         
         return workflow.compile()
\ No newline at end of file
@@ -0,0 +1,389 @@
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Any, Dict, List, Optional
+import numpy as np
+from ingest.definitions import normalize_term
+
+
+def normalize_query(query: str) -> str:
+    """Normaliza a pergunta para a chave do cache (caixa, acentos, espaços e artigos de lei)"""
+
+    text = normalize_term(query)
+    # "artigo 175", "art. 175º", "Art 175" → "art 175"
+    text = re.sub(r'\b(?:artigo|art)\s*(\d+)o?\b', r'art \1', text)
+
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+class AnswerCache:
+    """Cache persistente de respostas em SQLite (WAL), compartilhável entre processos
+
+    A chave combina a pergunta normalizada, o escopo, a versão do índice, o
+    modelo e o hash do template do prompt. Entradas de outras versões do
+    índice ficam no arquivo (processos em builds diferentes podem compartilhá-lo)
+    e saem pelo TTL/LRU ou por purge(index_version).
+    """
+
+    def __init__(self, path: str, index_version: str, model: str, template_hash: str,
+                 ttl_seconds: float = 7 * 24 * 3600, max_entries: int = 5000):
+        self.path = path
+        self.index_version = index_version
+        self.model = model
+        self.template_hash = template_hash
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._local = threading.local()
+
+        with self._connection() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS answers (
+                    key TEXT PRIMARY KEY,
+                    query TEXT NOT NULL,
+                    answer TEXT NOT NULL,
+                    index_version TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL,
+                    hits INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            conn.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_answers_access ON answers (last_access)")
+
+    def _connection(self) -> sqlite3.Connection:
+        """Uma conexão por thread; WAL permite leitores concorrentes entre processos"""
+
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def make_key(self, query: str, document_scope: Optional[Dict[str, Any]] = None) -> str:
+        payload = json.dumps(
+            [normalize_query(query), document_scope or {}, self.index_version, self.model, self.template_hash],
+            sort_keys=True, ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _count(self, conn: sqlite3.Connection, name: str, amount: int = 1):
+        conn.execute(
+            "INSERT INTO counters (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            (name, amount)
+        )
+
+    def get(self, query: str, document_scope: Optional[Dict[str, Any]] = None,
+            query_vector: Optional[np.ndarray] = None) -> Optional[str]:
+        """query_vector é ignorado: a chave é exata (mesma assinatura do cache semântico)"""
+        key = self.make_key(query, document_scope)
+        now = time.time()
+
+        with self._connection() as conn:
+            row = conn.execute(
+                "SELECT answer FROM answers WHERE key = ? AND created_at >= ?",
+                (key, now - self.ttl_seconds)
+            ).fetchone()
+
+            if row is None:
+                self._count(conn, "misses")
+                return None
+
+            conn.execute("UPDATE answers SET hits = hits + 1, last_access = ? WHERE key = ?", (now, key))
+            self._count(conn, "hits")
+
+        return row[0]
+
+    def put(self, query: str, answer: str, document_scope: Optional[Dict[str, Any]] = None,
+            query_vector: Optional[np.ndarray] = None):
+        key = self.make_key(query, document_scope)
+        now = time.time()
+
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO answers (key, query, answer, index_version, created_at, last_access, hits) "
+                "VALUES (?, ?, ?, ?, ?, ?, 0)",
+                (key, query, answer, self.index_version, now, now)
+            )
+            self._evict(conn, now)
+
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        """Remove expiradas e, acima de max_entries, as menos acessadas recentemente"""
+
+        expired = conn.execute("DELETE FROM answers WHERE created_at < ?", (now - self.ttl_seconds,)).rowcount
+
+        excess = conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0] - self.max_entries
+        if excess > 0:
+            conn.execute(
+                "DELETE FROM answers WHERE key IN (SELECT key FROM answers ORDER BY last_access LIMIT ?)",
+                (excess,)
+            )
+
+        evicted = expired + max(excess, 0)
+        if evicted:
+            self._count(conn, "evictions", evicted)
+
+    def purge(self, index_version: str) -> int:
+        """Remove as respostas geradas com uma versão do índice (ex.: build antigo após o deploy)"""
+
+        with self._connection() as conn:
+            removed = conn.execute("DELETE FROM answers WHERE index_version = ?", (index_version,)).rowcount
+            if removed:
+                self._count(conn, "evictions", removed)
+
+        return removed
+
+    def clear(self):
+        with self._connection() as conn:
+            conn.execute("DELETE FROM answers")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._connection() as conn:
+            counters = dict(conn.execute("SELECT name, value FROM counters").fetchall())
+            entries = conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+
+        hits = counters.get("hits", 0)
+        lookups = hits + counters.get("misses", 0)
+
+        return {
+            "entries": entries,
+            "hits": hits,
+            "misses": counters.get("misses", 0),
+            "evictions": counters.get("evictions", 0),
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+            "index_version": self.index_version
+        }
+
+
+def article_references(query: str) -> List[str]:
+    """Artigos citados literalmente na pergunta ("art 175", "artigo 42º")"""
+
+    return sorted(set(re.findall(r'\bart (\d+)\b', normalize_query(query))), key=int)
+
+
+class SemanticAnswerCache:
+    """Cache semântico: serve a resposta de uma pergunta anterior parecida (paráfrase)
+
+    Os embeddings das perguntas respondidas ficam num índice FAISS em memória
+    (produto interno sobre vetores normalizados = cosseno), reconstruído a
+    partir do SQLite na abertura. Só serve a resposta se a similaridade passar
+    do limiar e as referências literais a artigos forem as mesmas.
+    """
+
+    def __init__(self, path: str, index_version: str, model: str, template_hash: str, encoder,
+                 threshold: float = 0.85, ttl_seconds: float = 7 * 24 * 3600, max_entries: int = 2000,
+                 candidates: int = 5, log_path: Optional[str] = None):
+        self.path = path
+        self.index_version = index_version
+        self.model = model
+        self.template_hash = template_hash
+        self.encoder = encoder
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.candidates = candidates
+        self.log_path = log_path
+        self.counters = {"hits": 0, "misses": 0, "rejected_articles": 0, "evictions": 0}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._index = None
+
+        with self._connection() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS semantic_answers (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    query TEXT NOT NULL,
+                    answer TEXT NOT NULL,
+                    articles TEXT NOT NULL,
+                    scope TEXT NOT NULL,
+                    vector BLOB NOT NULL,
+                    index_version TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    template_hash TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL,
+                    hits INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            conn.execute("DELETE FROM semantic_answers WHERE created_at < ?", (time.time() - ttl_seconds,))
+
+            # Cada entrada carrega a versão do índice, o modelo e o template com que foi gerada;
+            # as de outras combinações ficam no arquivo para os processos que as usam
+            rows = conn.execute(
+                "SELECT id, vector FROM semantic_answers WHERE index_version = ? AND model = ? AND template_hash = ?",
+                (index_version, model, template_hash)
+            ).fetchall()
+
+        for row_id, blob in rows:
+            self._add_vector(row_id, np.frombuffer(blob, dtype=np.float32))
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _add_vector(self, row_id: int, vector: np.ndarray):
+        import faiss
+
+        with self._lock:
+            if self._index is None:
+                self._index = faiss.IndexIDMap(faiss.IndexFlatIP(vector.shape[0]))
+            self._index.add_with_ids(vector.reshape(1, -1), np.array([row_id], dtype=np.int64))
+
+    def _remove_vectors(self, row_ids: List[int]):
+        with self._lock:
+            if self._index is not None and row_ids:
+                self._index.remove_ids(np.array(row_ids, dtype=np.int64))
+
+    def _embed(self, query: str, query_vector: Optional[np.ndarray] = None) -> np.ndarray:
+        """Embedding normalizado; query_vector reaproveita um encode já feito (mesmo modelo)"""
+        if query_vector is None:
+            query_vector = self.encoder.encode([query], normalize_embeddings=True)
+        return np.asarray(query_vector, dtype=np.float32).reshape(-1)
+
+    def _log(self, record: Dict[str, Any]):
+        """Registro JSONL de cada consulta para calibrar o limiar"""
+
+        if not self.log_path:
+            return
+
+        with self._lock, open(self.log_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def get(self, query: str, document_scope: Optional[Dict[str, Any]] = None,
+            query_vector: Optional[np.ndarray] = None) -> Optional[str]:
+        if self._index is None or self._index.ntotal == 0:
+            self.counters["misses"] += 1
+            return None
+
+        vector = self._embed(query, query_vector)
+        articles = json.dumps(article_references(query))
+        scope = json.dumps(document_scope or {}, sort_keys=True)
+
+        with self._lock:
+            scores, ids = self._index.search(vector.reshape(1, -1), min(self.candidates, self._index.ntotal))
+
+        best = None
+        outcome = "below_threshold"
+        with self._connection() as conn:
+            for score, row_id in zip(scores[0], ids[0]):
+                if row_id < 0 or score < self.threshold:
+                    break
+
+                row = conn.execute(
+                    "SELECT query, answer, articles, scope FROM semantic_answers WHERE id = ?", (int(row_id),)
+                ).fetchone()
+                if row is None or row[3] != scope:
+                    continue
+
+                if row[2] != articles:
+                    # Paráfrase próxima, mas sobre outro artigo: "art 42" ≠ "art 43"
+                    outcome = "article_mismatch"
+                    if best is None:
+                        best = (float(score), row[0])
+                    continue
+
+                best = (float(score), row[0])
+                outcome = "hit"
+                conn.execute("UPDATE semantic_answers SET hits = hits + 1, last_access = ? WHERE id = ?",
+                             (time.time(), int(row_id)))
+                answer = row[1]
+                break
+
+        if outcome == "below_threshold" and len(ids[0]) and ids[0][0] >= 0:
+            best = (float(scores[0][0]), None)
+
+        self.counters["hits" if outcome == "hit" else "misses"] += 1
+        if outcome == "article_mismatch":
+            self.counters["rejected_articles"] += 1
+
+        self._log({
+            "timestamp": time.time(),
+            "query": query,
+            "matched_query": best[1] if best else None,
+            "similarity": round(best[0], 4) if best else None,
+            "threshold": self.threshold,
+            "articles": json.loads(articles),
+            "outcome": outcome
+        })
+
+        return answer if outcome == "hit" else None
+
+    def put(self, query: str, answer: str, document_scope: Optional[Dict[str, Any]] = None,
+            query_vector: Optional[np.ndarray] = None):
+        vector = self._embed(query, query_vector)
+        now = time.time()
+
+        with self._connection() as conn:
+            cursor = conn.execute(
+                "INSERT INTO semantic_answers (query, answer, articles, scope, vector, index_version, model, "
+                "template_hash, created_at, last_access) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (query, answer, json.dumps(article_references(query)),
+                 json.dumps(document_scope or {}, sort_keys=True), vector.tobytes(),
+                 self.index_version, self.model, self.template_hash, now, now)
+            )
+            row_id = cursor.lastrowid
+            evicted = self._evict(conn, now)
+
+        self._add_vector(row_id, vector)
+        self._remove_vectors(evicted)
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> List[int]:
+        """Expiradas e, acima de max_entries, as menos acessadas recentemente"""
+
+        evicted = [row[0] for row in conn.execute(
+            "SELECT id FROM semantic_answers WHERE created_at < ?", (now - self.ttl_seconds,)
+        ).fetchall()]
+
+        excess = conn.execute("SELECT COUNT(*) FROM semantic_answers").fetchone()[0] - len(evicted) - self.max_entries
+        if excess > 0:
+            evicted += [row[0] for row in conn.execute(
+                "SELECT id FROM semantic_answers WHERE created_at >= ? ORDER BY last_access LIMIT ?",
+                (now - self.ttl_seconds, excess)
+            ).fetchall()]
+
+        if evicted:
+            conn.executemany("DELETE FROM semantic_answers WHERE id = ?", [(row_id,) for row_id in evicted])
+            self.counters["evictions"] += len(evicted)
+
+        return evicted
+
+    def purge(self, index_version: str) -> int:
+        """Remove as entradas geradas com uma versão do índice"""
+
+        with self._connection() as conn:
+            removed = [row[0] for row in conn.execute(
+                "SELECT id FROM semantic_answers WHERE index_version = ?", (index_version,)
+            ).fetchall()]
+            conn.executemany("DELETE FROM semantic_answers WHERE id = ?", [(row_id,) for row_id in removed])
+
+        self._remove_vectors(removed)
+        self.counters["evictions"] += len(removed)
+
+        return len(removed)
+
+    def clear(self):
+        with self._connection() as conn:
+            conn.execute("DELETE FROM semantic_answers")
+        with self._lock:
+            self._index = None
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.counters["hits"] + self.counters["misses"]
+
+        return {
+            "entries": self._index.ntotal if self._index is not None else 0,
+            **self.counters,
+            "hit_rate": round(self.counters["hits"] / lookups, 3) if lookups else 0.0,
+            "threshold": self.threshold,
+            "index_version": self.index_version
+        }
@@ -0,0 +1,223 @@
+import os
+import json
+import asyncio
+import time
+import random
+import hashlib
+import threading
+from typing import Dict, Iterator, Optional, Tuple, Union
+from llm_resilience import LLMRequestError
+
+
+class LLMBackend:
+    """Interface comum dos LLMs usados pelo AnswererAgent"""
+
+    model = ""
+
+    def generate(self, prompt: str, temperature: float = 0.1, max_tokens: int = 1000) -> str:
+        raise NotImplementedError
+
+    def generate_stream(self, prompt: str, temperature: float = 0.1, max_tokens: int = 1000) -> Iterator[str]:
+        yield self.generate(prompt, temperature, max_tokens)
+
+    async def agenerate(self, prompt: str, temperature: float = 0.1, max_tokens: int = 1000) -> str:
+        """Versão assíncrona; sem cliente async próprio, a chamada bloqueante vai para uma thread"""
+        return await asyncio.to_thread(self.generate, prompt, temperature, max_tokens)
+
+    def generate_with_usage(self, prompt: str, temperature: float = 0.1,
+                            max_tokens: int = 1000) -> Tuple[str, Optional[int]]:
+        """Resposta e tokens de resposta informados pela API (None se o backend não informa)"""
+        return self.generate(prompt, temperature, max_tokens), None
+
+    async def agenerate_with_usage(self, prompt: str, temperature: float = 0.1,
+                                   max_tokens: int = 1000) -> Tuple[str, Optional[int]]:
+        return await self.agenerate(prompt, temperature, max_tokens), None
+
+
+class CassetteMissError(LLMRequestError):
+    """Prompt sem gravação correspondente no cassete (modo replay)"""
+
+
+def cassette_key(model: str, prompt: str, temperature: float, max_tokens: int) -> str:
+    payload = json.dumps(
+        {"model": model, "prompt": prompt, "temperature": temperature, "max_tokens": max_tokens},
+        sort_keys=True, ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class RecordingLLM(LLMBackend):
+    """Repassa ao LLM real e grava prompt → resposta (e latência) num cassete JSONL"""
+
+    def __init__(self, backend: LLMBackend, cassette_path: str):
+        self.backend = backend
+        self.model = backend.model
+        self.cassette_path = cassette_path
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(cassette_path)), exist_ok=True)
+
+    def _record(self, prompt: str, temperature: float, max_tokens: int, completion: str, latency: float,
+                completion_tokens: Optional[int] = None):
+        entry = {
+            "key": cassette_key(self.model, prompt, temperature, max_tokens),
+            "model": self.model,
+            "prompt_preview": prompt.strip()[:120],
+            "completion": completion,
+            "latency_s": round(latency, 4)
+        }
+        if completion_tokens is not None:
+            entry["completion_tokens"] = completion_tokens
+        with self._lock, open(self.cassette_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def generate(self, prompt: str, temperature: float = 0.1, max_tokens: int = 1000) -> str:
+        return self.generate_with_usage(prompt, temperature, max_tokens)[0]
+
+    async def agenerate(self, prompt: str, temperature: float = 0.1, max_tokens: int = 1000) -> str:
+        return (await self.agenerate_with_usage(prompt, temperature, max_tokens))[0]
+
+    def generate_with_usage(self, prompt: str, temperature: float = 0.1,
+                            max_tokens: int = 1000) -> Tuple[str, Optional[int]]:
+        start = time.perf_counter()
+        completion, completion_tokens = self.backend.generate_with_usage(prompt, temperature, max_tokens)
+        self._record(prompt, temperature, max_tokens, completion, time.perf_counter() - start, completion_tokens)
+
+        return completion, completion_tokens
+
+    async def agenerate_with_usage(self, prompt: str, temperature: float = 0.1,
+                                   max_tokens: int = 1000) -> Tuple[str, Optional[int]]:
+        start = time.perf_counter()
+        completion, completion_tokens = await self.backend.agenerate_with_usage(prompt, temperature, max_tokens)
+        self._record(prompt, temperature, max_tokens, completion, time.perf_counter() - start, completion_tokens)
+
+        return completion, completion_tokens
+
+    def generate_stream(self, prompt: str, temperature: float = 0.1, max_tokens: int = 1000) -> Iterator[str]:
+        start = time.perf_counter()
+        parts = []
+
+        for token in self.backend.generate_stream(prompt, temperature, max_tokens):
+            parts.append(token)
+            yield token
+
+        self._record(prompt, temperature, max_tokens, "".join(parts), time.perf_counter() - start)
+
+
+class ReplayLLM(LLMBackend):
+    """Responde a partir do cassete, sem rede nem chave de API
+
+    latency controla o tempo simulado por chamada: None (sem espera),
+    "recorded" (latência gravada) ou um valor fixo em segundos; jitter aplica
+    variação relativa com semente fixa, para execuções reprodutíveis.
+    """
+
+    def __init__(self, cassette_path: str, model: str = "", latency: Union[None, str, float] = None,
+                 jitter: float = 0.0, seed: int = 42):
+        self.cassette_path = cassette_path
+        self.model = model
+        self.latency = latency
+        self.jitter = jitter
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        if not os.path.exists(cassette_path):
+            raise FileNotFoundError(f"Cassete não encontrado: {cassette_path}. Grave antes com LLM_MODE=record")
+
+        self.entries = self._load(cassette_path)
+
+    def _load(self, cassette_path: str) -> Dict[str, Dict]:
+        entries = {}
+        with open(cassette_path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    entries[entry["key"]] = entry  # gravação mais recente prevalece
+
+        if not self.model and entries:
+            self.model = next(iter(entries.values()))["model"]
+
+        return entries
+
+    def _lookup(self, prompt: str, temperature: float, max_tokens: int) -> Dict:
+        entry = self.entries.get(cassette_key(self.model, prompt, temperature, max_tokens))
+
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        if entry is None:
+            raise CassetteMissError(f"Prompt não gravado no cassete ({self.cassette_path})")
+
+        return entry
+
+    def _delay(self, entry: Dict) -> float:
+        if self.latency is None:
+            return 0.0
+
+        base = entry.get("latency_s", 0.0) if self.latency == "recorded" else float(self.latency)
+
+        with self._lock:
+            factor = 1 + self._random.uniform(-self.jitter, self.jitter)
+
+        return max(base * factor, 0.0)
+
+    def generate(self, prompt: str, temperature: float = 0.1, max_tokens: int = 1000) -> str:
+        return self.generate_with_usage(prompt, temperature, max_tokens)[0]
+
+    async def agenerate(self, prompt: str, temperature: float = 0.1, max_tokens: int = 1000) -> str:
+        return (await self.agenerate_with_usage(prompt, temperature, max_tokens))[0]
+
+    def generate_with_usage(self, prompt: str, temperature: float = 0.1,
+                            max_tokens: int = 1000) -> Tuple[str, Optional[int]]:
+        entry = self._lookup(prompt, temperature, max_tokens)
+        time.sleep(self._delay(entry))
+
+        # Cassetes antigos não têm o uso gravado
+        return entry["completion"], entry.get("completion_tokens")
+
+    async def agenerate_with_usage(self, prompt: str, temperature: float = 0.1,
+                                   max_tokens: int = 1000) -> Tuple[str, Optional[int]]:
+        entry = self._lookup(prompt, temperature, max_tokens)
+        await asyncio.sleep(self._delay(entry))
+
+        return entry["completion"], entry.get("completion_tokens")
+
+    def generate_stream(self, prompt: str, temperature: float = 0.1, max_tokens: int = 1000) -> Iterator[str]:
+        entry = self._lookup(prompt, temperature, max_tokens)
+        tokens = entry["completion"].split(" ")
+        per_token = self._delay(entry) / max(len(tokens), 1)
+
+        for i, token in enumerate(tokens):
+            time.sleep(per_token)
+            yield token if i == len(tokens) - 1 else token + " "
+
+
+def create_llm(api_key: Optional[str], model: str, mode: Optional[str] = None,
+               cassette_path: Optional[str] = None) -> LLMBackend:
+    """LLM conforme o modo: live (Groq), record (Groq + gravação) ou replay (cassete)"""
+
+    mode = (mode or os.getenv("LLM_MODE") or "live").lower()
+    cassette_path = cassette_path or os.getenv("LLM_CASSETTE") or os.path.join("eval", "cassettes", "llm.jsonl")
+
+    if mode == "replay":
+        latency = os.getenv("LLM_REPLAY_LATENCY")
+        if latency and latency != "recorded":
+            latency = float(latency)
+        jitter = float(os.getenv("LLM_REPLAY_JITTER", "0"))
+        return ReplayLLM(cassette_path, model, latency=latency, jitter=jitter)
+
+    if mode not in ("live", "record"):
+        raise ValueError(f"LLM_MODE desconhecido: {mode}")
+
+    if not api_key:
+        raise ValueError("API key não encontrada no .env")
+
+    from GroqLLM import GroqLLM
+    llm = GroqLLM(api_key, model)
+
+    return RecordingLLM(llm, cassette_path) if mode == "record" else llm
@@ -0,0 +1,171 @@
+import os
+import time
+import asyncio
+import random
+import threading
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+
+class LLMError(Exception):
+    """Falha na chamada ao LLM (base das exceções tipadas)"""
+
+    retryable = False
+
+
+class LLMRateLimitError(LLMError):
+    """Limite de requisições/tokens da API atingido"""
+
+    retryable = True
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class LLMTimeoutError(LLMError):
+    """Prazo da chamada esgotado (requisição, fila do limitador ou semáforo)"""
+
+    retryable = True
+
+
+class LLMUnavailableError(LLMError):
+    """Erro de conexão ou do servidor (5xx)"""
+
+    retryable = True
+
+
+class LLMRequestError(LLMError):
+    """Requisição rejeitada (autenticação, parâmetros): não adianta repetir"""
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Segundos do cabeçalho Retry-After (número ou data HTTP); None se ausente ou inválido"""
+
+    if not value:
+        return None
+
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+
+    return max((when - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+class TokenBucket:
+    """Balde de tokens thread-safe: capacity por janela, reposição contínua"""
+
+    def __init__(self, capacity: float, refill_per_second: float):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self._available = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._available = min(self.capacity, self._available + (now - self._updated) * self.refill_per_second)
+        self._updated = now
+
+    def _try_acquire(self, amount: float) -> float:
+        """Consome amount se disponível; senão devolve a espera estimada em segundos"""
+
+        with self._lock:
+            self._refill()
+            if self._available >= amount:
+                self._available -= amount
+                return 0.0
+            return (amount - self._available) / self.refill_per_second
+
+    def _check_deadline(self, wait: float, deadline: Optional[float]):
+        if deadline is not None and time.monotonic() + wait > deadline:
+            raise LLMRateLimitError("Limite local de requisições/tokens excederia o prazo da chamada", wait)
+
+    def acquire(self, amount: float = 1, deadline: Optional[float] = None):
+        """Consome amount, esperando a reposição; LLMRateLimitError se passar do prazo"""
+
+        amount = min(amount, self.capacity)
+
+        while True:
+            wait = self._try_acquire(amount)
+            if not wait:
+                return
+            self._check_deadline(wait, deadline)
+            time.sleep(wait)
+
+    async def aacquire(self, amount: float = 1, deadline: Optional[float] = None):
+        """Como acquire, mas espera sem bloquear o event loop"""
+
+        amount = min(amount, self.capacity)
+
+        while True:
+            wait = self._try_acquire(amount)
+            if not wait:
+                return
+            self._check_deadline(wait, deadline)
+            await asyncio.sleep(wait)
+
+    def refund(self, amount: float):
+        """Devolve tokens reservados e não usados (ex.: max_tokens acima do consumo real)"""
+
+        with self._lock:
+            self._refill()
+            self._available = min(self.capacity, self._available + max(amount, 0))
+
+
+class RateLimiter:
+    """Limitador compartilhado de requisições e tokens por minuto"""
+
+    def __init__(self, requests_per_minute: int = 30, tokens_per_minute: int = 8000):
+        self.requests = TokenBucket(requests_per_minute, requests_per_minute / 60)
+        self.tokens = TokenBucket(tokens_per_minute, tokens_per_minute / 60)
+
+    def acquire(self, estimated_tokens: int, deadline: Optional[float] = None):
+        self.requests.acquire(1, deadline)
+        self.tokens.acquire(estimated_tokens, deadline)
+
+    async def aacquire(self, estimated_tokens: int, deadline: Optional[float] = None):
+        await self.requests.aacquire(1, deadline)
+        await self.tokens.aacquire(estimated_tokens, deadline)
+
+
+class RetryPolicy:
+    """Backoff exponencial com jitter completo"""
+
+    def __init__(self, max_retries: int = 3, base_delay: float = 0.5, max_delay: float = 8.0):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        if retry_after:
+            return min(retry_after, self.max_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+_shared_limiter = None
+_shared_lock = threading.Lock()
+
+
+def shared_rate_limiter() -> RateLimiter:
+    """Limitador único do processo (GROQ_RPM / GROQ_TPM ajustam os limites)"""
+
+    global _shared_limiter
+
+    with _shared_lock:
+        if _shared_limiter is None:
+            _shared_limiter = RateLimiter(
+                requests_per_minute=int(os.getenv("GROQ_RPM", "30")),
+                tokens_per_minute=int(os.getenv("GROQ_TPM", "8000"))
+            )
+        return _shared_limiter
+
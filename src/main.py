@@ -1,4 +1,7 @@
 from agent_educacional import AgentEducacional
+from metrics_registry import metrics, start_metrics_server
+from profiling import profile_queries, summarize
+import os
 import sys
 import traceback
 
@@ -9,6 +12,7 @@ class InteractiveRAGSystem:
         self.vectorstore_path = vectorstore_path
         self.rag_system = None
         self.session_queries = []
+        self.metrics_server = None
         
     def initialize(self):
         
@@ -18,9 +22,13 @@ class InteractiveRAGSystem:
         try:
             self.rag_system = AgentEducacional(
                 vectorstore_path=self.vectorstore_path,
+                collect_metrics=True,
                 verbose=True
             )
             
+            if os.getenv("METRICS_PORT"):
+                self.start_metrics_endpoint(int(os.getenv("METRICS_PORT")))
+            
             return True
             
         except FileNotFoundError as e:
@@ -158,17 +166,28 @@ class InteractiveRAGSystem:
             
             for step in debug_result['steps']:
                 agent_name = step['agent'].upper()
-                print(f"\n{agent_name}:")
+                print(f"\n{agent_name} ({step.get('wall_ms', 0):.1f} ms):")
                 
                 if 'chunks_found' in step:
                     chunks = step['chunks_found']
                     icon = "OK" if chunks > 0 else "AVISO"
-                    print(f"   {icon} Chunks encontrados: {chunks}")
+                    print(f"   {icon} Chunks encontrados: {chunks} (caminho: {step['retrieval_path'] or '-'})")
+                    for candidate in step.get('candidates', []):
+                        print(f"      #{candidate['chunk_id']} Art. {candidate['article'] or '-'} "
+                              f"score={candidate['score']:.4f} ({candidate['match_type']})")
                 
                 if 'answer_generated' in step:
                     generated = step['answer_generated']
                     icon = "OK" if generated else "ERRO"
                     print(f"   {icon} Resposta gerada: {generated}")
+                    estimated = " (estimado)" if step.get('completion_tokens_estimated') else ""
+                    print(f"   Tokens: prompt {step['prompt_tokens']}, resposta {step['completion_tokens']}{estimated}")
+                
+                if 'breakdown' in step:
+                    breakdown = step['breakdown']
+                    print(f"   Self-Check: {'APROVADO' if step['passed'] else 'REJEITADO'} "
+                          f"(similaridade {breakdown.get('similarity', 0):.3f}, "
+                          f"frases fundamentadas {step['grounded_sentences']})")
                 
                 if 'next_agent' in step:
                     print(f"   Próximo: {step['next_agent']}")
@@ -176,9 +195,75 @@ class InteractiveRAGSystem:
                 for log in step.get('logs', []):
                     print(f"   Log: {log}")
             
+            print(f"\nTempo total: {debug_result.get('total_ms', 0):.1f} ms")
+            
         except Exception as e:
             print(f"Erro na análise: {str(e)}")
     
+    def print_streamed_answer(self, query: str):
+        
+        for event in self.rag_system.ask_stream(query):
+            if event["type"] == "sources":
+                print(f"({event['chunks']} trechos recuperados)\n")
+            
+            elif event["type"] == "token":
+                print(event["text"], end="", flush=True)
+            
+            elif event["type"] == "final":
+                raw_answer = event["raw_answer"].strip()
+                final_answer = event["final_answer"]
+                
+                if raw_answer and final_answer.startswith(raw_answer):
+                    # Aprovada: completar com fontes e aviso do Safety
+                    print(final_answer[len(raw_answer):])
+                elif raw_answer:
+                    print(f"\n\n[Resposta reprovada na verificação] {final_answer}")
+                else:
+                    print(final_answer)
+    
+    def run_profile(self, queries: list):
+        
+        print(f"\nPerfilando {len(queries)} pergunta(s) com cProfile...")
+        
+        try:
+            stats, path, elapsed = profile_queries(self.rag_system, queries)
+            summary = summarize(stats)
+            
+            print(f"\nTempo total: {elapsed:.2f}s ({elapsed / len(queries):.2f}s por pergunta)")
+            
+            print(f"\nTempo próprio por subsistema:")
+            for subsystem, seconds in summary['subsystems']:
+                print(f"   {subsystem:<22} {seconds:>8.3f}s  {100 * seconds / max(elapsed, 1e-9):>5.1f}%")
+            
+            print(f"\nFunções por tempo acumulado:")
+            print(f"   {'acumulado':>9} {'próprio':>8} {'chamadas':>9}  subsistema / função")
+            for item in summary['functions']:
+                print(f"   {item['cumtime']:>8.3f}s {item['tottime']:>7.3f}s {item['calls']:>9}  "
+                      f"{item['subsystem']} / {item['function']}")
+            
+            print(f"\nPerfil salvo em: {path} (abrir com 'snakeviz {path}' ou pstats)")
+            
+        except Exception as e:
+            print(f"Erro no profiling: {str(e)}")
+    
+    def start_metrics_endpoint(self, port: int = 9464):
+        
+        if self.metrics_server is not None:
+            print(f"Endpoint de métricas já ativo na porta {self.metrics_server.server_address[1]}")
+            return
+        
+        try:
+            self.metrics_server = start_metrics_server(port)
+            print(f"Métricas Prometheus em http://127.0.0.1:{port}/metrics")
+        except OSError as e:
+            print(f"Não foi possível abrir a porta {port}: {e}")
+    
+    def show_metrics(self):
+        
+        print("\nMÉTRICAS (formato Prometheus)")
+        print("-" * 30)
+        print(metrics.render())
+    
     def show_session_stats(self):
         
         total_queries = len(self.session_queries)
@@ -258,15 +343,46 @@ class InteractiveRAGSystem:
             self.show_session_stats()
             return True
         
+        elif user_input.lower().startswith("profile "):
+            query = user_input[8:].strip()
+            if query:
+                self.run_profile([query])
+            else:
+                print("Forneça uma query. Ex: 'profile o que é cidade inteligente'")
+            return True
+        
+        elif user_input.lower().startswith("profile-batch "):
+            path = user_input[14:].strip()
+            try:
+                with open(path, encoding="utf-8") as f:
+                    queries = [line.strip() for line in f if line.strip() and not line.startswith("#")]
+            except OSError as e:
+                print(f"Não foi possível ler {path}: {e}")
+                return True
+            
+            if queries:
+                self.run_profile(queries)
+            else:
+                print(f"Nenhuma pergunta em {path} (uma por linha)")
+            return True
+        
+        elif user_input.lower() == "metrics":
+            self.show_metrics()
+            return True
+        
+        elif user_input.lower().startswith("metrics-server"):
+            port = user_input[len("metrics-server"):].strip()
+            self.start_metrics_endpoint(int(port) if port.isdigit() else 9464)
+            return True
+        
         else:
             try:
                 print(f"\nProcessando: '{user_input[:60]}{'...' if len(user_input) > 60 else ''}'")
                 
                 self.session_queries.append(user_input)
                 
-                answer = self.rag_system.ask(user_input)
                 print(f"\nResposta:")
-                print(f"{answer}")
+                self.print_streamed_answer(user_input)
                 
             except Exception as e:
                 print(f"\nErro ao processar pergunta: {str(e)}")
@@ -0,0 +1,194 @@
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Latências de milissegundos (nós locais) a dezenas de segundos (LLM)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+GRAPH_NODES = {"supervisor", "retriever", "evidence_gate", "compressor", "answerer", "self_check", "safety", "error"}
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, object]) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class Counter:
+    """Contador monotônico com rótulos"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(_label_key(labels), 0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            return [f"{self.name}{_format_labels(key)} {value:g}" for key, value in sorted(self._values.items())]
+
+
+class Histogram:
+    """Histograma cumulativo (formato Prometheus) com rótulos"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[LabelKey, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            # [contagem por bucket..., +Inf, soma]
+            series = self._series.setdefault(key, [0] * (len(self.buckets) + 2))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def count(self, **labels) -> int:
+        series = self._series.get(_label_key(labels))
+        return int(series[-2]) if series else 0
+
+    def samples(self) -> List[str]:
+        lines = []
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series):
+                    lines.append(f"{self.name}_bucket{_format_labels(key, ('le', f'{bound:g}'))} {count:g}")
+                lines.append(f"{self.name}_bucket{_format_labels(key, ('le', '+Inf'))} {series[-2]:g}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {series[-1]:.6f}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {series[-2]:g}")
+        return lines
+
+
+class MetricsRegistry:
+    """Registro de métricas do processo, exportado em texto Prometheus"""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name: str, help_text: str, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help_text, **kwargs)
+            return metric
+
+    def counter(self, name: str, help_text: str = "") -> Counter:
+        return self._get(Counter, name, help_text)
+
+    def histogram(self, name: str, help_text: str = "", buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._get(Histogram, name, help_text, buckets=buckets)
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+
+class MetricsSink:
+    """Sink do Tracer que converte spans do grafo em métricas agregadas"""
+
+    def __init__(self, registry: MetricsRegistry = metrics):
+        self.node_latency = registry.histogram("rag_node_latency_seconds", "Latência por nó do grafo")
+        self.request_latency = registry.histogram("rag_request_latency_seconds", "Latência ponta a ponta da pergunta")
+        self.requests = registry.counter("rag_requests_total", "Perguntas processadas")
+        self.cache_lookups = registry.counter("rag_cache_lookups_total", "Consultas aos caches de respostas")
+        self.retrieval_paths = registry.counter("rag_retrieval_path_total", "Caminho da busca escolhido pelo Retriever")
+        self.query_types = registry.counter("rag_query_type_total", "Classificação da pergunta pelo Supervisor")
+        self.tokens = registry.counter("rag_prompt_tokens_total", "Tokens de prompt montados pelo Answerer")
+        self.self_check = registry.counter("rag_self_check_total", "Resultados do Self-Check")
+        self.evidence_gate = registry.counter("rag_evidence_gate_total", "Decisões do portão de evidências")
+
+    def write(self, span: Dict[str, object]):
+        name = span["name"]
+        seconds = span["duration_ms"] / 1000
+
+        if name in GRAPH_NODES:
+            self.node_latency.observe(seconds, node=name)
+        elif name == "request":
+            cached = "true" if span.get("cached") else "false"
+            self.request_latency.observe(seconds, cached=cached)
+            self.requests.inc(cached=cached)
+        elif name.startswith("cache."):
+            self.cache_lookups.inc(cache=name[len("cache."):], result=span.get("cache", "miss"))
+
+        if name == "supervisor" and span.get("query_type"):
+            self.query_types.inc(type=span["query_type"])
+        if name == "retriever" and span.get("retrieval_path"):
+            self.retrieval_paths.inc(path=span["retrieval_path"])
+        if name == "answerer" and span.get("prompt_tokens"):
+            self.tokens.inc(span["prompt_tokens"])
+        if name == "self_check":
+            self.self_check.inc(result="passed" if span.get("self_check_passed") else "rejected")
+        if name == "evidence_gate":
+            self.evidence_gate.inc(result="passed" if span.get("evidence_passed") else "blocked")
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = metrics
+
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+
+        body = self.registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port: Optional[int] = None, host: str = "127.0.0.1",
+                         registry: MetricsRegistry = metrics) -> ThreadingHTTPServer:
+    """Endpoint HTTP local (/metrics) numa thread daemon; porta padrão em METRICS_PORT ou 9464"""
+
+    port = port if port is not None else int(os.getenv("METRICS_PORT", "9464"))
+    handler = type("MetricsHandler", (_MetricsHandler,), {"registry": registry})
+    server = ThreadingHTTPServer((host, port), handler)
+
+    thread = threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True)
+    thread.start()
+
+    return server
@@ -0,0 +1,82 @@
+import os
+import time
+import pstats
+import cProfile
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+# Ordem importa: o primeiro padrão encontrado no caminho do arquivo define o subsistema
+SUBSYSTEMS = [
+    ("ingest/vector_store", ("ingest/vector_store", "ingest/shard_router", "ingest/literal_index")),
+    ("ingest", ("ingest/",)),
+    ("agents", ("src/agents/",)),
+    ("langgraph", ("langgraph",)),
+    ("langchain", ("langchain",)),
+    ("sentence_transformers", ("sentence_transformers", "transformers", "torch", "onnxruntime", "tokenizers")),
+    ("faiss", ("faiss",)),
+    ("groq", ("groq", "httpx", "httpcore", "ssl", "socket")),
+    ("src", ("src/",)),
+]
+
+
+def subsystem_of(filename: str) -> str:
+    path = filename.replace(os.sep, "/")
+    for name, patterns in SUBSYSTEMS:
+        if any(pattern in path for pattern in patterns):
+            return name
+    return "outros"
+
+
+def profile_queries(rag_system, queries: List[str], output_dir: str = "profiles") -> Tuple[pstats.Stats, str, float]:
+    """Executa as perguntas sob cProfile e salva o .prof (snakeviz, pstats, gprof2dot)
+
+    Os caches de respostas ficam fora durante a execução: a partir da segunda
+    vez, a pergunta seria um acerto de cache e não o pipeline.
+    """
+
+    supervisor = rag_system.supervisor
+    answer_caches, supervisor.answer_caches = supervisor.answer_caches, []
+
+    profiler = cProfile.Profile()
+    start = time.perf_counter()
+
+    profiler.enable()
+    try:
+        for query in queries:
+            rag_system.ask(query)
+    finally:
+        profiler.disable()
+        supervisor.answer_caches = answer_caches
+
+    elapsed = time.perf_counter() - start
+
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, f"profile-{time.strftime('%Y%m%d-%H%M%S')}.prof")
+    profiler.dump_stats(path)
+
+    return pstats.Stats(profiler), path, elapsed
+
+
+def summarize(stats: pstats.Stats, top: int = 15) -> Dict[str, List]:
+    """Tempo próprio por subsistema e funções com maior tempo acumulado"""
+
+    own_by_subsystem = defaultdict(float)
+    functions = []
+
+    for (filename, line, name), (_, calls, tottime, cumtime, _) in stats.stats.items():
+        subsystem = subsystem_of(filename)
+        own_by_subsystem[subsystem] += tottime
+        functions.append({
+            "subsystem": subsystem,
+            "function": f"{os.path.basename(filename)}:{line}({name})",
+            "calls": calls,
+            "tottime": tottime,
+            "cumtime": cumtime
+        })
+
+    functions.sort(key=lambda item: item["cumtime"], reverse=True)
+
+    return {
+        "subsystems": sorted(own_by_subsystem.items(), key=lambda item: item[1], reverse=True),
+        "functions": functions[:top]
+    }
@@ -0,0 +1,181 @@
+import os
+import sys
+import json
+import time
+import uuid
+import threading
+import contextvars
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+
+class SlowRequestProfiler:
+    """Profiler por amostragem para perguntas lentas
+
+    Uma thread daemon amostra a pilha (sys._current_frames) só das threads com
+    pergunta em andamento. Se a pergunta passar de threshold_seconds, a pilha
+    agregada (formato collapsed, para flamegraph) e os spans da pergunta vão
+    para output_dir; perguntas rápidas não deixam nada em disco.
+
+    No fluxo async a pergunta ocupa o event loop e as threads do pool de CPU
+    (thread_prefixes); com perguntas concorrentes essas threads são
+    compartilhadas, e o .json registra quantas estavam ativas.
+    """
+
+    def __init__(self, threshold_seconds: float = 5.0, output_dir: str = "logs/slow_requests",
+                 interval: float = 0.005, max_stacks: int = 5000):
+        self.threshold_seconds = threshold_seconds
+        self.output_dir = output_dir
+        self.interval = interval
+        self.max_stacks = max_stacks
+
+        self._active: Dict[int, Dict[str, Any]] = {}
+        # Pergunta do contexto atual: spans chegam do event loop e das threads do pool
+        self._current = contextvars.ContextVar("slow_request", default=None)
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    @classmethod
+    def from_env(cls) -> Optional['SlowRequestProfiler']:
+        """SLOW_REQUEST_SECONDS ativa o profiler; SLOW_REQUEST_DIR define o diretório"""
+
+        if not os.getenv("SLOW_REQUEST_SECONDS"):
+            return None
+        return cls(float(os.getenv("SLOW_REQUEST_SECONDS")),
+                   os.getenv("SLOW_REQUEST_DIR", "logs/slow_requests"))
+
+    def _ensure_sampler(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._sample_loop, name="slow-request-sampler", daemon=True)
+                self._thread.start()
+
+    def _sample_loop(self):
+        while True:
+            # Sem pergunta em andamento, a thread fica parada
+            self._wakeup.wait()
+
+            # Sob o lock: profile() só grava a pilha depois da última amostra
+            with self._lock:
+                if not self._active:
+                    self._wakeup.clear()
+                    continue
+
+                frames = sys._current_frames()
+                names = {}
+                if any(record["thread_prefixes"] for record in self._active.values()):
+                    names = {thread.ident: thread.name for thread in threading.enumerate()}
+
+                for record in self._active.values():
+                    record["max_concurrent"] = max(record["max_concurrent"], len(self._active))
+                    pool_threads = {ident for ident, name in names.items()
+                                    if record["thread_prefixes"] and name.startswith(record["thread_prefixes"])}
+
+                    for thread_id in record["threads"] | pool_threads:
+                        frame = frames.get(thread_id)
+                        # Thread do pool ociosa: parada em _worker aguardando a fila
+                        if frame is None or (thread_id in pool_threads and frame.f_code.co_name == "_worker"):
+                            continue
+
+                        stack = self._collapse(frame)
+                        samples = record["samples"]
+                        if stack in samples or len(samples) < self.max_stacks:
+                            samples[stack] += 1
+                        else:
+                            record["dropped"] += 1
+
+                frames = frame = None
+
+            time.sleep(self.interval)
+
+    def _collapse(self, frame) -> str:
+        """Pilha da raiz até a folha: "arquivo:função;arquivo:função;..." """
+
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+            frame = frame.f_back
+
+        return ";".join(reversed(names))
+
+    @contextmanager
+    def profile(self, query: str, thread_prefixes: Tuple[str, ...] = ()) -> Iterator[Dict[str, Any]]:
+        """Amostra a thread atual (e as de nome com um dos thread_prefixes) durante o bloco"""
+
+        self._ensure_sampler()
+
+        record = {"query": query, "samples": Counter(), "dropped": 0, "spans": [], "start": time.time(),
+                  "threads": {threading.get_ident()}, "thread_prefixes": tuple(thread_prefixes),
+                  "max_concurrent": 1}
+        started = time.perf_counter()
+        token = self._current.set(record)
+
+        with self._lock:
+            self._active[id(record)] = record
+        self._wakeup.set()
+
+        try:
+            yield record
+        finally:
+            with self._lock:
+                self._active.pop(id(record), None)
+            self._current.reset(token)
+
+            elapsed = time.perf_counter() - started
+            if elapsed >= self.threshold_seconds:
+                self._write(record, elapsed)
+
+    def write(self, span: Dict[str, Any]):
+        """Sink do Tracer: guarda os spans da pergunta em andamento neste contexto"""
+
+        record = self._current.get()
+        if record is not None:
+            record["spans"].append(span)
+
+    def _top_functions(self, samples: Counter, limit: int = 15) -> List[Dict[str, Any]]:
+        total = sum(samples.values()) or 1
+        own = Counter()
+        inclusive = Counter()
+
+        for stack, count in samples.items():
+            frames = stack.split(";")
+            own[frames[-1]] += count
+            for name in set(frames):
+                inclusive[name] += count
+
+        return [
+            {
+                "function": name,
+                "own_pct": round(100 * count / total, 1),
+                "inclusive_pct": round(100 * inclusive[name] / total, 1)
+            }
+            for name, count in own.most_common(limit)
+        ]
+
+    def _write(self, record: Dict[str, Any], elapsed: float):
+        os.makedirs(self.output_dir, exist_ok=True)
+        base = os.path.join(self.output_dir, f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}")
+
+        samples = record["samples"]
+        with open(base + ".collapsed", "w", encoding="utf-8") as f:
+            for stack, count in samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+        trace = {
+            "query": record["query"],
+            "start": record["start"],
+            "duration_seconds": round(elapsed, 3),
+            "threshold_seconds": self.threshold_seconds,
+            "interval_seconds": self.interval,
+            "samples": sum(samples.values()),
+            "dropped_samples": record["dropped"],
+            "concurrent_requests": record["max_concurrent"],
+            "top_functions": self._top_functions(samples),
+            "spans": record["spans"],
+            "flamegraph": os.path.basename(base + ".collapsed")
+        }
+        with open(base + ".json", "w", encoding="utf-8") as f:
+            json.dump(trace, f, ensure_ascii=False, indent=2)
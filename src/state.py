@@ -1,17 +1,33 @@
-from typing import Dict, TypedDict, List
+from typing import Dict, TypedDict, List, Any
 from langchain_core.documents import Document
+from ingest.vector_store import RetrievalHit
 
 class RAGState(TypedDict, total=False):
     query: str
+    trace_id: str
+    query_type: str
     enhanced_query: str  
     user_profile: Dict[str, str]  
     conversation_history: List[Dict]  
     awaiting_user_input: bool  
+    document_scope: Dict[str, Any]
+    query_vector: Any
+    retrieval_hits: List[RetrievalHit]
     retrieved_chunks: List[Document]
+    retrieval_quality: str
+    retrieval_path: str
+    evidence: Dict[str, Any]
+    context_chunks: List[Document]
+    prompt_tokens: int
+    completion_tokens: int
+    completion_tokens_estimated: bool
     raw_answer: str
+    llm_error: Dict[str, str]
     final_answer: str
     citations: List[str]
     self_check_passed: bool
+    self_check_details: Dict[str, Any]
+    sentence_grounding: List[Dict[str, Any]]
     safety_applied: bool
     agent_logs: List[str]
     next_agent: str
\ No newline at end of file
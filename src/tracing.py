@@ -0,0 +1,151 @@
+import os
+import json
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional
+
+
+class JsonlSink:
+    """Spans anexados a um arquivo JSONL (um span por linha)"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def write(self, span: Dict[str, Any]):
+        line = json.dumps(span, ensure_ascii=False)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+class RingBufferSink:
+    """Últimos spans em memória (capacidade fixa)"""
+
+    def __init__(self, capacity: int = 1000):
+        self._spans = deque(maxlen=capacity)
+
+    def write(self, span: Dict[str, Any]):
+        self._spans.append(span)
+
+    def spans(self, trace_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        spans = list(self._spans)
+        if trace_id is None:
+            return spans
+        return [span for span in spans if span.get("trace_id") == trace_id]
+
+
+class MultiSink:
+    """Repassa cada span a vários sinks (ex.: arquivo JSONL e métricas)"""
+
+    def __init__(self, sinks: List):
+        self.sinks = sinks
+
+    def write(self, span: Dict[str, Any]):
+        for sink in self.sinks:
+            sink.write(span)
+
+
+class Tracer:
+    """Spans por nó do grafo: início, fim, duração e atributos do resultado
+
+    Sem sink, o tracer fica desativado: wrap devolve o próprio nó e span
+    não mede nada.
+    """
+
+    def __init__(self, sink=None):
+        self.sink = sink
+        self.enabled = sink is not None
+
+    @classmethod
+    def from_env(cls, extra_sinks: Optional[List] = None) -> 'Tracer':
+        """TRACE_FILE (JSONL) ou TRACE_BUFFER (tamanho do buffer em memória), mais extra_sinks"""
+
+        sinks = list(extra_sinks or [])
+        if os.getenv("TRACE_FILE"):
+            sinks.append(JsonlSink(os.getenv("TRACE_FILE")))
+        elif os.getenv("TRACE_BUFFER"):
+            sinks.append(RingBufferSink(int(os.getenv("TRACE_BUFFER"))))
+
+        if not sinks:
+            return cls()
+        return cls(sinks[0] if len(sinks) == 1 else MultiSink(sinks))
+
+    @contextmanager
+    def span(self, name: str, trace_id: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """Mede o bloco; atributos adicionados ao dict entram no span"""
+
+        if not self.enabled:
+            yield {}
+            return
+
+        attributes = {}
+        start = time.time()
+        started = time.perf_counter()
+        try:
+            yield attributes
+        except Exception as e:
+            attributes["error"] = type(e).__name__
+            raise
+        finally:
+            self.sink.write({
+                "trace_id": trace_id,
+                "name": name,
+                "start": round(start, 6),
+                "end": round(start + time.perf_counter() - started, 6),
+                "duration_ms": round((time.perf_counter() - started) * 1000, 3),
+                **attributes
+            })
+
+    def wrap(self, name: str, node: Callable[[Dict[str, Any]], Dict[str, Any]]) -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+        """Envolve um nó do grafo; desativado, devolve o nó sem alteração"""
+
+        if not self.enabled:
+            return node
+
+        def traced(state: Dict[str, Any]) -> Dict[str, Any]:
+            with self.span(name, state.get("trace_id")) as attributes:
+                result = node(state)
+                attributes.update(node_attributes(result))
+            return result
+
+        return traced
+
+    def wrap_async(self, name: str, node: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]) -> Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]:
+        """Como wrap, para nós assíncronos"""
+
+        if not self.enabled:
+            return node
+
+        async def traced(state: Dict[str, Any]) -> Dict[str, Any]:
+            with self.span(name, state.get("trace_id")) as attributes:
+                result = await node(state)
+                attributes.update(node_attributes(result))
+            return result
+
+        return traced
+
+
+def node_attributes(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Atributos de um span a partir da atualização de estado devolvida pelo nó"""
+
+    attributes = {"route": result.get("next_agent")}
+
+    if "retrieved_chunks" in result:
+        attributes["chunks"] = len(result["retrieved_chunks"])
+    if result.get("context_chunks"):
+        attributes["context_chunks"] = len(result["context_chunks"])
+    for key in ("query_type", "retrieval_path", "retrieval_quality", "prompt_tokens", "completion_tokens", "completion_tokens_estimated", "self_check_passed"):
+        if result.get(key) not in (None, ""):
+            attributes[key] = result[key]
+    if result.get("evidence"):
+        attributes["evidence_passed"] = result["evidence"].get("passed")
+    if result.get("llm_error"):
+        attributes["llm_error"] = result["llm_error"].get("type")
+
+    return attributes
@@ -0,0 +1,21 @@
+import os
+import sys
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.join(project_root, "src"))
+
+from answer_cache import normalize_query, article_references
+
+
+def test_normalize_query_keeps_space_after_article_number():
+    # Regressão: o ordinal opcional consumia o espaço ("art 175trata")
+    assert normalize_query("artigo 175 trata do que") == "art 175 trata do que"
+    assert article_references("artigo 175 trata do que") == ["175"]
+
+
+def test_normalize_query_ordinal():
+    assert normalize_query("Art. 175º") == "art 175"
+    assert normalize_query("Art. 175º") == normalize_query("artigo 175")
+    assert article_references("Art. 175º") == ["175"]
@@ -0,0 +1,91 @@
+import os
+import sys
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.join(project_root, "src"))
+
+from langchain_core.documents import Document
+from ingest.token_counter import count_tokens
+from agents.answerer import AnswererAgent
+
+OVERLAP = "As zonas especiais de interesse social destinam-se à habitação popular."
+
+
+def doc(text, source="plano_diretor.pdf"):
+    return Document(page_content=text, metadata={"source": source})
+
+
+def sentences(prefix, count):
+    return " ".join(f"{prefix} frase número {i} sobre o zoneamento urbano." for i in range(count))
+
+
+def test_overlap_spans_are_removed_from_lower_ranked_chunks():
+    first = doc(f"Art. 20. O município instituirá ZEIS. {OVERLAP}")
+    second = doc(f"{OVERLAP} Parágrafo único. A lei específica delimitará as ZEIS.")
+
+    selected, stats = AnswererAgent(None)._fit_context([first, second], budget=1000)
+
+    assert [text for _, text in selected] == [
+        first.page_content, "Parágrafo único. A lei específica delimitará as ZEIS."
+    ]
+    assert stats["duplicate_spans"] == 1
+
+
+def test_least_relevant_chunks_are_dropped_first():
+    chunks = [doc(sentences(name, 5)) for name in ("primeiro", "segundo", "terceiro")]
+    budget = count_tokens(chunks[0].page_content) + count_tokens(chunks[1].page_content)
+
+    selected, stats = AnswererAgent(None)._fit_context(chunks, budget)
+
+    assert [d for d, _ in selected] == chunks[:2]
+    assert stats["chunks_dropped"] == 1
+    assert stats["context_tokens"] <= stats["context_budget"] == budget
+
+
+def test_single_chunk_is_truncated_within_budget():
+    chunk = doc(sentences("longo", 40))
+
+    selected, stats = AnswererAgent(None)._fit_context([chunk], budget=30)
+
+    [(_, text)] = selected
+    assert chunk.page_content.startswith(text)
+    assert count_tokens(text) <= 30
+    assert stats["context_tokens"] == count_tokens(text)
+
+
+def test_sentence_longer_than_budget_is_cut_by_tokens():
+    chunk = doc("palavra " * 200)
+
+    [(_, text)] = AnswererAgent(None)._fit_context([chunk], budget=10)[0]
+
+    assert 0 < count_tokens(text) <= 10
+
+
+def test_negative_budget_is_clamped():
+    selected, stats = AnswererAgent(None)._fit_context([doc(sentences("curto", 3))], budget=-50)
+
+    assert selected == []
+    assert stats["context_budget"] == 0
+    assert stats["context_tokens"] == 0
+
+
+def test_prompt_stays_within_max_prompt_tokens():
+    answerer = AnswererAgent(None, max_prompt_tokens=600)
+    chunks = [doc(sentences(name, 30), source=f"{name}.pdf") for name in ("a", "b", "c")]
+
+    prompt, _, stats = answerer.prepare_prompt({"query": "Como funciona o zoneamento?", "retrieved_chunks": chunks})
+
+    assert stats["within_budget"]
+    assert stats["prompt_tokens"] == count_tokens(prompt) <= 600
+
+
+def test_query_longer_than_the_limit_is_reported():
+    answerer = AnswererAgent(None, max_prompt_tokens=600)
+
+    _, _, stats = answerer.prepare_prompt({"query": "zoneamento " * 800, "retrieved_chunks": [doc("Art. 1. Texto.")]})
+
+    assert stats["context_budget"] == 0
+    assert stats["chunks_used"] == 0
+    assert not stats["within_budget"]
@@ -0,0 +1,74 @@
+import os
+import sys
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.join(project_root, "src"))
+
+import numpy as np
+from agent_educacional import AgentEducacional
+
+
+class SlowSupervisor:
+    """Respostas que terminam fora de ordem; registra concorrência e vetores recebidos"""
+
+    def __init__(self, delays):
+        self.delays = delays
+        self.running = 0
+        self.max_running = 0
+        self.vectors = {}
+
+    def needs_embedding(self, query):
+        return not query.startswith("Art.")
+
+    async def ahandle_query(self, query, document_scope=None, query_vector=None):
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        self.vectors[query] = query_vector
+        await asyncio.sleep(self.delays[query])
+        self.running -= 1
+        return f"resposta: {query}"
+
+
+class BatchEncoder:
+    def __init__(self):
+        self.batches = []
+
+    def encode_queries(self, queries):
+        self.batches.append(list(queries))
+        return np.arange(len(queries) * 2, dtype=np.float32).reshape(len(queries), 2)
+
+
+def make_agent(delays):
+    # Sem vectorstore nem modelos: só o que ask_many usa
+    agent = AgentEducacional.__new__(AgentEducacional)
+    agent.supervisor = SlowSupervisor(delays)
+    agent.vectorstore = BatchEncoder()
+    agent.executor = ThreadPoolExecutor(max_workers=1)
+    agent.profiler = None
+    return agent
+
+
+def test_ask_many_keeps_input_order_and_bounds_concurrency():
+    queries = ["zoneamento", "mobilidade", "Art. 10", "ZEIS", "calçadas"]
+    agent = make_agent({query: 0.05 * (len(queries) - i) for i, query in enumerate(queries)})
+
+    answers = agent.ask_many(queries + [" "], concurrency=2)
+
+    assert answers == [f"resposta: {query}" for query in queries] + ["Por favor, faça uma pergunta válida."]
+    assert agent.supervisor.max_running == 2
+
+
+def test_ask_many_encodes_pending_queries_in_one_batch():
+    queries = ["zoneamento", "Art. 10", "zoneamento ", "mobilidade"]
+    agent = make_agent({"zoneamento": 0, "Art. 10": 0, "mobilidade": 0})
+
+    agent.ask_many(queries)
+
+    # Duplicatas (após strip) e perguntas por artigo ficam fora do lote
+    assert agent.vectorstore.batches == [["zoneamento", "mobilidade"]]
+    assert agent.supervisor.vectors["Art. 10"] is None
+    assert agent.supervisor.vectors["mobilidade"].tolist() == [[2.0, 3.0]]
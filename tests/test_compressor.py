@@ -0,0 +1,73 @@
+import os
+import sys
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.join(project_root, "src"))
+
+import numpy as np
+from langchain_core.documents import Document
+from ingest.token_counter import count_tokens
+from agents.compressor import CompressorAgent
+
+VOCABULARY = ["calçadas", "acessibilidade", "ciclovias", "arborização", "iluminação"]
+
+
+class KeywordEncoder:
+    """Encoder de teste: uma dimensão por palavra do vocabulário"""
+
+    def encode(self, texts, normalize_embeddings=True):
+        vectors = np.array([[1.0 if word in text.lower() else 0.0 for word in VOCABULARY] + [0.1]
+                            for text in texts], dtype=np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+CHUNK = Document(
+    page_content=(
+        "Art. 12. A política de mobilidade observará as seguintes diretrizes:\n"
+        "I – implantar ciclovias nos eixos principais;\n"
+        "II – garantir calçadas com acessibilidade universal;\n"
+        "III – ampliar a arborização das vias;\n"
+        "IV – modernizar a iluminação pública."
+    ),
+    metadata={"article_number": "12", "token_count": 60}
+)
+
+
+def make_compressor(max_sentences=1):
+    compressor = CompressorAgent(max_sentences_per_chunk=max_sentences, min_similarity=0.5)
+    compressor.model = KeywordEncoder()
+    return compressor
+
+
+def compress(compressor, query, chunks):
+    return compressor({"query": query, "retrieved_chunks": chunks, "agent_logs": []})["context_chunks"]
+
+
+def test_keeps_heading_and_best_sentence_with_gap_marker():
+    [doc] = compress(make_compressor(), "Como garantir calçadas com acessibilidade?", [CHUNK])
+
+    assert doc.page_content.startswith("Art. 12. A política de mobilidade")
+    assert "[...] II – garantir calçadas com acessibilidade universal;" in doc.page_content
+    assert "ciclovias" not in doc.page_content
+    assert doc.metadata["kept_sentences"] == [0, 2]
+
+
+def test_token_count_is_recounted_and_source_chunk_untouched():
+    [doc] = compress(make_compressor(), "calçadas e acessibilidade", [CHUNK])
+
+    assert doc.metadata["token_count"] == count_tokens(doc.page_content)
+    assert doc.metadata["token_count"] < count_tokens(CHUNK.page_content)
+    assert CHUNK.metadata == {"article_number": "12", "token_count": 60}
+
+
+def test_article_reference_added_when_heading_is_dropped():
+    continuation = Document(
+        page_content="§ 1º As ciclovias serão sinalizadas.\n§ 2º A iluminação pública usará LED.",
+        metadata={"article_number": "12", "part_index": 1}
+    )
+
+    [doc] = compress(make_compressor(), "iluminação pública", [continuation])
+
+    assert doc.page_content == "Art. 12 [...] § 2º A iluminação pública usará LED."
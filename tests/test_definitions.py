@@ -0,0 +1,90 @@
+import os
+import sys
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+sys.path.insert(0, project_root)
+
+from langchain_core.documents import Document
+from ingest.definitions import DefinitionExtractor, DefinitionIndex
+
+
+CHUNKS = [
+    Document(page_content="O Orçamento Participativo (OP) será anual.", metadata={"article_number": "12"}),
+    Document(page_content="SIM – Sistema de Informações Municipais", metadata={"article_number": "30"}),
+    Document(page_content="Ficam demarcadas as Zonas Especiais de Interesse Social (ZEIS).", metadata={"article_number": "40"}),
+]
+
+
+def build_index():
+    return DefinitionIndex(DefinitionExtractor().extract(CHUNKS))
+
+
+def test_stopword_acronym_is_not_indexed():
+    definitions = DefinitionExtractor().extract(CHUNKS)
+
+    assert "sim" not in definitions
+    assert "op" in definitions
+
+
+def test_acronym_matches_only_in_uppercase():
+    index = build_index()
+
+    assert index.lookup("o que é op no texto") == []
+    assert [e["definition"] for e in index.lookup("O que é o OP?")] == ["Orçamento Participativo"]
+    assert [e["definition"] for e in index.lookup("O que são as ZEIS?")] == ["Zonas Especiais de Interesse Social"]
+
+
+def test_expansion_still_matches_in_lowercase():
+    index = build_index()
+
+    assert [e["definition"] for e in index.lookup("o que é orçamento participativo")] == ["OP"]
+
+
+def test_stopword_keys_are_dropped_from_saved_dictionaries():
+    saved = {"sim": [{"term": "SIM", "definition": "Sistema de Informações Municipais", "kind": "sigla",
+                      "chunk_id": 1, "article_number": "30", "source": None}]}
+
+    assert DefinitionIndex(saved).lookup("Sim, o que é isso?") == []
+
+
+# Trechos reais do plano diretor que geravam chaves como "areas rurais" → NUAR
+REAL_CHUNKS = [
+    Document(page_content="dos Núcleos Urbanos nas Áreas Rurais \n(NUAR). \n \nCAPÍTULO V", metadata={}),
+    Document(page_content="Art. 67. As Zonas Especiais de Ciência, Tecnologia e Inovação (ZECTI) são áreas", metadata={}),
+    Document(page_content="Estudo de Viabilidade Técnica, Econômica e \nAmbiental (EVTEA) para polos", metadata={}),
+    Document(page_content="183. ZEPC – Zonas Especiais de Proteção dos Corpos d’Água.", metadata={}),
+    Document(page_content="inclui a \nSEÇÃO VI das Zonas Especiais de Interesse Comercial (ZEIC) no CAPÍTULO VI",
+             metadata={}),
+    Document(page_content="155. NUAR – Núcleos Urbanos em Áreas Rurais.", metadata={}),
+]
+
+
+def test_expansions_align_with_acronym_letters():
+    definitions = DefinitionExtractor().extract(REAL_CHUNKS)
+
+    for partial in ("areas rurais", "tecnologia e inovacao", "economica e ambiental", "nucleos urbanos e",
+                    "zonas especiais de protecao do", "secao vi das zonas especiais de interesse comercial"):
+        assert partial not in definitions
+
+    assert {e["definition"] for e in definitions["nuar"]} == {
+        "Núcleos Urbanos nas Áreas Rurais", "Núcleos Urbanos em Áreas Rurais"
+    }
+    assert definitions["zecti"][0]["definition"] == "Zonas Especiais de Ciência, Tecnologia e Inovação"
+    assert definitions["evtea"][0]["definition"] == "Estudo de Viabilidade Técnica, Econômica e Ambiental"
+    assert definitions["zepc"][0]["definition"] == "Zonas Especiais de Proteção dos Corpos"
+    assert definitions["zeic"][0]["definition"] == "Zonas Especiais de Interesse Comercial"
+
+
+def test_generic_phrase_does_not_take_definition_path():
+    index = DefinitionIndex(DefinitionExtractor().extract(REAL_CHUNKS))
+
+    assert index.lookup("o que é tecnologia e inovação") == []
+    assert index.lookup("o que são áreas rurais") == []
+
+
+def test_misaligned_entries_are_dropped_from_saved_dictionaries():
+    saved = {"areas rurais": [{"term": "Áreas Rurais", "definition": "NUAR", "kind": "sigla",
+                               "chunk_id": 1, "article_number": None, "source": None}]}
+
+    assert len(DefinitionIndex(saved)) == 0
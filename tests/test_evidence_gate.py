@@ -0,0 +1,99 @@
+import os
+import sys
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.join(project_root, "src"))
+
+from langchain_core.documents import Document
+from ingest.vector_store import RetrievalHit
+from llm_backends import LLMBackend
+from agents.answerer import AnswererAgent
+from agents.evidence_gate import EvidenceGateAgent
+from agents.retriever import RetrieverAgent
+from agents.safety import SafetyAgent
+from agents.supervisor import SupervisorAgent
+
+
+def hit(score, match_type="semantic", chunk_id=0):
+    return RetrievalHit(chunk_id, score, match_type, Document(page_content="Art. 5. Trecho.", metadata={}))
+
+
+def evaluate(hits, quality):
+    return EvidenceGateAgent().evaluate({"retrieval_hits": hits, "retrieval_quality": quality})
+
+
+def test_literal_and_definition_matches_always_pass():
+    # Pseudo-scores altos (similaridade baixa) não bloqueiam correspondências exatas
+    assert evaluate([hit(1.9, "literal")], "baixa")["passed"]
+    assert evaluate([hit(1.9, "definition")], "baixa")["passed"]
+
+
+def test_similarity_thresholds():
+    # cos = 1 - d/2
+    assert evaluate([hit(0.6)], "boa") == {"passed": True, "literal": False, "quality": "boa", "best_similarity": 0.7}
+    assert not evaluate([hit(1.5)], "regular")["passed"]          # cos 0.25 < 0.3
+    assert not evaluate([hit(1.3)], "baixa")["passed"]            # baixa exige cos >= 0.4
+    assert evaluate([hit(1.1), hit(1.3)], "baixa")["passed"]      # melhor trecho: cos 0.45
+    assert not evaluate([], "nenhum")["passed"]
+
+
+def test_block_ends_the_flow_with_a_message():
+    gate = EvidenceGateAgent()
+
+    update = gate({"retrieval_hits": [hit(1.6)], "retrieval_quality": "baixa", "agent_logs": []})
+
+    assert update["next_agent"] == "end"
+    assert update["final_answer"].startswith("Não encontrei nos documentos")
+    assert "(LLM não chamado)" in update["agent_logs"][-1]
+
+
+class FixedStore:
+    direct_search = True
+
+    def __init__(self, hits):
+        self.hits = hits
+
+    def search_hits(self, query, k=5, filters=None, query_vector=None):
+        return self.hits[:k]
+
+    def find_definitions(self, query, filters=None):
+        return []
+
+
+class CountingLLM(LLMBackend):
+    model = "contador"
+
+    def __init__(self):
+        self.calls = 0
+
+    def generate(self, prompt, temperature=0.1, max_tokens=1000):
+        self.calls += 1
+        return "Resposta [1]."
+
+
+class PassingSelfCheck:
+    def __call__(self, state):
+        return {"self_check_passed": True, "final_answer": state["raw_answer"], "next_agent": "safety"}
+
+
+def run(hits):
+    llm = CountingLLM()
+    supervisor = SupervisorAgent(RetrieverAgent(FixedStore(hits)), AnswererAgent(llm), PassingSelfCheck(),
+                                 SafetyAgent(), evidence_gate=EvidenceGateAgent())
+    return supervisor.handle_query("Quais as regras de mobilidade urbana?"), llm.calls
+
+
+def test_graph_skips_llm_when_gate_blocks():
+    answer, calls = run([hit(1.6), hit(1.7, chunk_id=1)])
+
+    assert calls == 0
+    assert answer.startswith("Não encontrei nos documentos")
+
+
+def test_graph_calls_llm_when_gate_passes():
+    answer, calls = run([hit(0.4), hit(0.5, chunk_id=1)])
+
+    assert calls == 1
+    assert answer.startswith("Resposta [1].")
@@ -0,0 +1,116 @@
+import os
+import sys
+import time
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.join(project_root, "src"))
+
+import httpx
+import pytest
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+from groq import BadRequestError, InternalServerError, RateLimitError
+from GroqLLM import GroqLLM
+from llm_resilience import (
+    LLMRequestError, LLMTimeoutError, LLMUnavailableError, RateLimiter, RetryPolicy, parse_retry_after
+)
+
+PROMPT = "Qual o prazo de revisão do plano diretor?"
+
+
+def status_error(error_class, status, headers=None):
+    request = httpx.Request("POST", "https://api.groq.com/openai/v1/chat/completions")
+    response = httpx.Response(status, headers=headers or {}, request=request)
+    return error_class(f"HTTP {status}", response=response, body=None)
+
+
+class FakeRequest:
+    """Requisição que levanta os erros da fila antes de responder"""
+
+    def __init__(self, *errors, delay=0.0):
+        self.errors = list(errors)
+        self.delay = delay
+        self.calls = 0
+
+    def __call__(self, timeout):
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.errors:
+            raise self.errors.pop(0)
+        return "resposta"
+
+
+def make_llm(timeout=5.0, max_retries=3, base_delay=0.01, max_concurrency=4):
+    limiter = RateLimiter(requests_per_minute=1000, tokens_per_minute=2000)
+    return GroqLLM("fake", "modelo", timeout=timeout, max_concurrency=max_concurrency, rate_limiter=limiter,
+                   retry_policy=RetryPolicy(max_retries=max_retries, base_delay=base_delay, max_delay=0.05))
+
+
+def bucket_level(llm):
+    llm.rate_limiter.tokens._refill()
+    return llm.rate_limiter.tokens._available
+
+
+def test_rate_limit_with_retry_after_is_retried():
+    llm = make_llm()
+    request = FakeRequest(status_error(RateLimitError, 429, {"retry-after": "0.01"}))
+
+    response, _ = llm._call(request, PROMPT, max_tokens=100)
+
+    assert response == "resposta"
+    assert request.calls == 2
+
+
+def test_client_error_is_raised_without_retry():
+    llm = make_llm()
+    request = FakeRequest(status_error(BadRequestError, 400))
+
+    with pytest.raises(LLMRequestError):
+        llm._call(request, PROMPT, max_tokens=100)
+
+    assert request.calls == 1
+
+
+def test_deadline_bounds_total_time():
+    llm = make_llm(timeout=0.3, max_retries=10)
+    request = FakeRequest(*[status_error(InternalServerError, 503)] * 11, delay=0.1)
+
+    started = time.monotonic()
+    with pytest.raises(LLMTimeoutError):
+        llm._call(request, PROMPT, max_tokens=100)
+
+    assert time.monotonic() - started < 0.45
+
+
+def test_failed_attempts_return_reserved_tokens():
+    llm = make_llm(max_retries=2)
+    capacity = llm.rate_limiter.tokens.capacity
+    request = FakeRequest(*[status_error(InternalServerError, 503)] * 3)
+
+    # Três reservas de 800 tokens esgotariam o balde de 2000 sem a devolução
+    with pytest.raises(LLMUnavailableError):
+        llm._call(request, PROMPT, max_tokens=800)
+
+    assert request.calls == 3
+    assert bucket_level(llm) == capacity
+
+
+def test_semaphore_timeout_returns_reserved_tokens():
+    llm = make_llm(timeout=0.1, max_concurrency=1)
+    llm._semaphore.acquire()
+
+    with pytest.raises(LLMTimeoutError):
+        llm._call(FakeRequest(), PROMPT, max_tokens=800)
+
+    assert bucket_level(llm) == llm.rate_limiter.tokens.capacity
+
+
+def test_parse_retry_after_accepts_seconds_and_http_dates():
+    later = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=30), usegmt=True)
+
+    assert parse_retry_after("2") == 2.0
+    assert 25 < parse_retry_after(later) <= 30
+    assert parse_retry_after("amanhã") is None
+    assert parse_retry_after(None) is None
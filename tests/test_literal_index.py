@@ -0,0 +1,73 @@
+import os
+import sys
+import pickle
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+sys.path.insert(0, project_root)
+
+from langchain_core.documents import Document
+from ingest.literal_index import LiteralIndex
+from ingest.vector_store import VectorStore
+
+CHUNKS = [
+    Document(page_content="LEI COMPLEMENTAR Nº 3/2006\nInstitui o Plano Diretor do Município",
+             metadata={"source": "plano_diretor.pdf"}),
+    Document(page_content="Art. 10. O zoneamento urbano divide o território em zonas.",
+             metadata={"source": "plano_diretor.pdf", "article_number": "10"}),
+    Document(page_content="LEI Nº 1234/2010\nDispõe sobre o parcelamento do solo",
+             metadata={"source": "lei_parcelamento.pdf"}),
+    Document(page_content="Art. 10. Os lotes terão área mínima de 125 m².",
+             metadata={"source": "lei_parcelamento.pdf", "article_number": "10"}),
+    Document(page_content="Conforme o Art. 10, os lotes seguem a área mínima.",
+             metadata={"source": "lei_parcelamento.pdf", "article_number": "11"}),
+]
+
+
+def test_lookup_by_document_and_article():
+    index = LiteralIndex.from_chunks(CHUNKS)
+
+    assert sorted(index.documents_for("10")) == ["lei_parcelamento.pdf", "plano_diretor.pdf"]
+    assert index.lookup("10", ["plano_diretor.pdf"]) == [1]
+    assert index.lookup("10", ["lei_parcelamento.pdf"]) == [3, 4]
+    assert sorted(index.lookup("10")) == [1, 3, 4]
+
+
+def test_document_aliases_from_header():
+    index = LiteralIndex.from_chunks(CHUNKS)
+
+    assert index.detect_documents("O que diz o Art. 10 da LC 3/2006?") == ["plano_diretor.pdf"]
+    assert index.detect_documents("Art. 10 da Lei 1234/2010") == ["lei_parcelamento.pdf"]
+    assert index.detect_documents("Art. 10") == []
+
+
+def test_article_hits_respect_the_cited_document():
+    store = VectorStore("unused")
+    store.chunks = CHUNKS
+    store.literal_index = LiteralIndex.from_chunks(CHUNKS)
+    store._build_metadata_bitmaps()
+
+    hits = store.article_hits("Art. 10 da Lei 1234/2010 sobre lotes", "10")
+
+    # O próprio artigo antes do chunk que só o menciona
+    assert [hit.chunk_id for hit in hits] == [3, 4]
+    assert all(hit.match_type == "literal" for hit in hits)
+
+
+def test_old_format_pickle_is_rebuilt_from_chunks():
+    # Formato antigo: artigo → ids, sem documento
+    old = pickle.loads(pickle.dumps({"10": [1, 3, 4]}))
+
+    index = LiteralIndex.from_pickle(old, CHUNKS)
+
+    assert index.entries == LiteralIndex.from_chunks(CHUNKS).entries
+    assert index.lookup("10", ["plano_diretor.pdf"]) == [1]
+
+
+def test_current_format_round_trip():
+    index = LiteralIndex.from_chunks(CHUNKS)
+
+    loaded = LiteralIndex.from_pickle(pickle.loads(pickle.dumps(index.to_pickle())), [])
+
+    assert loaded.entries == index.entries
+    assert loaded.aliases == index.aliases
@@ -0,0 +1,90 @@
+import os
+import sys
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.join(project_root, "src"))
+
+import numpy as np
+from langchain_core.documents import Document
+from ingest.vector_store import RetrievalHit
+from agents.retriever import RetrieverAgent
+
+
+def unit(*values):
+    vector = np.array(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+class FakeStore:
+    """Vectorstore com hits e vetores fixos; conta as buscas recebidas"""
+
+    direct_search = True
+
+    def __init__(self, hits, vectors):
+        self.hits = hits
+        self.vectors = vectors
+        self.requested_k = []
+
+    def search_hits(self, query, k=5, filters=None, query_vector=None):
+        self.requested_k.append(k)
+        return self.hits[:k]
+
+    def find_definitions(self, query, filters=None):
+        return []
+
+    def vectors_for_hits(self, hits):
+        return np.stack([self.vectors[hit.chunk_id] for hit in hits])
+
+
+def hit(chunk_id, score, match_type="semantic"):
+    return RetrievalHit(chunk_id, score, match_type, Document(page_content=f"chunk {chunk_id}"))
+
+
+VECTORS = {
+    1: unit(1, 0, 0),
+    2: unit(1, 0.01, 0),   # quase idêntico ao 1
+    3: unit(0, 1, 0),
+    4: unit(0, 0, 1),
+}
+
+
+def test_mmr_skips_near_duplicates():
+    store = FakeStore([hit(1, 0.10), hit(2, 0.11), hit(3, 0.60)], VECTORS)
+    retriever = RetrieverAgent(store, k=2, use_mmr=True, mmr_lambda=0.5)
+
+    selected, _ = retriever._apply_mmr(store.hits)
+
+    assert [h.chunk_id for h in selected] == [1, 3]
+
+
+def test_mmr_pins_exact_matches_in_order():
+    # Pseudo-scores literais maiores que as distâncias semânticas: continuam na frente
+    hits = [hit(4, 0.25, "literal"), hit(1, 0.35, "definition"), hit(2, 0.05), hit(3, 0.08)]
+    retriever = RetrieverAgent(FakeStore(hits, VECTORS), k=3, use_mmr=True, mmr_lambda=0.5)
+
+    selected, _ = retriever._apply_mmr(hits)
+
+    assert [(h.chunk_id, h.match_type) for h in selected] == [(4, "literal"), (1, "definition"), (3, "semantic")]
+
+
+def test_mmr_counts_redundancy_against_pinned_hits():
+    # O semântico 2 repete o chunk literal 1: o MMR prefere o 4
+    hits = [hit(1, 0.2, "literal"), hit(2, 0.05), hit(4, 0.5)]
+    retriever = RetrieverAgent(FakeStore(hits, VECTORS), k=2, use_mmr=True, mmr_lambda=0.5)
+
+    selected, _ = retriever._apply_mmr(hits)
+
+    assert [h.chunk_id for h in selected] == [1, 4]
+
+
+def test_semantic_search_widens_pool_and_returns_k():
+    store = FakeStore([hit(1, 0.10), hit(2, 0.11), hit(3, 0.60), hit(4, 0.70)], VECTORS)
+    retriever = RetrieverAgent(store, k=2, use_mmr=True, mmr_lambda=0.5, mmr_pool_factor=2)
+
+    result = retriever({"query": "mobilidade urbana", "agent_logs": []})
+
+    assert store.requested_k == [4]
+    assert [h.chunk_id for h in result["retrieval_hits"]] == [1, 3]
+    assert "MMR" in result["agent_logs"][-1]
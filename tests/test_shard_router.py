@@ -0,0 +1,57 @@
+import os
+import sys
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+sys.path.insert(0, project_root)
+
+import numpy as np
+from langchain_core.documents import Document
+from ingest.shard_router import ShardRouter
+from ingest.vector_store import RetrievalHit
+
+
+class FakeShard:
+    """Shard já carregado que devolve hits fixos"""
+
+    def __init__(self, name, hits):
+        self.name = name
+        self.hits = [RetrievalHit(chunk_id, score, match_type, Document(page_content=f"{name}-{chunk_id}"), name)
+                     for chunk_id, score, match_type in hits]
+
+    def search_hits(self, query, k=5, filters=None, query_vector=None):
+        return self.hits[:k]
+
+    def encode_queries(self, queries):
+        return np.zeros((len(queries), 4), dtype=np.float32)
+
+
+def make_router(shards):
+    router = ShardRouter("unused", {shard.name: {} for shard in shards})
+    for shard in shards:
+        router._loaded[shard.name] = shard
+        router._footprints[shard.name] = 0
+    return router
+
+
+def test_merge_puts_exact_matches_before_semantic_hits_across_shards():
+    # Pseudo-score literal (0.15) maior que as distâncias L2 do outro shard (0.05, 0.1)
+    literal_shard = FakeShard("campina_grande", [(1, 0.15, "literal"), (2, 0.25, "literal")])
+    semantic_shard = FakeShard("joao_pessoa", [(7, 0.05, "semantic"), (8, 0.1, "semantic")])
+
+    hits = make_router([semantic_shard, literal_shard]).search_hits("Art. 10", k=3)
+
+    assert [(hit.shard, hit.match_type) for hit in hits] == [
+        ("campina_grande", "literal"),
+        ("campina_grande", "literal"),
+        ("joao_pessoa", "semantic"),
+    ]
+
+
+def test_merge_orders_by_score_within_the_same_match_type():
+    first = FakeShard("a", [(1, 0.3, "semantic"), (2, 0.9, "semantic")])
+    second = FakeShard("b", [(3, 0.1, "definition"), (4, 0.5, "semantic")])
+
+    hits = make_router([first, second]).search_hits("zoneamento", k=4)
+
+    assert [hit.chunk_id for hit in hits] == [3, 1, 4, 2]
@@ -0,0 +1,93 @@
+import os
+import sys
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.join(project_root, "src"))
+
+from langchain_core.documents import Document
+from ingest.literal_index import LiteralIndex
+from ingest.vector_store import VectorStore
+from llm_backends import LLMBackend
+from agents.answerer import AnswererAgent
+from agents.retriever import RetrieverAgent
+from agents.safety import SafetyAgent
+from agents.supervisor import SupervisorAgent
+
+CHUNKS = [
+    Document(page_content="LEI COMPLEMENTAR Nº 3/2006\nInstitui o Plano Diretor",
+             metadata={"source": "plano_diretor.pdf"}),
+    Document(page_content="Art. 10. O zoneamento urbano divide o território em zonas.",
+             metadata={"source": "plano_diretor.pdf", "article_number": "10", "part_index": 0}),
+    Document(page_content="Art. 10. (continuação 1)\nParágrafo único. As zonas constam do Anexo I.",
+             metadata={"source": "plano_diretor.pdf", "article_number": "10", "part_index": 1}),
+]
+
+
+class CountingLLM(LLMBackend):
+    model = "contador"
+
+    def __init__(self):
+        self.calls = 0
+
+    def generate(self, prompt, temperature=0.1, max_tokens=1000):
+        self.calls += 1
+        return "Resposta do LLM [1]."
+
+
+class FailingNode:
+    """Nó que não deve ser executado nos atalhos"""
+
+    def __call__(self, state):
+        raise AssertionError("nó executado fora do fluxo esperado")
+
+
+def make_supervisor():
+    store = VectorStore("unused")
+    store.chunks = CHUNKS
+    store.literal_index = LiteralIndex.from_chunks(CHUNKS)
+    store._build_metadata_bitmaps()
+
+    llm = CountingLLM()
+    supervisor = SupervisorAgent(RetrieverAgent(store), AnswererAgent(llm), FailingNode(), SafetyAgent())
+    return supervisor, llm
+
+
+def test_greeting_and_help_use_templates_without_llm():
+    supervisor, llm = make_supervisor()
+
+    assert supervisor.handle_query("Olá!") == supervisor.templates["saudacao"]
+    assert supervisor.handle_query("Bom dia, como você pode me ajudar?") == supervisor.templates["ajuda"]
+    assert llm.calls == 0
+
+
+def test_verbatim_article_is_answered_from_the_literal_index():
+    supervisor, llm = make_supervisor()
+
+    answer = supervisor.handle_query("Qual o texto do Art. 10?")
+
+    assert answer.startswith("Texto integral do Art. 10 [1]:")
+    assert "O zoneamento urbano divide o território em zonas.\nParágrafo único." in answer
+    assert "continuação" not in answer
+    assert "📚 Fontes:" in answer
+    assert llm.calls == 0
+
+
+def test_questions_about_an_article_take_the_full_flow():
+    supervisor, _ = make_supervisor()
+
+    assert supervisor._classify_query("Art. 10") == ("artigo", "10")
+    assert supervisor._classify_query("Art. 10 do Plano Diretor") == ("artigo", "10")
+    assert supervisor._classify_query("Art. 10 do Plano Diretor sobre o que trata?")[0] == "rag"
+    assert supervisor._classify_query("O que estabelece o Art. 10?")[0] == "rag"
+    assert supervisor._classify_query("Olá, o que são ZEIS?")[0] == "rag"
+
+
+def test_missing_article_falls_back_to_retriever():
+    supervisor, _ = make_supervisor()
+
+    update = supervisor({"query": "Art. 99", "agent_logs": []})
+
+    assert update["next_agent"] == "retriever"
+    assert update["query_type"] == "rag"
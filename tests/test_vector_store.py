@@ -0,0 +1,64 @@
+import os
+import sys
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+sys.path.insert(0, project_root)
+
+import faiss
+import numpy as np
+from langchain_core.documents import Document
+from ingest.vector_store import VectorStore
+
+
+def make_store(documents, vectors):
+    """VectorStore com índice FAISS montado à mão (sem encoder)"""
+    store = VectorStore("unused")
+    store.chunks = documents
+    store.index = faiss.IndexFlatL2(vectors.shape[1])
+    store.index.add(vectors)
+    store.direct_search = True
+    store._build_metadata_bitmaps()
+    return store
+
+
+def build_corpus():
+    # 16 chunks da fonte "a" ao redor da query; os 4 da fonte "b" ficam longe
+    rng = np.random.default_rng(0)
+    query = np.zeros((1, 8), dtype=np.float32)
+    near = rng.normal(0, 0.1, (16, 8)).astype(np.float32)
+    far = (rng.normal(0, 0.1, (4, 8)) + 5).astype(np.float32)
+
+    documents = [Document(page_content=f"a-{i}", metadata={"source": "a", "article_number": str(i + 1)})
+                 for i in range(16)]
+    documents += [Document(page_content=f"b-{i}", metadata={"source": "b", "article_number": str(i + 1)})
+                  for i in range(4)]
+
+    return make_store(documents, np.vstack([near, far])), query
+
+
+def test_source_filter_returns_exactly_k_hits_inside_faiss():
+    store, query = build_corpus()
+
+    # Pós-filtragem dos top-3 globais não traria nenhum chunk de "b"
+    hits = store.search_hits("zoneamento", k=3, filters={"source": "b"}, query_vector=query)
+
+    assert len(hits) == 3
+    assert {hit.document.metadata["source"] for hit in hits} == {"b"}
+    assert [hit.score for hit in hits] == sorted(hit.score for hit in hits)
+
+
+def test_k_is_capped_by_eligible_chunks():
+    store, query = build_corpus()
+
+    hits = store.search_hits("zoneamento", k=10, filters={"source": "b"}, query_vector=query)
+
+    assert sorted(hit.chunk_id for hit in hits) == [16, 17, 18, 19]
+
+
+def test_article_range_filter():
+    store, query = build_corpus()
+
+    hits = store.search_hits("zoneamento", k=5, filters={"source": "a", "article_range": (3, 4)}, query_vector=query)
+
+    assert sorted(hit.document.metadata["article_number"] for hit in hits) == ["3", "4"]